@@ -0,0 +1,340 @@
+"""
+Admission Control Module
+Caps concurrent chat requests, queues a bounded backlog fairly per client and sheds the rest early
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Optional
+
+from metrics import ADMISSION_QUEUED, SHED
+
+
+class AdmissionRejected(Exception):
+    """A request shed by admission control."""
+    
+    def __init__(self, reason: str, status: int, retry_after: int):
+        """
+        Initialize the rejection.
+        
+        Args:
+            reason (str): Why it was shed: queue_full, client_limit, deadline or timeout
+            status (int): HTTP status to answer with (429 for the client's own
+                          backlog, 503 when the server is overloaded)
+            retry_after (int): Seconds the client should wait before retrying
+        """
+        super().__init__(f"Request shed ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A granted slot; release it (or use it as a context manager) when the request is done."""
+    
+    __slots__ = ('controller', 'start', 'released')
+    
+    def __init__(self, controller: 'AdmissionController'):
+        self.controller = controller
+        self.start = time.monotonic()
+        self.released = False
+    
+    def release(self):
+        """Free the slot for the next queued request; calling it again does nothing."""
+        self.controller._release(self)
+    
+    def __enter__(self) -> 'Ticket':
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        self.release()
+        return False
+
+
+class _Waiter:
+    """A queued request."""
+    
+    __slots__ = ('client', 'deadline', 'wake', 'ticket', 'error')
+    
+    def __init__(self, client: str, deadline: float, wake: Callable[[], None]):
+        self.client = client
+        self.deadline = deadline
+        self.wake = wake
+        self.ticket: Optional[Ticket] = None
+        self.error: Optional[AdmissionRejected] = None
+
+
+class AdmissionController:
+    """
+    Limits how many chat requests talk to Gemini at once.
+    
+    Up to `max_concurrent` requests hold a slot; the rest wait in a bounded
+    backlog with one queue per client, served round-robin so a client
+    flooding the server only delays its own requests. A request is shed
+    up front, instead of waiting until the client gives up, when:
+    
+    - the backlog is full and its client has the most requests waiting (503);
+      a client with fewer takes the busiest client's newest spot instead
+    - its client already has `max_queue_per_client` requests waiting (429)
+    - at the observed service time it can't start before its deadline (503)
+    
+    and a queued request still waiting at its deadline is shed too (503).
+    Each rejection carries a Retry-After estimate from the backlog and the
+    observed service time.
+    """
+    
+    def __init__(self, max_concurrent: int = 16, max_queue: int = 64,
+                 max_queue_per_client: Optional[int] = None, queue_timeout: float = 10.0,
+                 smoothing: float = 0.2):
+        """
+        Initialize the controller.
+        
+        Args:
+            max_concurrent (int): Requests allowed upstream at once
+            max_queue (int): Requests allowed to wait for a slot
+            max_queue_per_client (int): Requests one client may have waiting;
+                                        defaults to max_queue
+            queue_timeout (float): Longest a request waits for a slot, in seconds
+            smoothing (float): Weight of each new service time in the moving average
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue if max_queue_per_client is None else max_queue_per_client
+        self.queue_timeout = queue_timeout
+        self.smoothing = smoothing
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed: Dict[str, int] = {}
+        # Moving average of the time requests hold a slot
+        self.service_time: Optional[float] = None
+        # client -> its waiting requests, in round-robin order
+        self._queues: 'OrderedDict[str, Deque[_Waiter]]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def acquire(self, client: str = '', budget: Optional[float] = None) -> Ticket:
+        """
+        Wait for a slot, blocking the calling thread.
+        
+        Args:
+            client (str): Identifies the client for fair queueing (e.g. its API key)
+            budget (float): Seconds the caller can wait for its response, if
+                            less than queue_timeout
+        
+        Returns:
+            Ticket: The slot, to be released when the request is done
+        
+        Raises:
+            AdmissionRejected: The request was shed
+        """
+        event = threading.Event()
+        ticket, waiter = self._enter(client, budget, event.set)
+        if ticket is not None:
+            return ticket
+        event.wait(max(waiter.deadline - time.monotonic(), 0))
+        return self._collect(waiter)
+    
+    async def acquire_async(self, client: str = '', budget: Optional[float] = None) -> Ticket:
+        """
+        Wait for a slot without blocking the event loop.
+        
+        Args:
+            client (str): Identifies the client for fair queueing (e.g. its API key)
+            budget (float): Seconds the caller can wait for its response
+        
+        Returns:
+            Ticket: The slot, to be released when the request is done
+        
+        Raises:
+            AdmissionRejected: The request was shed
+        """
+        loop = asyncio.get_running_loop()
+        woken = loop.create_future()
+        
+        def wake():
+            loop.call_soon_threadsafe(lambda: woken.done() or woken.set_result(None))
+        
+        ticket, waiter = self._enter(client, budget, wake)
+        if ticket is not None:
+            return ticket
+        try:
+            await asyncio.wait_for(woken, max(waiter.deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Client went away: give back the slot or the spot in the queue
+            self._abandon(waiter)
+            raise
+        return self._collect(waiter)
+    
+    def _enter(self, client: str, budget: Optional[float], wake: Callable[[], None]):
+        """Take a free slot, or queue the request; returns (ticket, None) or (None, waiter)."""
+        now = time.monotonic()
+        with self._lock:
+            if self.active < self.max_concurrent and not self.queued:
+                return self._grant(), None
+            
+            wait_limit = self.queue_timeout
+            if budget is not None:
+                wait_limit = min(wait_limit, budget - (self.service_time or 0.0))
+            
+            queue = self._queues.get(client)
+            waiting = len(queue) if queue else 0
+            
+            # The server's own backlog comes first: with no room at all (a
+            # max_queue of 0) every client is shed with 503, not blamed with 429
+            if self.queued >= self.max_queue:
+                if not self._queues:
+                    raise self._reject('queue_full', 503)
+                busiest = max(self._queues, key=lambda name: len(self._queues[name]))
+                if len(self._queues[busiest]) <= waiting + 1:
+                    raise self._reject('queue_full', 503)
+                # Make room by shedding the busiest client's newest request,
+                # unless this client is over its own limit anyway
+                if waiting < self.max_queue_per_client:
+                    self._evict(busiest)
+            
+            if waiting >= self.max_queue_per_client:
+                raise self._reject('client_limit', 429)
+            
+            # Round-robin: each other client gets up to as many turns first
+            ahead = waiting + sum(min(len(other), waiting + 1)
+                                  for name, other in self._queues.items() if name != client)
+            if self.service_time is not None:
+                expected = (ahead // self.max_concurrent + 1) * self.service_time
+                if expected > wait_limit:
+                    raise self._reject('deadline', 503, expected)
+            
+            waiter = _Waiter(client, now + max(wait_limit, 0.0), wake)
+            if queue is None:
+                queue = self._queues[client] = deque()
+            queue.append(waiter)
+            self.queued += 1
+            ADMISSION_QUEUED.inc()
+            return None, waiter
+    
+    def _collect(self, waiter: _Waiter) -> Ticket:
+        """Get a woken or timed out waiter's ticket, or raise why it was shed."""
+        with self._lock:
+            if waiter.ticket is not None:
+                return waiter.ticket
+            if waiter.error is not None:
+                raise waiter.error
+            self._remove(waiter)
+            raise self._reject('timeout', 503)
+    
+    def _abandon(self, waiter: _Waiter):
+        """Withdraw a waiter whose caller stopped waiting, releasing a slot it was given."""
+        with self._lock:
+            ticket = waiter.ticket
+            if ticket is None:
+                self._remove(waiter)
+        if ticket is not None:
+            ticket.release()
+    
+    def _grant(self) -> Ticket:
+        self.active += 1
+        self.admitted += 1
+        return Ticket(self)
+    
+    def _release(self, ticket: Ticket):
+        """Free a ticket's slot and hand it to the next client in turn."""
+        now = time.monotonic()
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            self.active -= 1
+            seconds = now - ticket.start
+            if self.service_time is None:
+                self.service_time = seconds
+            else:
+                self.service_time += self.smoothing * (seconds - self.service_time)
+            
+            while self.active < self.max_concurrent and self._queues:
+                client, queue = next(iter(self._queues.items()))
+                waiter = queue.popleft()
+                if queue:
+                    self._queues.move_to_end(client)
+                else:
+                    del self._queues[client]
+                self.queued -= 1
+                ADMISSION_QUEUED.dec()
+                if waiter.deadline <= now:
+                    # Too late to be useful; its thread is about to shed it
+                    continue
+                waiter.ticket = self._grant()
+                waiter.wake()
+    
+    def _remove(self, waiter: _Waiter):
+        queue = self._queues.get(waiter.client)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del self._queues[waiter.client]
+        self.queued -= 1
+        ADMISSION_QUEUED.dec()
+    
+    def _evict(self, client: str):
+        waiter = self._queues[client][-1]
+        self._remove(waiter)
+        waiter.error = self._reject('queue_full', 503)
+        waiter.wake()
+    
+    def _reject(self, reason: str, status: int, wait: Optional[float] = None) -> AdmissionRejected:
+        """Count a shed request and build its rejection (called with the lock held)."""
+        if wait is None:
+            # Time for the backlog ahead to drain through the slots
+            wait = (self.queued // self.max_concurrent + 1) * (self.service_time or 1.0)
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        SHED.inc(reason)
+        return AdmissionRejected(reason, status, max(1, math.ceil(wait)))
+    
+    def stats(self) -> dict:
+        """
+        Get admission statistics for monitoring.
+        
+        Returns:
+            dict: Limits, requests in flight and queued, clients waiting,
+                  admitted and shed counts, and the average service time
+        """
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'max_queue_per_client': self.max_queue_per_client,
+                'queue_timeout': self.queue_timeout,
+                'active': self.active,
+                'queued': self.queued,
+                'clients_waiting': len(self._queues),
+                'admitted': self.admitted,
+                'shed': dict(self.shed),
+                'service_time': self.service_time
+            }
+
+
+def create_admission_from_env() -> Optional[AdmissionController]:
+    """
+    Build the admission controller configured by environment variables.
+    
+    ADMISSION_MAX_CONCURRENT caps concurrent chat requests (default 0:
+    admission control off), ADMISSION_MAX_QUEUE and
+    ADMISSION_MAX_QUEUE_PER_CLIENT bound the backlog, and
+    ADMISSION_QUEUE_TIMEOUT sets the longest wait for a slot in seconds.
+    
+    Returns:
+        Optional[AdmissionController]: Configured controller, or None if disabled
+    """
+    max_concurrent = int(os.getenv('ADMISSION_MAX_CONCURRENT', 0))
+    if max_concurrent <= 0:
+        return None
+    per_client = int(os.getenv('ADMISSION_MAX_QUEUE_PER_CLIENT', 0)) or None
+    return AdmissionController(max_concurrent,
+                               max_queue=int(os.getenv('ADMISSION_MAX_QUEUE', 64)),
+                               max_queue_per_client=per_client,
+                               queue_timeout=float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 10)))
@@ -3,24 +3,156 @@ AI Client Module - Google Gemini Integration
 Handles API communication with Google's Gemini AI
 """
 
+import asyncio
 import os
-import google.generativeai as genai
-from typing import Optional
+import threading
+import time
+from typing import Any, Awaitable, Callable, Iterable, Iterator, List, Optional
+
+from chat_sessions import SessionStore, create_session_store_from_env, estimate_tokens, to_history
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from metrics import STAGE_SECONDS, UPSTREAM_ERRORS, UPSTREAM_IN_FLIGHT
+from model_router import ModelRoute, ModelRouter, create_router_from_env
+from prompt_cache import PromptCache, create_prompt_cache_from_env, is_missing_cache_error
+from response_cache import ResponseCache, create_cache_from_env, make_cache_key
+from retry import RetryPolicy
+from single_flight import AsyncSingleFlight, SingleFlight
+
+# The SDK keeps one transport per configuration; models are shared per process
+_sdk_lock = threading.RLock()
+_sdk_settings = None
+_models = {}
+
+
+def configure_sdk(api_key: str, transport: Optional[str] = None):
+    """
+    Import the Gemini SDK and configure it for an API key and transport.
+    
+    The SDK is imported on first use because it takes most of the process
+    startup time. genai.configure() drops the SDK's cached clients, so it
+    only runs when the API key or transport changes.
+    
+    Args:
+        api_key (str): Gemini API key
+        transport (str): Optional SDK transport (grpc or rest)
+    
+    Returns:
+        The configured google.generativeai module
+    """
+    import google.generativeai as genai
+    
+    global _sdk_settings
+    with _sdk_lock:
+        if _sdk_settings != (api_key, transport):
+            genai.configure(api_key=api_key, transport=transport)
+            _sdk_settings = (api_key, transport)
+            _models.clear()
+    return genai
+
+
+def get_model(api_key: str, model_name: str, system_prompt: str,
+              transport: Optional[str] = None):
+    """
+    Get the process-wide Gemini model for a configuration.
+    
+    Every AIClient with the same configuration reuses the same model and
+    connection.
+    
+    Args:
+        api_key (str): Gemini API key
+        model_name (str): Gemini model name
+        system_prompt (str): System instruction for the model
+        transport (str): Optional SDK transport (grpc or rest)
+    
+    Returns:
+        genai.GenerativeModel: Shared model instance
+    """
+    with _sdk_lock:
+        genai = configure_sdk(api_key, transport)
+        key = (model_name, system_prompt)
+        if key not in _models:
+            _models[key] = genai.GenerativeModel(model_name, system_instruction=system_prompt)
+        return _models[key]
+
+
+class LazyModel:
+    """
+    Builds a model on first use and then stands in for it.
+    
+    Concurrent first calls build it once. Attributes other than load() and
+    loaded are looked up on the built model.
+    """
+    
+    def __init__(self, factory: Callable[[], Any]):
+        """
+        Initialize the stand-in.
+        
+        Args:
+            factory: Builds the model, e.g. a get_model() call
+        """
+        self._factory = factory
+        self._model = None
+        self._lock = threading.Lock()
+    
+    @property
+    def loaded(self) -> bool:
+        """Whether the model has been built."""
+        return self._model is not None
+    
+    def load(self):
+        """Build the model unless it already was, and return it."""
+        model = self._model
+        if model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._factory()
+                model = self._model
+        return model
+    
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
 
 
 class AIClient:
     """Client for interacting with Google Gemini API."""
     
-    def __init__(self):
-        """Initialize the AI client with API key and system prompt."""
+    # Returned by chat() when no response could be generated
+    ERROR_MESSAGE = "I'm sorry, I encountered an error processing your request."
+    
+    def __init__(self, model=None, cache: Optional[ResponseCache] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 sessions: Optional[SessionStore] = None,
+                 prompt_cache: Optional[PromptCache] = None,
+                 router: Optional[ModelRouter] = None):
+        """
+        Initialize the AI client with API key and system prompt.
+        
+        Args:
+            model: Optional pre-built model exposing generate_content (e.g. a
+                   fake model for tests); skips API key setup when given
+            cache: Optional response cache; configured from RESPONSE_CACHE
+                   environment variables when not given
+            retry_policy: Optional retry policy; configured from
+                          GEMINI_MAX_ATTEMPTS and GEMINI_RETRY_DELAY when not given
+            breaker: Optional circuit breaker; configured from
+                     GEMINI_BREAKER_THRESHOLD and GEMINI_BREAKER_RESET when not given
+            sessions: Optional chat session store; configured from
+                      CHAT_SESSIONS environment variables when not given
+            prompt_cache: Optional upstream cache of the system prompt;
+                          configured from PROMPT_CACHE when not given and no
+                          model is passed in
+            router: Optional router choosing between several models per
+                    request; configured from GEMINI_MODELS when not given and
+                    no model is passed in
+        """
         self.api_key = os.getenv('GOOGLE_GEMINI_KEY')
         
-        if not self.api_key:
+        if not self.api_key and model is None:
             raise ValueError("GOOGLE_GEMINI_KEY environment variable not set")
         
-        # Configure Gemini API
-        genai.configure(api_key=self.api_key)
-        
         # Get system prompt from environment or use default
         self.system_prompt = os.getenv('SYSTEM_PROMPT', 
                                        'You are a helpful assistant. Please provide informative and safe responses.')
@@ -29,48 +161,623 @@ class AIClient:
         # Updated model names for Gemini API
         self.model_name = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash-latest')
         
-        # Initialize the model with system instruction
-        self.model = genai.GenerativeModel(
-            self.model_name,
-            system_instruction=self.system_prompt
-        )
+        # Model with system instruction (shared per process), imported and built
+        # on the first request or warm() so startup doesn't wait for the SDK
+        if model is None:
+            transport = os.getenv('GEMINI_TRANSPORT') or None
+            
+            def lazy_model(name: str) -> LazyModel:
+                return LazyModel(lambda: get_model(self.api_key, name, self.system_prompt, transport))
+            
+            model = lazy_model(self.model_name)
+            if prompt_cache is None:
+                prompt_cache = create_prompt_cache_from_env()
+            if router is None:
+                router = create_router_from_env(
+                    lazy_model, lambda: configure_sdk(self.api_key, transport).list_models()
+                )
+        self.model = model
+        self._route = ModelRoute(self.model_name, 0, model)
+        
+        # Optional routing between models by prompt size and latency, with failover;
+        # GEMINI_LATENCY_BUDGET is the default budget (seconds) for requests without one
+        self.router = router
+        budget = os.getenv('GEMINI_LATENCY_BUDGET')
+        self.latency_budget = float(budget) if budget else None
+        
+        # System prompt cached upstream once, instead of sent with every request
+        self.prompt_cache = prompt_cache
+        
+        # Seconds per upstream attempt, and for the whole request including retries
+        self.timeout = float(os.getenv('GEMINI_TIMEOUT', 30))
+        self.deadline = float(os.getenv('GEMINI_DEADLINE', 60))
+        
+        # Transient errors (timeouts, 429, 5xx) are retried with backoff
+        if retry_policy is None:
+            retry_policy = RetryPolicy(
+                max_attempts=int(os.getenv('GEMINI_MAX_ATTEMPTS', 3)),
+                base_delay=float(os.getenv('GEMINI_RETRY_DELAY', 0.5))
+            )
+        self.retry_policy = retry_policy
+        self.retries = 0
+        
+        # Fail fast while upstream keeps failing (threshold 0 disables)
+        if breaker is None:
+            threshold = int(os.getenv('GEMINI_BREAKER_THRESHOLD', 5))
+            if threshold > 0:
+                breaker = CircuitBreaker(threshold, float(os.getenv('GEMINI_BREAKER_RESET', 30)))
+        self.breaker = breaker
+        
+        # Cache of moderated responses, keyed on model, system prompt and message
+        self.cache = cache if cache is not None else create_cache_from_env()
+        
+        # Identical prompts in flight at the same time share one upstream call
+        coalescing = os.getenv('REQUEST_COALESCING', 'true').lower() == 'true'
+        self.single_flight = SingleFlight() if coalescing else None
+        self.async_single_flight = AsyncSingleFlight() if coalescing else None
+        
+        # Conversation history per session id, trimmed to a token budget
+        self.sessions = sessions if sessions is not None else create_session_store_from_env()
         
         print(f"✅ Gemini AI Client initialized (Model: {self.model_name})")
     
-    def generate_response(self, user_message: str) -> Optional[str]:
+    def warm(self):
+        """
+        Import the SDK and build the models now instead of on the first request.
+        
+        Makes no network calls, so pre-fork servers can run it in the master
+        process and fork workers with the SDK already loaded.
+        """
+        models = [self.model] + [route.model for route in (self.router.routes if self.router else [])]
+        for model in models:
+            if isinstance(model, LazyModel):
+                model.load()
+    
+    def generate_response(self, user_message: str,
+                          latency_budget: Optional[float] = None) -> Optional[str]:
         """
         Generate a response from Gemini AI.
         
         Args:
             user_message (str): The user's input message
-            
+            latency_budget (float): Optional seconds the caller can wait, used
+                                    by the model router
+        
         Returns:
             Optional[str]: AI's response or None if error
         """
+        if self.single_flight is None:
+            return self._generate(user_message, latency_budget)
+        
+        return self.single_flight.do(
+            self.cache_key(user_message), lambda: self._generate(user_message, latency_budget)
+        )
+    
+    def _generate(self, user_message: str, latency_budget: Optional[float] = None) -> Optional[str]:
+        """Make the upstream call for generate_response."""
         try:
-            response = self.model.generate_content(user_message)
+            response = self._call_upstream(user_message, latency_budget=latency_budget)
             return response.text
-            
+        
         except Exception as e:
             print(f"❌ Error generating response: {str(e)}")
             return None
     
-    def chat(self, user_message: str) -> str:
+    def _request_options(self, deadline_at: float) -> dict:
+        """Get the request options for one attempt, capped by the request deadline."""
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Gemini request deadline exceeded")
+        return {'timeout': min(self.timeout, remaining)}
+    
+    def _on_retry(self, attempt: int, error: BaseException, delay: float):
+        """Count and log a retried upstream call."""
+        self.retries += 1
+        print(f"🔁 Gemini attempt {attempt} failed ({str(error)}), retrying in {delay:.2f}s")
+    
+    def _plan(self, user_message: str, history: Optional[List[dict]],
+              latency_budget: Optional[float]) -> List[ModelRoute]:
+        """Get the models to try for a request, in order (just the configured one without a router)."""
+        if self.router is None:
+            return [self._route]
+        
+        if latency_budget is None:
+            latency_budget = self.latency_budget
+        return self.router.plan(self._prompt_tokens(user_message, history), latency_budget)
+    
+    def _prompt_tokens(self, user_message: str, history: Optional[List[dict]] = None) -> int:
+        """Estimate the tokens of a request: system prompt, history and message."""
+        tokens = estimate_tokens(self.system_prompt) + estimate_tokens(user_message)
+        for content in history or []:
+            tokens += sum(estimate_tokens(part) for part in content['parts'])
+        return tokens
+    
+    def _upstream_model(self, route: ModelRoute, wait: bool = True):
+        """Get the model to call for a route: one referencing the cached system prompt when available."""
+        if self.prompt_cache is not None:
+            if isinstance(route.model, LazyModel):
+                # Configures the SDK the cached prompt is created with
+                route.model.load()
+            model = self.prompt_cache.model_for(route.name, self.system_prompt, wait)
+            if model is not None:
+                return model
+        return route.model
+    
+    def _failover(self, routes: List[ModelRoute], index: int, error: Exception) -> bool:
+        """Count a failed call; True if the request should fail over to the next model."""
+        UPSTREAM_ERRORS.inc(type(error).__name__)
+        if self.router is None or isinstance(error, CircuitOpenError):
+            return False
+        failover = routes[index + 1].name if index + 1 < len(routes) else None
+        self.router.record_failure(routes[index].name, failover)
+        return failover is not None
+    
+    def _call_upstream(self, user_message: str, stream: bool = False,
+                       history: Optional[List[dict]] = None,
+                       latency_budget: Optional[float] = None):
+        """
+        Call generate_content with the timeout, retry policy and circuit breaker.
+        
+        With a model router, each attempt tries the routed models in order,
+        failing over to the next one on errors and timeouts. Time spent (for
+        streams, until the response starts) is recorded as the 'upstream'
+        stage and failed calls are counted by error type.
+        
+        Args:
+            user_message (str): The user's input message
+            stream (bool): Request a streamed response
+            history: Optional earlier turns; sent through the SDK's chat
+                     support (start_chat + send_message)
+            latency_budget (float): Optional seconds the caller can wait, used
+                                    by the model router
+        
+        Returns:
+            The model's response; errors propagate once retries run out
+        """
+        deadline_at = time.monotonic() + self.deadline
+        
+        def send(model, options):
+            if history is not None:
+                return model.start_chat(history=history).send_message(
+                    user_message, stream=stream, request_options=options)
+            return model.generate_content(user_message, stream=stream,
+                                          request_options=options)
+        
+        def call(route, options):
+            model = self._upstream_model(route)
+            try:
+                return send(model, options)
+            except Exception as e:
+                # The cached prompt expired or was deleted upstream: send it instead
+                if model is route.model or not is_missing_cache_error(e):
+                    raise
+                self.prompt_cache.invalidate(route.name)
+                return send(route.model, options)
+        
+        def attempt():
+            routes = self._plan(user_message, history, latency_budget)
+            for index, route in enumerate(routes):
+                options = self._request_options(deadline_at)
+                started = time.monotonic()
+                try:
+                    if self.breaker is not None:
+                        response = self.breaker.call(lambda: call(route, options))
+                    else:
+                        response = call(route, options)
+                except Exception as e:
+                    if self._failover(routes, index, e):
+                        continue
+                    raise
+                if self.router is not None:
+                    self.router.record_success(route.name, time.monotonic() - started)
+                return response
+        
+        UPSTREAM_IN_FLIGHT.inc()
+        try:
+            with STAGE_SECONDS.time('upstream'):
+                return self.retry_policy.call(attempt, on_retry=self._on_retry, deadline=deadline_at)
+        finally:
+            UPSTREAM_IN_FLIGHT.dec()
+    
+    async def _acall_upstream(self, user_message: str, retry: bool = True,
+                              history: Optional[List[dict]] = None,
+                              latency_budget: Optional[float] = None):
+        """
+        Async version of _call_upstream.
+        
+        The timeout is also enforced on the event loop, so a hung call is
+        cancelled even if the transport doesn't honour it.
+        
+        Args:
+            user_message (str): The user's input message
+            retry (bool): Apply the retry policy; False makes a single attempt
+            history: Optional earlier turns, as for _call_upstream
+            latency_budget (float): Optional routing budget, as for _call_upstream
+        
+        Returns:
+            The model's response; errors propagate once retries run out
+        """
+        deadline_at = time.monotonic() + self.deadline
+        
+        async def send(model, options):
+            if history is not None:
+                request = model.start_chat(history=history).send_message_async(
+                    user_message, request_options=options)
+            else:
+                request = model.generate_content_async(user_message,
+                                                       request_options=options)
+            return await asyncio.wait_for(request, options['timeout'])
+        
+        async def call(route, options):
+            # Never block the event loop on caching the prompt
+            model = self._upstream_model(route, wait=False)
+            try:
+                return await send(model, options)
+            except Exception as e:
+                if model is route.model or not is_missing_cache_error(e):
+                    raise
+                self.prompt_cache.invalidate(route.name)
+                return await send(route.model, options)
+        
+        async def attempt():
+            routes = self._plan(user_message, history, latency_budget)
+            for index, route in enumerate(routes):
+                options = self._request_options(deadline_at)
+                started = time.monotonic()
+                try:
+                    if self.breaker is not None:
+                        response = await self.breaker.acall(lambda: call(route, options))
+                    else:
+                        response = await call(route, options)
+                except Exception as e:
+                    if self._failover(routes, index, e):
+                        continue
+                    raise
+                if self.router is not None:
+                    self.router.record_success(route.name, time.monotonic() - started)
+                return response
+        
+        UPSTREAM_IN_FLIGHT.inc()
+        try:
+            with STAGE_SECONDS.time('upstream'):
+                if not retry:
+                    return await attempt()
+                return await self.retry_policy.acall(attempt, on_retry=self._on_retry,
+                                                     deadline=deadline_at)
+        finally:
+            UPSTREAM_IN_FLIGHT.dec()
+    
+    def upstream_stats(self) -> dict:
+        """
+        Get retry, circuit breaker, prompt cache and routing counters for monitoring.
+        
+        Returns:
+            dict: Timeouts, retries made, circuit breaker, prompt cache and
+                  per-model routing state
+        """
+        return {
+            'timeout': self.timeout,
+            'deadline': self.deadline,
+            'max_attempts': self.retry_policy.max_attempts,
+            'retries': self.retries,
+            'prompt_cache': self.prompt_cache.stats() if self.prompt_cache is not None else None,
+            'models': self.router.stats() if self.router is not None else None,
+            'circuit_breaker': self.breaker.stats() if self.breaker is not None else None
+        }
+    
+    def cache_key(self, user_message: str, scope: str = '') -> str:
+        """
+        Get the response cache key for a message.
+        
+        With a model router the key names the model the router prefers for
+        the message's size. Replies from another model, chosen for a latency
+        budget or on failover, are cached and coalesced under that key too.
+        
+        Args:
+            user_message (str): The user's input message
+            scope (str): Optional extra key part, e.g. the moderation policy version
+        
+        Returns:
+            str: Key combining model name, system prompt and normalized message
+        """
+        model_name = self.model_name
+        if self.router is not None:
+            model_name = self.router.preferred(self._prompt_tokens(user_message)).name
+        return make_cache_key(model_name, self.system_prompt, user_message, scope)
+    
+    def coalescing_stats(self) -> Optional[dict]:
+        """
+        Get request coalescing counters for monitoring.
+        
+        Returns:
+            Optional[dict]: Calls in flight and coalesced, None if disabled
+        """
+        if self.single_flight is None:
+            return None
+        threaded = self.single_flight.stats()
+        asynchronous = self.async_single_flight.stats()
+        return {
+            'in_flight': threaded['in_flight'] + asynchronous['in_flight'],
+            'coalesced': threaded['coalesced'] + asynchronous['coalesced']
+        }
+    
+    def _cached(self, user_message: str, moderate, scope: str) -> Optional[str]:
+        """Look up a moderated response, if caching applies to this call."""
+        if moderate is None or self.cache is None:
+            return None
+        return self.cache.get(self.cache_key(user_message, scope))
+    
+    def _finish(self, user_message: str, response: Optional[str], moderate, scope: str,
+                admitted: Optional[Callable[[], bool]] = None) -> str:
+        """Apply output moderation and cache the result of a successful call (once admitted)."""
+        if response is None:
+            response = self.ERROR_MESSAGE
+            return moderate(response) if moderate else response
+        
+        if moderate is None:
+            return response
+        
+        moderated = moderate(response)
+        if self.cache is not None and (admitted is None or admitted()):
+            self.cache.set(self.cache_key(user_message, scope), moderated)
+        return moderated
+    
+    def _session_history(self, session_id: Optional[str]) -> Optional[List[dict]]:
+        """Get the SDK history for a session, or None when not in a session."""
+        if not session_id or self.sessions is None:
+            return None
+        return to_history(self.sessions.history(session_id))
+    
+    def _finish_session(self, session_id: str, user_message: str, response: Optional[str],
+                        moderate, admitted: Optional[Callable[[], bool]] = None) -> str:
+        """Moderate a session reply and add the exchange to the session's history (once admitted)."""
+        if response is None:
+            response = self.ERROR_MESSAGE
+            return moderate(response) if moderate else response
+        
+        moderated = moderate(response) if moderate else response
+        if admitted is None or admitted():
+            self.sessions.append(session_id, user_message, moderated)
+        return moderated
+    
+    def chat(self, user_message: str,
+             moderate: Optional[Callable[[str], str]] = None,
+             cache_scope: str = '',
+             session_id: Optional[str] = None,
+             latency_budget: Optional[float] = None,
+             admitted: Optional[Callable[[], bool]] = None) -> str:
         """
         Simplified chat method that always returns a string.
         
         Args:
             user_message (str): The user's input message
-            
+            moderate: Optional output filter such as moderator.moderate_output;
+                      when given, moderated responses are served from and
+                      stored in the response cache
+            cache_scope (str): Separates cached responses moderated by
+                               different policies (e.g. keyword set version)
+            session_id (str): Optional conversation id; the session's history
+                              is sent along and the exchange added to it
+                              (replies in a session are never cached)
+            latency_budget (float): Optional seconds the caller can wait, used
+                                    by the model router (GEMINI_LATENCY_BUDGET
+                                    when not given)
+            admitted: Optional wait for a concurrent input check (speculative
+                      dispatch); the response is only cached or added to the
+                      session if it returns True
+        
         Returns:
             str: AI's response or error message
         """
-        response = self.generate_response(user_message)
+        history = self._session_history(session_id)
+        if history is not None:
+            try:
+                response = self._call_upstream(user_message, history=history,
+                                               latency_budget=latency_budget).text
+            except Exception as e:
+                print(f"❌ Error generating response: {str(e)}")
+                response = None
+            return self._finish_session(session_id, user_message, response, moderate, admitted)
         
-        if response is None:
-            return "I'm sorry, I encountered an error processing your request."
+        cached = self._cached(user_message, moderate, cache_scope)
+        if cached is not None:
+            return cached
+        
+        response = self.generate_response(user_message, latency_budget)
+        return self._finish(user_message, response, moderate, cache_scope, admitted)
+    
+    async def agenerate_response(self, user_message: str,
+                                 latency_budget: Optional[float] = None) -> Optional[str]:
+        """
+        Generate a response from Gemini AI without blocking the event loop.
+        
+        Args:
+            user_message (str): The user's input message
+            latency_budget (float): Optional routing budget, as for generate_response()
+        
+        Returns:
+            Optional[str]: AI's response or None if error
+        """
+        if self.async_single_flight is None:
+            return await self._agenerate(user_message, latency_budget)
+        
+        return await self.async_single_flight.do(
+            self.cache_key(user_message), lambda: self._agenerate(user_message, latency_budget)
+        )
+    
+    async def _agenerate(self, user_message: str,
+                         latency_budget: Optional[float] = None) -> Optional[str]:
+        """Make the upstream call for agenerate_response."""
+        try:
+            response = await self._acall_upstream(user_message, latency_budget=latency_budget)
+            return response.text
+        
+        except Exception as e:
+            print(f"❌ Error generating response: {str(e)}")
+            return None
+    
+    async def agenerate_text(self, user_message: str) -> str:
+        """
+        Make a single attempt, raising upstream errors instead of returning None.
+        
+        The timeout and circuit breaker still apply. For callers with their
+        own retry handling, such as batch_runner.py.
+        
+        Args:
+            user_message (str): The user's input message
+        
+        Returns:
+            str: AI's response
+        """
+        response = await self._acall_upstream(user_message, retry=False)
+        return response.text
+    
+    async def achat(self, user_message: str,
+                    moderate: Optional[Callable[[str], str]] = None,
+                    cache_scope: str = '',
+                    session_id: Optional[str] = None,
+                    latency_budget: Optional[float] = None,
+                    admitted: Optional[Callable[[], Awaitable[bool]]] = None,
+                    moderate_in_thread: bool = False) -> str:
+        """
+        Async version of chat that always returns a string.
+        
+        Args:
+            user_message (str): The user's input message
+            moderate: Optional output filter, as for chat()
+            cache_scope (str): Cache separation, as for chat()
+            session_id (str): Optional conversation id, as for chat()
+            latency_budget (float): Optional routing budget, as for chat()
+            admitted: Optional coroutine function waiting for a concurrent
+                      input check (SpeculativeDispatcher.arun); the response
+                      is only cached or added to the session if it returns True
+            moderate_in_thread (bool): Run `moderate` on a worker thread, for
+                                       filters too slow for the event loop
+        
+        Returns:
+            str: AI's response or error message
+        """
+        async def approval() -> Optional[Callable[[], bool]]:
+            # The stores are synchronous, so wait for the verdict before them
+            if admitted is None:
+                return None
+            approved = await admitted()
+            return lambda: approved
+        
+        async def finish(func, *args) -> str:
+            if moderate_in_thread and moderate is not None:
+                return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+            return func(*args)
+        
+        history = self._session_history(session_id)
+        if history is not None:
+            try:
+                response = (await self._acall_upstream(user_message, history=history,
+                                                       latency_budget=latency_budget)).text
+            except Exception as e:
+                print(f"❌ Error generating response: {str(e)}")
+                response = None
+            return await finish(self._finish_session, session_id, user_message, response, moderate,
+                                await approval())
+        
+        cached = self._cached(user_message, moderate, cache_scope)
+        if cached is not None:
+            return cached
+        
+        response = await self.agenerate_response(user_message, latency_budget)
+        return await finish(self._finish, user_message, response, moderate, cache_scope,
+                            await approval())
+    
+    def generate_response_stream(self, user_message: str) -> Iterator[str]:
+        """
+        Generate a response from Gemini AI, yielding text as it arrives.
+        
+        Args:
+            user_message (str): The user's input message
+        
+        Yields:
+            str: Response text chunks; stops early if an error occurs
+        """
+        try:
+            yield from self._stream_chunks(user_message)
+        
+        except Exception as e:
+            print(f"❌ Error streaming response: {str(e)}")
+    
+    def _stream_chunks(self, user_message: str, history: Optional[List[dict]] = None,
+                       latency_budget: Optional[float] = None) -> Iterator[str]:
+        """Yield response text chunks, letting errors propagate."""
+        response = self._call_upstream(user_message, stream=True, history=history,
+                                       latency_budget=latency_budget)
+        try:
+            for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(type(e).__name__)
+            raise
+    
+    def chat_stream(self, user_message: str,
+                    moderate_stream: Optional[Callable[[Iterable[str]], Iterator[str]]] = None,
+                    cache_scope: str = '',
+                    session_id: Optional[str] = None,
+                    latency_budget: Optional[float] = None) -> Iterator[str]:
+        """
+        Streaming chat method that always yields some text.
+        
+        Args:
+            user_message (str): The user's input message
+            moderate_stream: Optional stream filter such as
+                             moderator.moderate_stream; when given, complete
+                             moderated responses are served from and stored
+                             in the response cache
+            cache_scope (str): Cache separation, as for chat()
+            session_id (str): Optional conversation id, as for chat()
+            latency_budget (float): Optional routing budget, as for chat()
+        
+        Yields:
+            str: AI's response chunks, or the error message if nothing arrived
+        """
+        history = self._session_history(session_id)
+        if history is None:
+            cached = self._cached(user_message, moderate_stream, cache_scope)
+            if cached is not None:
+                yield cached
+                return
+        
+        # Only responses that streamed to the end without error are cached
+        # (or added to the session)
+        completed = []
+        
+        def chunks():
+            has_output = False
+            try:
+                for chunk in self._stream_chunks(user_message, history, latency_budget):
+                    has_output = True
+                    yield chunk
+                if has_output:
+                    completed.append(True)
+            except Exception as e:
+                print(f"❌ Error streaming response: {str(e)}")
+            
+            if not has_output:
+                yield self.ERROR_MESSAGE
+        
+        stream = chunks()
+        if moderate_stream is not None:
+            stream = moderate_stream(stream)
+        
+        parts = []
+        for chunk in stream:
+            parts.append(chunk)
+            yield chunk
         
-        return response
+        if not completed:
+            return
+        if history is not None:
+            self.sessions.append(session_id, user_message, ''.join(parts))
+        elif moderate_stream is not None and self.cache is not None:
+            self.cache.set(self.cache_key(user_message, cache_scope), ''.join(parts))
 
 
 if __name__ == "__main__":
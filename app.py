@@ -3,11 +3,21 @@ Flask Web Application for AI Moderation App
 Web interface for chatting with Gemini AI with content moderation
 """
 
+import gc
+import hashlib
 import os
-from flask import Flask, render_template, request, jsonify
+import json
+from typing import Any, Callable, Optional, Tuple
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
 from dotenv import load_dotenv
+from admission import AdmissionRejected, Ticket, create_admission_from_env
 from ai_client import AIClient
+from keyword_store import watch_from_env
+from metrics import METRICS, observe_client, observe_verdict_cache, outcome_for_status, track_request
 from moderation import ContentModerator
+from speculative import create_speculator_from_env
+from tenant_policies import create_policies_from_env
+from verdict_cache import create_verdict_cache_from_env
 
 # Load environment variables
 load_dotenv()
@@ -16,15 +26,403 @@ load_dotenv()
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 
-# Initialize AI client and moderator
+# Maximum number of texts accepted by /moderate/batch
+MODERATION_BATCH_LIMIT = int(os.getenv('MODERATION_BATCH_LIMIT', 1000))
+
+# Longest conversation id accepted in chat requests
+MAX_SESSION_ID_LENGTH = 128
+
+# Worker processes for /moderate/batch; only batches of at least
+# ContentModerator.BATCH_PROCESS_THRESHOLD texts are split across them
+MODERATION_BATCH_PROCESSES = int(os.getenv('MODERATION_BATCH_PROCESSES', 1))
+
+# Initialize the moderator; it doesn't need Gemini, so /moderate/batch and
+# /keywords keep working when the AI client can't be created
+try:
+    # Verdicts for repeated texts (greetings, template replies) are cached per keyword set version
+    moderator = ContentModerator(match_mode=os.getenv('MODERATION_MODE', ContentModerator.SUBSTRING_MODE),
+                                 verdict_cache=create_verdict_cache_from_env())
+    observe_verdict_cache(moderator)
+except Exception as e:
+    print(f"❌ Error initializing moderator: {str(e)}")
+    moderator = None
+
+# Keywords from KEYWORDS_PATH, reloaded in the background when the files change
+try:
+    keyword_watcher = watch_from_env(moderator) if moderator is not None else None
+except Exception as e:
+    print(f"❌ Error loading keywords: {str(e)}")
+    keyword_watcher = None
+
+# Per-tenant keyword policies from TENANTS_PATH, on top of the shared keywords
+try:
+    tenant_policies = create_policies_from_env(moderator) if moderator is not None else None
+    if tenant_policies is not None:
+        METRICS.gauge('tenant_policy_cache_hit_ratio', 'Tenant policy lookups served from cache',
+                      function=lambda: {(): tenant_policies.hits / max(
+                          tenant_policies.hits + tenant_policies.misses, 1)})
+except Exception as e:
+    print(f"❌ Error loading tenant policies: {str(e)}")
+    tenant_policies = None
+
+# Initialize AI client
 try:
     ai_client = AIClient()
-    moderator = ContentModerator()
+    # Cache hit ratios, retries and breaker state, read on every /metrics scrape
+    observe_client(ai_client)
+    # Optionally start Gemini requests while the input is still being moderated
+    speculator = create_speculator_from_env()
+    # Cap concurrent chat requests and shed the backlog early when Gemini slows down
+    admission = create_admission_from_env()
+    # The SDK and model load on the first request unless pre-warmed here
+    if os.getenv('GEMINI_PREWARM', 'false').lower() == 'true':
+        ai_client.warm()
     print("✅ Flask app initialized successfully")
 except Exception as e:
     print(f"❌ Error initializing app: {str(e)}")
     ai_client = None
-    moderator = None
+    speculator = None
+    admission = None
+
+
+def warm_up():
+    """
+    Compile the keyword matchers and load the Gemini SDK and models now
+    instead of on the first request.
+    
+    For pre-fork servers: run it in the master process (see before_fork)
+    and every worker forks with them already built. It makes no network calls.
+    """
+    if moderator is not None:
+        moderator.warm()
+    if tenant_policies is not None:
+        tenant_policies.warm()
+    if ai_client is not None:
+        ai_client.warm()
+
+
+def before_fork():
+    """
+    Prepare the master process of a pre-fork server for forking workers.
+    
+    Builds the shared state (warm_up), stops the keyword watcher thread,
+    which wouldn't survive the fork, and freezes the garbage collector so
+    collections in the workers don't write to, and so copy, the pages
+    they share with the master.
+    """
+    warm_up()
+    if keyword_watcher is not None:
+        keyword_watcher.stop()
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork():
+    """
+    Set up a forked worker: restart the keyword watcher and reconnect SQLite stores.
+    """
+    if keyword_watcher is not None:
+        keyword_watcher.start()
+    if ai_client is not None:
+        for store in (ai_client.cache, ai_client.sessions):
+            if store is not None:
+                store.reopen()
+
+
+def moderator_for_request(tenant_id: Optional[str] = None, api_key: Optional[str] = None
+                          ) -> Tuple[Optional[ContentModerator], Optional[dict], int]:
+    """
+    Select the moderator for a request's tenant.
+    
+    Requests without X-Tenant-ID / X-API-Key headers (or any request when no
+    tenants are configured) use the shared moderator, which is None if the
+    app failed to initialize.
+    
+    Args:
+        tenant_id (str): Value of the X-Tenant-ID header, if any
+        api_key (str): Value of the X-API-Key header, if any
+    
+    Returns:
+        Tuple[Optional[ContentModerator], Optional[dict], int]: (moderator, error, status)
+    """
+    if moderator is None or tenant_policies is None or not (tenant_id or api_key):
+        return moderator, None, 200
+    
+    tenant = tenant_policies.resolve(tenant_id, api_key)
+    if tenant is None:
+        return None, {
+            'success': False,
+            'error': 'Unknown tenant or API key.'
+        }, 403
+    
+    return tenant_policies.moderator_for(tenant), None, 200
+
+
+def request_moderator() -> Tuple[Optional[ContentModerator], Optional[dict], int]:
+    """Select the moderator for the current Flask request's tenant headers."""
+    return moderator_for_request(request.headers.get('X-Tenant-ID'),
+                                 request.headers.get('X-API-Key'))
+
+
+def chat_message(data) -> str:
+    """Get the stripped user message from a chat request body ('' if missing)."""
+    user_message = data.get('message', '') if isinstance(data, dict) else ''
+    return user_message.strip() if isinstance(user_message, str) else ''
+
+
+def check_chat_request(data, active_moderator: Optional[ContentModerator] = None
+                       ) -> Tuple[Optional[str], Optional[dict], int]:
+    """
+    Validate a chat request body and moderate the user message.
+    
+    Shared by the Flask routes and the ASGI entry point in asgi.py.
+    
+    Args:
+        data: Parsed JSON request body
+        active_moderator: Tenant's moderator; the shared one if None
+    
+    Returns:
+        Tuple[Optional[str], Optional[dict], int]: (user_message, error, status)
+            - user_message: Approved message, None if rejected
+            - error: JSON error payload if rejected, None if approved
+            - status: HTTP status code for the error
+    """
+    # Check if services are initialized
+    if ai_client is None or moderator is None:
+        return None, {
+            'success': False,
+            'error': 'AI services not initialized. Check your GOOGLE_GEMINI_KEY.'
+        }, 500
+    
+    # Get user message from request
+    user_message = chat_message(data)
+    
+    if not user_message:
+        return None, {
+            'success': False,
+            'error': 'Please enter a message.'
+        }, 400
+    
+    # Moderate input
+    active_moderator = active_moderator or moderator
+    is_approved, moderation_message = active_moderator.moderate_input(user_message)
+    
+    if not is_approved:
+        return None, {
+            'success': False,
+            'error': moderation_message
+        }, 400
+    
+    return user_message, None, 200
+
+
+def dispatch_chat_request(data, active_moderator: ContentModerator,
+                          call: Callable[[str, Optional[Callable[[], bool]]], Any],
+                          client: str = '', streaming: bool = False
+                          ) -> Tuple[Any, Optional[Ticket], Optional[dict], int]:
+    """
+    Validate and moderate a chat request, admit it and make its upstream call.
+    
+    Without speculative dispatch the request waits for an upstream slot
+    once the input is approved, then makes the call. With it, the request
+    waits for a slot once the message is known, and the call runs while
+    the input is moderated. Either way, invalid input never takes a slot
+    and rejected input never gets the call's result.
+    
+    Args:
+        data: Parsed JSON request body
+        active_moderator: Tenant's moderator
+        call: Makes the upstream call: (user_message, admitted) -> result,
+              where admitted (None unless speculative) waits for the verdict
+        client (str): Client identifier from admission_client()
+        streaming (bool): The call returns a not yet started stream of chunks
+    
+    Returns:
+        Tuple[Any, Optional[Ticket], Optional[dict], int]: (result, ticket, error, status)
+            - result: The call's result, None if rejected
+            - ticket: Upstream slot to release once the result is consumed,
+                      None if rejected or admission control is off
+            - error: JSON error payload if rejected or shed, None if approved
+            - status: HTTP status code for the error
+    """
+    user_message = chat_message(data)
+    speculate = (speculator is not None and ai_client is not None and moderator is not None
+                 and user_message)
+    if not speculate:
+        user_message, error, status = check_chat_request(data, active_moderator)
+        if error is not None:
+            return None, None, error, status
+    
+    # Wait for an upstream slot, or shed the request while the client can still retry
+    ticket, error, status = admit_chat_request(client, data)
+    if error is not None:
+        return None, None, error, status
+    
+    def check():
+        return check_chat_request(data, active_moderator)
+    
+    def is_approved(verdict):
+        return verdict[1] is None
+    
+    try:
+        if not speculate:
+            return call(user_message, None), ticket, None, 200
+        if streaming:
+            verdict, result = speculator.stream(check, call(user_message, None), is_approved)
+        else:
+            verdict, result = speculator.run(check, lambda admitted: call(user_message, admitted),
+                                             is_approved)
+    except BaseException:
+        if ticket is not None:
+            ticket.release()
+        raise
+    
+    _, error, status = verdict
+    if error is not None and ticket is not None:
+        ticket.release()
+        ticket = None
+    return result, ticket, error, status
+
+
+def admission_client(api_key: Optional[str] = None, tenant_id: Optional[str] = None,
+                     remote_addr: Optional[str] = None) -> str:
+    """Identify a request's client for fair queueing: API key, then tenant, then address."""
+    if api_key:
+        return f'key:{api_key}'
+    if tenant_id:
+        return f'tenant:{tenant_id}'
+    return f'addr:{remote_addr or ""}'
+
+
+def admit_chat_request(client: str, data) -> Tuple[Optional[Ticket], Optional[dict], int]:
+    """
+    Wait for a slot to make a chat request's upstream call.
+    
+    Args:
+        client (str): Client identifier from admission_client()
+        data: Parsed JSON request body (its latency budget bounds the wait)
+    
+    Returns:
+        Tuple[Optional[Ticket], Optional[dict], int]: (ticket, error, status)
+            - ticket: Slot to release when done, None if shed or admission
+                      control is off
+            - error: JSON error payload with retry_after if shed, None otherwise
+            - status: 429 or 503 if shed
+    """
+    if admission is None:
+        return None, None, 200
+    try:
+        return admission.acquire(client, latency_budget_for(data)), None, 200
+    except AdmissionRejected as e:
+        return None, shed_error(e), e.status
+
+
+def shed_error(rejection: AdmissionRejected) -> dict:
+    """Build the JSON error payload for a request shed by admission control."""
+    return {
+        'success': False,
+        'error': 'Too many requests, please try again shortly.'
+                 if rejection.status == 429 else 'Server busy, please try again shortly.',
+        'retry_after': rejection.retry_after
+    }
+
+
+def retry_headers(error: dict) -> dict:
+    """Get the Retry-After header for an error payload from shed_error() (none for others)."""
+    return {'Retry-After': str(error['retry_after'])} if 'retry_after' in error else {}
+
+
+def request_admission_client() -> str:
+    """Identify the current Flask request's client for fair queueing."""
+    return admission_client(request.headers.get('X-API-Key'),
+                            request.headers.get('X-Tenant-ID'), request.remote_addr)
+
+
+def session_owner(api_key: Optional[str] = None, tenant_id: Optional[str] = None) -> str:
+    """
+    Identify whose conversations a request may continue: API key, then tenant.
+    
+    The API key is hashed, as the owner ends up in the session store.
+    Requests with neither header share one namespace of session ids.
+    """
+    if api_key:
+        return 'key:' + hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:32]
+    if tenant_id:
+        return f'tenant:{tenant_id}'
+    return ''
+
+
+def request_session_owner() -> str:
+    """Identify the current Flask request's session owner."""
+    return session_owner(request.headers.get('X-API-Key'), request.headers.get('X-Tenant-ID'))
+
+
+def session_id_for(data, owner: str = '') -> Optional[str]:
+    """
+    Get the conversation id from a chat request body.
+    
+    Args:
+        data: Parsed JSON request body
+        owner (str): Session owner from session_owner(); sessions are kept
+                     per owner, so one tenant can't continue another's
+                     conversation by sending its session id
+    
+    Returns:
+        Optional[str]: Session store key, or None for a one-off message
+                       (session id missing, not a string or longer than
+                       MAX_SESSION_ID_LENGTH)
+    """
+    session_id = data.get('session_id') if isinstance(data, dict) else None
+    if not isinstance(session_id, str) or not 0 < len(session_id) <= MAX_SESSION_ID_LENGTH:
+        return None
+    return f'{owner}/{session_id}' if owner else session_id
+
+
+def latency_budget_for(data) -> Optional[float]:
+    """
+    Get the latency budget from a chat request body.
+    
+    Args:
+        data: Parsed JSON request body
+    
+    Returns:
+        Optional[float]: Seconds the client can wait, or None (missing or
+                         not a positive number) for the server default
+    """
+    budget = data.get('latency_budget') if isinstance(data, dict) else None
+    if isinstance(budget, bool) or not isinstance(budget, (int, float)) or budget <= 0:
+        return None
+    return float(budget)
+
+
+# Endpoints left out of request metrics
+UNTRACKED_ENDPOINTS = {'index', 'metrics', 'health', 'static', None}
+
+
+@app.before_request
+def start_request_metrics():
+    """Count the request as in flight and start timing it."""
+    if request.endpoint not in UNTRACKED_ENDPOINTS:
+        g.tracked = track_request(request.endpoint).__enter__()
+
+
+@app.after_request
+def record_request_outcome(response):
+    """Record the outcome from the response status."""
+    tracked = g.get('tracked')
+    if tracked is not None:
+        tracked.outcome = outcome_for_status(response.status_code)
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    """Finish timing the request (streamed responses: until streaming starts)."""
+    tracked = g.pop('tracked', None)
+    if tracked is not None:
+        if error is not None:
+            tracked.outcome = 'error'
+        tracked.__exit__(None, None, None)
 
 
 @app.route('/')
@@ -38,54 +436,52 @@ def chat():
     """
     Handle chat requests from the web interface.
     
-    Expected JSON: {"message": "user message"}
+    Expected JSON: {"message": "user message", "session_id": str (optional),
+                    "latency_budget": seconds (optional)}
     Returns JSON: {"success": bool, "response": str, "error": str (optional)}
     """
     try:
-        # Check if services are initialized
-        if ai_client is None or moderator is None:
-            return jsonify({
-                'success': False,
-                'error': 'AI services not initialized. Check your GOOGLE_GEMINI_KEY.'
-            }), 500
+        active_moderator, error, status = request_moderator()
         
-        # Get user message from request
-        data = request.get_json()
-        user_message = data.get('message', '').strip()
+        if error is not None:
+            return jsonify(error), status
         
-        if not user_message:
-            return jsonify({
-                'success': False,
-                'error': 'Please enter a message.'
-            }), 400
+        data = request.get_json()
+        session_id = session_id_for(data, request_session_owner())
         
-        # Moderate input
-        is_approved, moderation_message = moderator.moderate_input(user_message)
+        # Get AI response with output moderation (served from cache when possible,
+        # sent with the conversation's history when in a session)
+        def call(user_message, admitted):
+            return ai_client.chat(user_message,
+                                  moderate=active_moderator.moderate_output,
+                                  cache_scope=active_moderator.keyword_set.version,
+                                  session_id=session_id,
+                                  latency_budget=latency_budget_for(data),
+                                  admitted=admitted)
         
-        if not is_approved:
-            return jsonify({
-                'success': False,
-                'error': moderation_message
-            }), 400
+        # Validate and moderate the user message, then wait for an upstream slot
+        # (with the AI call already under way when speculative dispatch is on)
+        moderated_response, ticket, error, status = dispatch_chat_request(
+            data, active_moderator, call, request_admission_client()
+        )
+        if ticket is not None:
+            ticket.release()
         
-        # Get AI response
-        ai_response = ai_client.chat(user_message)
+        if error is not None:
+            return jsonify(error), status, retry_headers(error)
         
-        if ai_response is None:
+        if moderated_response is None:
             return jsonify({
                 'success': False,
                 'error': 'Failed to get response from AI.'
             }), 500
         
-        # Moderate output
-        moderated_response = moderator.moderate_output(ai_response)
-        
         # Return response
         return jsonify({
             'success': True,
             'response': moderated_response
         })
-        
+    
     except Exception as e:
         print(f"Error in /chat endpoint: {str(e)}")
         return jsonify({
@@ -94,29 +490,165 @@ def chat():
         }), 500
 
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Handle streaming chat requests from the web interface.
+    
+    Expected JSON: {"message": "user message", "session_id": str (optional),
+                    "latency_budget": seconds (optional)}
+    Returns: Server-sent events, each `data: {"chunk": str}`, ending with
+             `data: {"done": true}`; errors before streaming are JSON like /chat
+    """
+    try:
+        active_moderator, error, status = request_moderator()
+        
+        if error is not None:
+            return jsonify(error), status
+        
+        data = request.get_json()
+        session_id = session_id_for(data, request_session_owner())
+        
+        # Moderate output chunk by chunk as it streams in
+        def call(user_message, admitted):
+            return ai_client.chat_stream(user_message,
+                                         moderate_stream=active_moderator.moderate_stream,
+                                         cache_scope=active_moderator.keyword_set.version,
+                                         session_id=session_id,
+                                         latency_budget=latency_budget_for(data))
+        
+        # Validate and moderate the user message, then wait for an upstream
+        # slot, held until the stream is closed
+        chunks, ticket, error, status = dispatch_chat_request(
+            data, active_moderator, call, request_admission_client(), streaming=True
+        )
+        
+        if error is not None:
+            return jsonify(error), status, retry_headers(error)
+        
+        try:
+            def generate():
+                for chunk in chunks:
+                    yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+                yield f"data: {json.dumps({'done': True})}\n\n"
+            
+            response = Response(
+                stream_with_context(generate()),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+            if ticket is not None:
+                response.call_on_close(ticket.release)
+                ticket = None
+            return response
+        finally:
+            if ticket is not None:
+                ticket.release()
+    
+    except Exception as e:
+        print(f"Error in /chat/stream endpoint: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Server error: {str(e)}'
+        }), 500
+
+
+@app.route('/moderate/batch', methods=['POST'])
+def moderate_batch():
+    """
+    Moderate many texts without calling the AI.
+    
+    Expected JSON: {"texts": ["text", ...]}
+    Returns JSON: {"success": bool, "results": [{"is_safe": bool,
+                   "violations": [str], "moderated": str}, ...]}
+    """
+    if moderator is None:
+        return jsonify({
+            'success': False,
+            'error': 'Moderator not initialized'
+        }), 500
+    
+    active_moderator, error, status = request_moderator()
+    
+    if error is not None:
+        return jsonify(error), status
+    
+    data = request.get_json(silent=True)
+    texts = data.get('texts') if isinstance(data, dict) else None
+    
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return jsonify({
+            'success': False,
+            'error': 'Expected JSON body {"texts": [string, ...]}.'
+        }), 400
+    
+    if len(texts) > MODERATION_BATCH_LIMIT:
+        return jsonify({
+            'success': False,
+            'error': f'Too many texts: at most {MODERATION_BATCH_LIMIT} per request.'
+        }), 413
+    
+    results = [
+        {'is_safe': is_safe, 'violations': violations, 'moderated': moderated}
+        for is_safe, violations, moderated in active_moderator.moderate_batch(
+            texts, processes=MODERATION_BATCH_PROCESSES)
+    ]
+    
+    return jsonify({
+        'success': True,
+        'results': results
+    })
+
+
 @app.route('/health')
 def health():
     """Health check endpoint."""
     status = {
         'status': 'healthy',
         'ai_client': ai_client is not None,
-        'moderator': moderator is not None
+        'moderator': moderator is not None,
+        'response_cache': (ai_client.cache.stats()
+                           if ai_client is not None and ai_client.cache is not None
+                           else None),
+        'request_coalescing': ai_client.coalescing_stats() if ai_client is not None else None,
+        'upstream': ai_client.upstream_stats() if ai_client is not None else None,
+        'chat_sessions': (ai_client.sessions.stats()
+                          if ai_client is not None and ai_client.sessions is not None
+                          else None),
+        'keywords': moderator.keyword_info() if moderator is not None else None,
+        'verdict_cache': moderator.verdict_cache_stats() if moderator is not None else None,
+        'tenants': tenant_policies.stats() if tenant_policies is not None else None,
+        'admission': admission.stats() if admission is not None else None
     }
     return jsonify(status)
 
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics: request counts, stage latencies, upstream errors and caches."""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/keywords')
 def keywords():
-    """Get list of blocked keywords."""
+    """Get list of blocked keywords (for the request's tenant, if any)."""
     if moderator is None:
         return jsonify({
             'success': False,
             'error': 'Moderator not initialized'
         }), 500
     
+    active_moderator, error, status = request_moderator()
+    
+    if error is not None:
+        return jsonify(error), status
+    
+    info = active_moderator.keyword_info()
     return jsonify({
         'success': True,
-        'keywords': moderator.get_blocked_keywords()
+        'keywords': active_moderator.get_blocked_keywords(),
+        'version': info['version'],
+        'source': info['source']
     })
 
 
@@ -0,0 +1,194 @@
+"""
+ASGI Entry Point for AI Moderation App
+Serves /chat on asyncio so thousands of Gemini round trips can share one process
+"""
+
+import asyncio
+import json
+from asgiref.wsgi import WsgiToAsgi
+
+import app as web
+from admission import AdmissionRejected
+from metrics import outcome_for_status, track_request
+from moderation import ContentModerator
+
+# Every other route is served by the Flask app on a thread pool
+flask_asgi = WsgiToAsgi(web.app)
+
+
+async def read_body(receive) -> bytes:
+    """
+    Read the full request body from an ASGI receive channel.
+    
+    Args:
+        receive: ASGI receive callable
+    
+    Returns:
+        bytes: Request body
+    """
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return body
+
+
+async def send_json(send, payload: dict, status: int = 200, headers: dict = None):
+    """
+    Send a JSON response on an ASGI send channel.
+    
+    Args:
+        send: ASGI send callable
+        payload (dict): JSON-serializable response body
+        status (int): HTTP status code
+        headers (dict): Extra response headers
+    """
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii')),
+        ] + [(name.lower().encode('latin-1'), value.encode('latin-1'))
+             for name, value in (headers or {}).items()],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def moderates_in_thread(moderator: ContentModerator) -> bool:
+    """
+    Decide whether a moderator's checks should run on a worker thread.
+    
+    A short list in substring mode is checked in microseconds, less than
+    the hop to a thread costs; word mode and matcher-sized lists can take
+    long enough on long texts to stall every request on the event loop.
+    
+    Args:
+        moderator (ContentModerator): Moderator for the request
+    
+    Returns:
+        bool: True to run input and output moderation off the event loop
+    """
+    return (moderator.match_mode == ContentModerator.WORD_MODE
+            or len(moderator.keyword_set.keywords) >= ContentModerator.MATCHER_THRESHOLD)
+
+
+async def chat(scope, receive, send):
+    """
+    Handle chat requests without holding a thread during the Gemini call.
+    
+    Same request and response JSON as the Flask /chat route.
+    """
+    with track_request('chat') as tracked:
+        await _chat(scope, receive, send, tracked)
+
+
+async def _chat(scope, receive, send, tracked: track_request):
+    """Body of chat(), recording the outcome on `tracked`."""
+    try:
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                   for name, value in scope.get('headers', [])}
+        active_moderator, error, status = web.moderator_for_request(
+            headers.get('x-tenant-id'), headers.get('x-api-key')
+        )
+        
+        if error is not None:
+            tracked.outcome = outcome_for_status(status)
+            await send_json(send, error, status)
+            return
+        
+        try:
+            data = json.loads(await read_body(receive) or b'null')
+        except ValueError:
+            data = None
+        
+        client = web.admission_client(headers.get('x-api-key'), headers.get('x-tenant-id'),
+                                      (scope.get('client') or ('',))[0])
+        owner = web.session_owner(headers.get('x-api-key'), headers.get('x-tenant-id'))
+        await _respond(send, tracked, data, active_moderator, client, owner)
+    
+    except Exception as e:
+        print(f"Error in async /chat endpoint: {str(e)}")
+        tracked.outcome = 'error'
+        await send_json(send, {
+            'success': False,
+            'error': f'Server error: {str(e)}'
+        }, 500)
+
+
+async def _respond(send, tracked: track_request, data, active_moderator, client: str,
+                   owner: str = ''):
+    """Moderate a chat request, admit it, call Gemini and send the response."""
+    in_thread = moderates_in_thread(active_moderator)
+    
+    # Get AI response with output moderation (served from cache when possible)
+    def call(user_message, admitted=None):
+        return web.ai_client.achat(
+            user_message, moderate=active_moderator.moderate_output,
+            cache_scope=active_moderator.keyword_set.version,
+            session_id=web.session_id_for(data, owner),
+            latency_budget=web.latency_budget_for(data),
+            admitted=admitted,
+            moderate_in_thread=in_thread
+        )
+    
+    # Validate and moderate the user message before it takes an upstream slot;
+    # with speculative dispatch only validation comes first, and moderation
+    # runs alongside the AI call, which is cancelled if the input is rejected
+    user_message = web.chat_message(data)
+    speculate = web.speculator is not None and web.ai_client is not None and user_message
+    if not speculate:
+        if in_thread:
+            user_message, error, status = await asyncio.get_running_loop().run_in_executor(
+                None, web.check_chat_request, data, active_moderator)
+        else:
+            user_message, error, status = web.check_chat_request(data, active_moderator)
+        if error is not None:
+            tracked.outcome = outcome_for_status(status)
+            await send_json(send, error, status)
+            return
+    
+    # Wait for an upstream slot without holding a thread, or shed the request
+    ticket = None
+    if web.admission is not None:
+        try:
+            ticket = await web.admission.acquire_async(client, web.latency_budget_for(data))
+        except AdmissionRejected as e:
+            error = web.shed_error(e)
+            tracked.outcome = outcome_for_status(e.status)
+            await send_json(send, error, e.status, web.retry_headers(error))
+            return
+    
+    try:
+        if speculate:
+            (_, error, status), moderated_response = await web.speculator.arun(
+                lambda: web.check_chat_request(data, active_moderator),
+                lambda admitted: call(user_message, admitted),
+                is_approved=lambda verdict: verdict[1] is None
+            )
+        else:
+            error, moderated_response = None, await call(user_message)
+    finally:
+        if ticket is not None:
+            ticket.release()
+    
+    if error is not None:
+        tracked.outcome = outcome_for_status(status)
+        await send_json(send, error, status)
+        return
+    
+    await send_json(send, {
+        'success': True,
+        'response': moderated_response
+    })
+
+
+async def application(scope, receive, send):
+    """ASGI application: async /chat, everything else through Flask."""
+    if scope['type'] == 'http' and scope['path'] == '/chat' and scope['method'] == 'POST':
+        await chat(scope, receive, send)
+    else:
+        await flask_asgi(scope, receive, send)
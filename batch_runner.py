@@ -0,0 +1,169 @@
+"""
+Batch Runner Module
+Replays JSONL prompts through the full moderation + Gemini pipeline concurrently
+"""
+
+import asyncio
+import json
+import sys
+import time
+from typing import Optional
+
+from ai_client import AIClient
+from moderation import ContentModerator
+from rate_limiter import TokenBucket
+from retry import RetryPolicy
+from verdict_cache import create_verdict_cache_from_env
+
+
+async def run_prompt(line_number: int, record: dict, field: str, id_field: str,
+                     ai_client: AIClient, moderator: ContentModerator,
+                     bucket: TokenBucket, retry_policy: RetryPolicy) -> dict:
+    """
+    Run one prompt through moderate_input -> Gemini -> moderate_output.
+    
+    Args:
+        line_number (int): Input line number, copied to the result
+        record (dict): Parsed input record
+        field (str): Record field holding the prompt
+        id_field (str): Record field copied to the result as `id`
+        ai_client (AIClient): Client making the Gemini calls
+        moderator (ContentModerator): Moderator for input and output
+        bucket (TokenBucket): Rate limiter, one token per upstream attempt
+        retry_policy (RetryPolicy): Backoff for transient errors
+    
+    Returns:
+        dict: Result with status ok, blocked or error
+    """
+    result = {'line': line_number}
+    if id_field in record:
+        result['id'] = record[id_field]
+    
+    prompt = record.get(field)
+    if not isinstance(prompt, str) or not prompt.strip():
+        result.update(status='error', error=f'missing "{field}"')
+        return result
+    
+    is_approved, moderation_message = moderator.moderate_input(prompt)
+    if not is_approved:
+        result.update(status='blocked', error=moderation_message)
+        return result
+    
+    attempts = 0
+    
+    async def attempt():
+        nonlocal attempts
+        attempts += 1
+        await bucket.acquire_async()
+        return await ai_client.agenerate_text(prompt)
+    
+    start = time.perf_counter()
+    try:
+        response = await retry_policy.acall(attempt)
+        result.update(status='ok', response=moderator.moderate_output(response))
+    except Exception as e:
+        result.update(status='error', error=f'{type(e).__name__}: {str(e)}')
+    
+    result['attempts'] = attempts
+    result['latency_ms'] = round((time.perf_counter() - start) * 1e3, 1)
+    return result
+
+
+async def run_jsonl_async(in_path: str, out_path: str, ai_client: AIClient,
+                          moderator: ContentModerator, field: str = 'prompt',
+                          id_field: str = 'id', concurrency: int = 8,
+                          requests_per_minute: float = 60.0, burst: Optional[float] = None,
+                          max_attempts: int = 5) -> dict:
+    """
+    Run every prompt of a JSONL file, keeping `concurrency` requests in flight.
+    
+    Results are written as they complete, tagged with the input line
+    number and id, so a slow prompt never holds back the others.
+    
+    Args:
+        in_path (str): Input JSONL file
+        out_path (str): Output JSONL file
+        ai_client (AIClient): Client making the Gemini calls
+        moderator (ContentModerator): Moderator for input and output
+        field (str): Record field holding the prompt
+        id_field (str): Record field copied to the output as `id`
+        concurrency (int): Requests in flight at once
+        requests_per_minute (float): Upstream quota for the token bucket
+        burst (float): Token bucket capacity
+        max_attempts (int): Attempts per prompt for transient errors
+    
+    Returns:
+        dict: Counts per status, elapsed seconds and prompts/sec
+    """
+    bucket = TokenBucket.per_minute(requests_per_minute, burst)
+    retry_policy = RetryPolicy(max_attempts=max_attempts)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    counts = {'ok': 0, 'blocked': 0, 'error': 0}
+    start = time.perf_counter()
+    
+    with open(in_path, 'r', encoding='utf-8') as source, \
+            open(out_path, 'w', encoding='utf-8') as output:
+        
+        async def reader():
+            for line_number, line in enumerate(source, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                await queue.put((line_number, record if isinstance(record, dict) else None))
+            for _ in range(concurrency):
+                await queue.put(None)
+        
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                line_number, record = item
+                if record is None:
+                    result = {'line': line_number, 'status': 'error', 'error': 'invalid JSON'}
+                else:
+                    result = await run_prompt(line_number, record, field, id_field, ai_client,
+                                              moderator, bucket, retry_policy)
+                output.write(json.dumps(result, ensure_ascii=False) + '\n')
+                counts[result['status']] += 1
+                
+                done = sum(counts.values())
+                if done % 100 == 0:
+                    rate = done / (time.perf_counter() - start)
+                    print(f"\r🚀 {done:,} prompts ({rate:,.1f}/s)", end='', file=sys.stderr, flush=True)
+        
+        await asyncio.gather(reader(), *(worker() for _ in range(concurrency)))
+    
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    summary = dict(counts, total=total, seconds=round(elapsed, 3),
+                   prompts_per_sec=round(total / elapsed, 1) if elapsed else 0.0)
+    print(f"\r🚀 {total:,} prompts ({summary['prompts_per_sec']:,.1f}/s): "
+          f"{counts['ok']} ok, {counts['blocked']} blocked, {counts['error']} errors",
+          file=sys.stderr)
+    return summary
+
+
+def run_jsonl(in_path: str, out_path: str, ai_client: Optional[AIClient] = None,
+              moderator: Optional[ContentModerator] = None, **options) -> dict:
+    """
+    Synchronous wrapper around run_jsonl_async.
+    
+    Args:
+        in_path (str): Input JSONL file
+        out_path (str): Output JSONL file
+        ai_client (AIClient): Client to use; built from the environment if None
+        moderator (ContentModerator): Moderator to use; default (with the
+                                      VERDICT_CACHE_* verdict cache) if None
+        **options: Passed through to run_jsonl_async
+    
+    Returns:
+        dict: Summary from run_jsonl_async
+    """
+    ai_client = ai_client or AIClient()
+    # Replayed prompts repeat, so the default moderator caches verdicts
+    moderator = moderator or ContentModerator(verdict_cache=create_verdict_cache_from_env())
+    return asyncio.run(run_jsonl_async(in_path, out_path, ai_client, moderator, **options))
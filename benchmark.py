@@ -0,0 +1,1234 @@
+"""
+Benchmark Script
+Measures content moderation throughput for different keyword list sizes
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import string
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from keyword_matcher import KeywordMatcher
+from moderation import ContentModerator
+
+
+def make_keywords(count: int, seed: int = 1) -> List[str]:
+    """
+    Generate a reproducible list of random lowercase keywords.
+    
+    Args:
+        count (int): Number of keywords
+        seed (int): Random seed
+    
+    Returns:
+        List[str]: Generated keywords
+    """
+    rng = random.Random(seed)
+    return [
+        ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+        for _ in range(count)
+    ]
+
+
+def make_text(size: int, keywords: List[str], hit_rate: float = 0.01, seed: int = 2) -> str:
+    """
+    Generate a reproducible text of roughly `size` characters.
+    
+    Args:
+        size (int): Approximate text length in characters
+        keywords (List[str]): Keywords to sprinkle into the text
+        hit_rate (float): Fraction of words that are blocked keywords
+        seed (int): Random seed
+    
+    Returns:
+        str: Generated text
+    """
+    rng = random.Random(seed)
+    filler = ['the', 'model', 'answer', 'is', 'a', 'helpful', 'system', 'learning', 'data', 'and']
+    words = []
+    length = 0
+    while length < size:
+        if keywords and rng.random() < hit_rate:
+            word = rng.choice(keywords)
+        else:
+            word = rng.choice(filler)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)[:size]
+
+
+def time_call(func: Callable[[], object], min_time: float = 0.2) -> float:
+    """
+    Time a function, repeating it until `min_time` seconds have passed.
+    
+    Args:
+        func: Function to time
+        min_time (float): Minimum total measuring time in seconds
+    
+    Returns:
+        float: Average seconds per call
+    """
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while calls == 0 or elapsed < min_time:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return elapsed / calls
+
+
+# Results recorded by the benchmarks, saved with --json and compared with --baseline
+RESULTS: List[dict] = []
+
+
+def record(benchmark: str, name: str, value: float, unit: str, higher_is_better: bool = False):
+    """
+    Record a measurement for the JSON results.
+    
+    Args:
+        benchmark (str): Benchmark the measurement belongs to
+        name (str): Measurement name, unique within the benchmark
+        value (float): Measured value
+        unit (str): Unit of the value, e.g. 'us' or 'MB/s'
+        higher_is_better (bool): Direction of an improvement
+    """
+    RESULTS.append({
+        'benchmark': benchmark,
+        'name': name,
+        'value': round(value, 6),
+        'unit': unit,
+        'higher_is_better': higher_is_better
+    })
+
+
+def benchmark_matcher(text_size: int = 2000):
+    """Compare per-keyword substring scans against the compiled matcher."""
+    print("=" * 70)
+    print(f"🔍 Keyword matching: substring scan vs compiled matcher ({text_size} chars)")
+    print("=" * 70)
+    print(f"{'keywords':>10} {'build (ms)':>12} {'scan (µs)':>12} {'matcher (µs)':>14} {'speedup':>9}")
+    
+    for count in (10, 1000, 50000):
+        keywords = make_keywords(count)
+        text = make_text(text_size, keywords).lower()
+        
+        start = time.perf_counter()
+        matcher = KeywordMatcher(keywords)
+        build_time = time.perf_counter() - start
+        
+        def substring_scan():
+            return [keyword for keyword in keywords if keyword in text]
+        
+        if substring_scan() != matcher.find_all(text):
+            print(f"❌ Results differ for {count} keywords")
+            return False
+        
+        scan_time = time_call(substring_scan)
+        matcher_time = time_call(lambda: matcher.find_all(text))
+        record('matcher', f"find_all keywords={count}", matcher_time * 1e6, 'us')
+        print(f"{count:>10} {build_time * 1e3:>12.1f} {scan_time * 1e6:>12.1f} "
+              f"{matcher_time * 1e6:>14.1f} {scan_time / matcher_time:>8.1f}x")
+    
+    print("-" * 70)
+    print(f"ContentModerator switches to the matcher at "
+          f"{ContentModerator.MATCHER_THRESHOLD} keywords")
+    return True
+
+
+def benchmark_redaction():
+    """Compare per-keyword regex substitution against one-pass span redaction."""
+    print("=" * 70)
+    print("✂️  Output redaction: per-keyword regex vs one-pass spans")
+    print("=" * 70)
+    print(f"{'text size':>10} {'hits':>6} {'regex (µs)':>12} {'one-pass (µs)':>15} {'speedup':>9}")
+    
+    moderator = ContentModerator()
+    keywords = moderator.get_blocked_keywords()
+    
+    def regex_redaction(text):
+        is_safe, violations = moderator.check_content(text)
+        for keyword in violations:
+            pattern = re.compile(re.escape(keyword), re.IGNORECASE)
+            text = pattern.sub('[REDACTED]', text)
+        return text
+    
+    for size in (1000, 10000, 100000):
+        text = make_text(size, keywords, hit_rate=0.02)
+        hits = len(moderator._find_matches(moderator.keyword_set, text.lower())[1])
+        
+        regex_time = time_call(lambda: regex_redaction(text))
+        one_pass_time = time_call(lambda: moderator.moderate_output(text))
+        record('redaction', f"moderate_output size={size}", one_pass_time * 1e6, 'us')
+        print(f"{size:>10} {hits:>6} {regex_time * 1e6:>12.1f} "
+              f"{one_pass_time * 1e6:>15.1f} {regex_time / one_pass_time:>8.1f}x")
+    
+    return True
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Get a percentile from a list of measurements.
+    
+    Args:
+        values (List[float]): Measurements
+        fraction (float): Percentile as a fraction, e.g. 0.99
+    
+    Returns:
+        float: Value at that percentile
+    """
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report_load(label: str, latencies: List[float], elapsed: float):
+    """Print requests/sec and latency percentiles for a load test run."""
+    record('concurrency', f"{label} req/s", len(latencies) / elapsed, 'req/s', higher_is_better=True)
+    print(f"{label:<28} {len(latencies) / elapsed:>10.1f} "
+          f"{percentile(latencies, 0.5) * 1e3:>10.1f} {percentile(latencies, 0.99) * 1e3:>10.1f}")
+
+
+def benchmark_concurrency(requests: int = 400, latency: float = 0.05, workers: int = 8):
+    """Load test sync Flask /chat against async ASGI /chat with a stub model."""
+    import app as web
+    import asgi
+    from ai_client import AIClient
+    from stub_model import StubModel
+    
+    web.ai_client = AIClient(model=StubModel(latency=latency))
+    web.moderator = ContentModerator()
+    # Measure raw throughput: don't shed the burst
+    web.admission = None
+    body = json.dumps({'message': 'What is machine learning?'}).encode('utf-8')
+    
+    print("=" * 70)
+    print(f"🚦 /chat load test: {requests} requests, {latency * 1e3:.0f} ms stub latency")
+    print("=" * 70)
+    print(f"{'path':<28} {'req/s':>10} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    
+    def sync_request():
+        start = time.perf_counter()
+        response = web.app.test_client().post('/chat', data=body, content_type='application/json')
+        assert response.status_code == 200
+        return time.perf_counter() - start
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(pool.map(lambda _: sync_request(), range(requests)))
+    report_load(f"sync Flask ({workers} threads)", latencies, time.perf_counter() - start)
+    
+    async def async_request():
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+        
+        async def receive():
+            return messages.pop(0)
+        
+        async def send(message):
+            sent.append(message)
+        
+        scope = {'type': 'http', 'method': 'POST', 'path': '/chat', 'headers': []}
+        start = time.perf_counter()
+        await asgi.application(scope, receive, send)
+        assert sent[0]['status'] == 200
+        return time.perf_counter() - start
+    
+    async def run_async():
+        return await asyncio.gather(*(async_request() for _ in range(requests)))
+    
+    start = time.perf_counter()
+    latencies = asyncio.run(run_async())
+    report_load("async ASGI (1 event loop)", latencies, time.perf_counter() - start)
+    return True
+
+
+def benchmark_coalescing(callers: int = 50, latency: float = 0.1):
+    """Count upstream calls when many identical prompts arrive at once."""
+    from ai_client import AIClient
+    from stub_model import StubModel
+    
+    model = StubModel(latency=latency)
+    client = AIClient(model=model)
+    
+    print("=" * 70)
+    print(f"🔗 Request coalescing: {callers} identical prompts, {latency * 1e3:.0f} ms stub latency")
+    print("=" * 70)
+    print(f"{'path':<28} {'upstream calls':>15} {'coalesced':>10} {'wall (ms)':>10}")
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        responses = list(pool.map(lambda _: client.chat("What are your opening hours?"), range(callers)))
+    elapsed = time.perf_counter() - start
+    print(f"{'threaded':<28} {model.calls:>15} {client.single_flight.coalesced:>10} {elapsed * 1e3:>10.1f}")
+    
+    model.calls = 0
+    
+    async def run_async():
+        return await asyncio.gather(*(client.achat("What are your opening hours?") for _ in range(callers)))
+    
+    start = time.perf_counter()
+    responses += asyncio.run(run_async())
+    elapsed = time.perf_counter() - start
+    print(f"{'asyncio':<28} {model.calls:>15} {client.async_single_flight.coalesced:>10} {elapsed * 1e3:>10.1f}")
+    
+    return len(set(responses)) == 1
+
+
+def benchmark_batch(sizes=(1, 100, 10000, 100000), hit_rate: float = 0.002):
+    """Measure batch moderation throughput in texts/sec."""
+    moderator = ContentModerator()
+    keywords = moderator.get_blocked_keywords()
+    corpus = [make_text(200, keywords, hit_rate=hit_rate, seed=seed) for seed in range(1000)]
+    processes = os.cpu_count() or 1
+    
+    print("=" * 70)
+    print(f"📦 Batch moderation throughput in texts/sec "
+          f"(~200 chars, {hit_rate:.1%} hit words, {processes} CPUs)")
+    print("=" * 70)
+    print(f"{'batch size':>10} {'check x N':>11} {'check_batch':>12} "
+          f"{'moderate x N':>13} {'moderate_batch':>15} {'processes':>10}")
+    
+    for size in sizes:
+        texts = [corpus[i % len(corpus)] for i in range(size)]
+        min_time = 0.2 if size < 10000 else 0
+        
+        check = time_call(lambda: [moderator.check_content(text) for text in texts], min_time)
+        check_batch = time_call(lambda: moderator.check_batch(texts), min_time)
+        moderate = time_call(lambda: [moderator.moderate_output(text) for text in texts], min_time)
+        moderate_batch = time_call(lambda: moderator.moderate_batch(texts), min_time)
+        
+        if processes > 1 and size >= ContentModerator.BATCH_PROCESS_THRESHOLD:
+            pooled = time_call(lambda: moderator.moderate_batch(texts, processes=processes), 0)
+            pooled_rate = f"{size / pooled:>10.0f}"
+        else:
+            pooled_rate = f"{'-':>10}"
+        
+        record('batch', f"check_batch size={size}", size / check_batch, 'texts/s', higher_is_better=True)
+        record('batch', f"moderate_batch size={size}", size / moderate_batch, 'texts/s',
+               higher_is_better=True)
+        print(f"{size:>10} {size / check:>11.0f} {size / check_batch:>12.0f} "
+              f"{size / moderate:>13.0f} {size / moderate_batch:>15.0f} {pooled_rate}")
+    
+    return True
+
+
+def benchmark_tenants(tenants: int = 1000, base_size: int = 2000, shared_lists: int = 10,
+                      unique_fraction: float = 0.05, max_policies: int = 32):
+    """Measure policy build time and memory for many tenants with mostly shared lists."""
+    import tracemalloc
+    from tenant_policies import TenantPolicies
+    
+    base = ContentModerator()
+    base.swap_keywords(make_keywords(base_size, seed=1), source='benchmark')
+    common = [make_keywords(20, seed=100 + index) for index in range(shared_lists)]
+    rng = random.Random(3)
+    
+    def tenant_keywords(index: int) -> List[str]:
+        if rng.random() < unique_fraction:
+            return make_keywords(20, seed=1000 + index)
+        return common[index % shared_lists]
+    
+    config = {f"tenant-{index}": tenant_keywords(index) for index in range(tenants)}
+    distinct = len({tuple(keywords) for keywords in config.values()})
+    text = make_text(2000, base.get_blocked_keywords(), hit_rate=0.002)
+    
+    print("=" * 70)
+    print(f"🏢 Tenant policies: {tenants} tenants, {base_size} base keywords, "
+          f"{distinct} distinct lists")
+    print("=" * 70)
+    
+    # Build time of one policy (base automaton plus a tenant's terms)
+    policies = TenantPolicies(base, config, max_policies=tenants)
+    start = time.perf_counter()
+    policies.moderator_for('tenant-0')
+    build = time.perf_counter() - start
+    hit = time_call(lambda: policies.moderator_for('tenant-0'))
+    print(f"{'policy build':<36} {build * 1e3:>10.1f} ms")
+    print(f"{'cached policy lookup':<36} {hit * 1e6:>10.2f} µs")
+    
+    # Memory with every policy resident, shared by identical lists
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    policies = TenantPolicies(base, config, max_policies=tenants)
+    start = time.perf_counter()
+    for tenant_id in config:
+        policies.moderator_for(tenant_id)
+    elapsed = time.perf_counter() - start
+    resident = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    
+    per_policy = resident / max(policies.stats()['policies'], 1)
+    print(f"{'resolve all tenants (traced)':<36} {elapsed:>10.2f} s")
+    print(f"{'compiled policies':<36} {policies.stats()['policies']:>10}")
+    print(f"{'memory per compiled policy':<36} {per_policy / 2 ** 20:>10.2f} MiB")
+    print(f"{'memory per tenant (shared)':<36} {resident / tenants / 2 ** 10:>10.1f} KiB")
+    print(f"{'memory per tenant (unshared)':<36} {per_policy / 2 ** 10:>10.1f} KiB")
+    
+    # Bounded residency under an LRU cap
+    policies = TenantPolicies(base, config, max_policies=max_policies)
+    for tenant_id in config:
+        policies.moderator_for(tenant_id)
+    stats = policies.stats()
+    print(f"{f'resident with LRU cap {max_policies}':<36} {stats['policies']:>10} "
+          f"({stats['evictions']} evictions)")
+    
+    moderator = policies.moderator_for('tenant-1')
+    check = time_call(lambda: moderator.check_content(text))
+    print(f"{'check_content, 2 KB (tenant policy)':<36} {check * 1e6:>10.1f} µs")
+    return stats['policies'] <= max_policies
+
+
+def benchmark_matching(text_size: int = 2000):
+    """Compare substring and word matching on throughput and fixture accuracy."""
+    from moderation import MATCHING_FIXTURES
+    
+    print("=" * 70)
+    print(f"🔤 Matching modes: substring vs word ({text_size} chars)")
+    print("=" * 70)
+    print(f"{'keywords':>10} {'mode':>10} {'build (ms)':>12} {'check (µs)':>12} {'MB/s':>8}")
+    
+    for count in (10, 1000, 50000):
+        keywords = make_keywords(count)
+        text = make_text(text_size, keywords)
+        for mode in (ContentModerator.SUBSTRING_MODE, ContentModerator.WORD_MODE):
+            moderator = ContentModerator(match_mode=mode)
+            start = time.perf_counter()
+            moderator.swap_keywords(keywords, source='benchmark')
+            build_time = time.perf_counter() - start
+            check_time = time_call(lambda: moderator.check_content(text))
+            print(f"{count:>10} {mode:>10} {build_time * 1e3:>12.1f} {check_time * 1e6:>12.1f} "
+                  f"{text_size / check_time / 1e6:>8.1f}")
+    
+    print("-" * 70)
+    print(f"{'mode':>10} {'precision':>10} {'recall':>8} {'exact':>8}")
+    word_exact = 0
+    for mode in (ContentModerator.SUBSTRING_MODE, ContentModerator.WORD_MODE):
+        moderator = ContentModerator(match_mode=mode)
+        found = relevant = correct = exact = 0
+        for text, expected in MATCHING_FIXTURES:
+            violations = moderator.check_content(text)[1]
+            found += len(violations)
+            relevant += len(expected)
+            correct += len(set(violations) & set(expected))
+            exact += sorted(violations) == sorted(expected)
+        precision = correct / found if found else 1.0
+        recall = correct / relevant if relevant else 1.0
+        print(f"{mode:>10} {precision:>10.2f} {recall:>8.2f} {exact:>4}/{len(MATCHING_FIXTURES)}")
+        word_exact = exact
+    return word_exact == len(MATCHING_FIXTURES)
+
+
+def make_unicode_text(text: str, rate: float = 0.3, seed: int = 4) -> str:
+    """
+    Rewrite words of a text with accents, full-width forms and look-alike letters.
+    
+    Args:
+        text (str): ASCII text
+        rate (float): Fraction of words rewritten
+        seed (int): Random seed
+    
+    Returns:
+        str: Text with the same words in non-ASCII disguises
+    """
+    rng = random.Random(seed)
+    lookalikes = str.maketrans('aeopcxy', 'аеорсху')
+    
+    def disguise(word: str) -> str:
+        style = rng.randrange(3)
+        if style == 0:
+            return ''.join(chr(ord(char) + 0xFEE0) for char in word)
+        if style == 1:
+            return word.replace('e', 'é').replace('a', 'à')
+        return word.translate(lookalikes)
+    
+    return ' '.join(disguise(word) if rng.random() < rate else word for word in text.split(' '))
+
+
+def benchmark_normalization(text_size: int = 2000, keyword_count: int = 1000):
+    """Measure Unicode folding and moderation on ASCII and non-ASCII corpora."""
+    import unicodedata
+    from text_normalizer import NormalizedText, normalize_text
+    
+    keywords = make_keywords(keyword_count)
+    ascii_text = make_text(text_size, keywords)
+    corpora = {
+        'ascii': ascii_text,
+        'one non-ascii char': ascii_text[:-1] + '…',
+        'non-ascii (30% words)': make_unicode_text(ascii_text),
+    }
+    moderator = ContentModerator()
+    moderator.swap_keywords(keywords, source='benchmark')
+    
+    print("=" * 70)
+    print(f"🌐 Unicode normalization ({text_size} chars, {keyword_count} keywords), MB/s")
+    print("=" * 70)
+    print(f"{'corpus':<24} {'lower':>8} {'NFKC+fold':>10} {'fold':>8} {'offsets':>8} "
+          f"{'check':>8} {'redact':>8}")
+    
+    for name, text in corpora.items():
+        size = len(text)
+        timings = [
+            time_call(lambda: text.lower()),
+            time_call(lambda: unicodedata.normalize('NFKC', text).casefold()),
+            time_call(lambda: normalize_text(text)),
+            time_call(lambda: NormalizedText(text)),
+            time_call(lambda: moderator.check_content(text)),
+            time_call(lambda: moderator.moderate_output(text)),
+        ]
+        record('normalization', f"check_content {name}", size / timings[4] / 1e6, 'MB/s',
+               higher_is_better=True)
+        record('normalization', f"moderate_output {name}", size / timings[5] / 1e6, 'MB/s',
+               higher_is_better=True)
+        print(f"{name:<24} " + ' '.join(
+            f"{size / timing / 1e6:>{width}.1f}"
+            for timing, width in zip(timings, (8, 10, 8, 8, 8, 8))
+        ))
+    
+    print("-" * 70)
+    disguised = corpora['non-ascii (30% words)']
+    found = moderator.check_content(disguised)[1]
+    expected = moderator.check_content(ascii_text)[1]
+    print(f"keywords found in disguised corpus: {len(found)}/{len(expected)}")
+    return found == expected
+
+
+def benchmark_metrics():
+    """Measure the cost of the metrics hooks, enabled and disabled."""
+    from metrics import BLOCKED, METRICS, STAGE_SECONDS
+    
+    def timed_block():
+        with STAGE_SECONDS.time('benchmark'):
+            pass
+    
+    hooks = {
+        'stage timer (with block)': timed_block,
+        'counter inc': BLOCKED.inc,
+        'histogram observe': lambda: STAGE_SECONDS.observe(0.001, 'benchmark'),
+    }
+    baseline = time_call(lambda: None)
+    
+    print("=" * 70)
+    print("📊 Metrics hook overhead (call overhead of an empty lambda subtracted)")
+    print("=" * 70)
+    print(f"{'hook':<28} {'enabled (ns)':>14} {'disabled (ns)':>14}")
+    
+    enabled = METRICS.enabled
+    worst_disabled = 0.0
+    try:
+        for name, hook in hooks.items():
+            METRICS.enabled = True
+            on = time_call(hook) - baseline
+            METRICS.enabled = False
+            off = time_call(hook) - baseline
+            worst_disabled = max(worst_disabled, off)
+            print(f"{name:<28} {on * 1e9:>14.0f} {off * 1e9:>14.0f}")
+    finally:
+        METRICS.enabled = enabled
+    
+    moderator = ContentModerator()
+    text = make_text(2000, moderator.get_blocked_keywords(), hit_rate=0.0)
+    check = time_call(lambda: moderator.moderate_input(text))
+    print("-" * 70)
+    print(f"moderate_input, 2 KB (for scale): {check * 1e9:,.0f} ns")
+    return worst_disabled < 1e-6
+
+
+def benchmark_throughput(sizes=(100, 1000, 10000, 100000, 1000000),
+                         keyword_counts=(10, 1000), hit_rates=(0.0, 0.01, 0.1)):
+    """Measure check_content and moderate_output throughput by text size, list size and hits."""
+    print("=" * 70)
+    print("⚡ Moderation throughput in MB/s (text size x keywords x hit density)")
+    print("=" * 70)
+    print(f"{'text size':>10} {'keywords':>9} {'hits':>6} {'check':>10} {'moderate':>10}")
+    
+    for count in keyword_counts:
+        keywords = make_keywords(count)
+        moderator = ContentModerator()
+        moderator.swap_keywords(keywords, source='benchmark')
+        for size in sizes:
+            for hit_rate in hit_rates:
+                text = make_text(size, keywords, hit_rate=hit_rate)
+                min_time = 0.2 if size < 1000000 else 0
+                check = time_call(lambda: moderator.check_content(text), min_time)
+                moderate = time_call(lambda: moderator.moderate_output(text), min_time)
+                
+                label = f"size={size} keywords={count} hits={hit_rate}"
+                record('throughput', f"check_content {label}", size / check / 1e6, 'MB/s',
+                       higher_is_better=True)
+                record('throughput', f"moderate_output {label}", size / moderate / 1e6, 'MB/s',
+                       higher_is_better=True)
+                print(f"{size:>10} {count:>9} {hit_rate:>6.0%} "
+                      f"{size / check / 1e6:>10.1f} {size / moderate / 1e6:>10.1f}")
+    return True
+
+
+def make_replay(records: int, keywords: List[str], repeat_share: float = 0.6,
+                seed: int = 5) -> List[str]:
+    """
+    Generate chat traffic as JSONL records with a prompt and a response, like cli.py run's.
+    
+    A `repeat_share` of prompts come from a few hundred common ones
+    (greetings, frequent questions) with a long-tail popularity, and as many
+    responses from reply templates; the rest are unique texts of 40-1500
+    characters with an occasional blocked keyword.
+    
+    Args:
+        records (int): Number of records
+        keywords (List[str]): Blocked keywords to sprinkle into unique texts
+        repeat_share (float): Fraction of prompts and responses that repeat
+        seed (int): Random seed
+    
+    Returns:
+        List[str]: JSONL lines
+    """
+    rng = random.Random(seed)
+    greetings = ['hi', 'hello', 'hey there', 'good morning', 'thanks!', 'thank you', 'ok', 'bye']
+    topics = ['machine learning', 'photosynthesis', 'the stock market', 'black holes', 'python',
+              'inflation', 'the french revolution', 'vaccines', 'climate change', 'recursion']
+    questions = [f"{opening} {topic}?" for topic in topics
+                 for opening in ('What is', 'Can you explain', 'Tell me about', 'How does',
+                                 'Give me a summary of', 'Why does everyone talk about')]
+    common = greetings + questions + [f"{question} Keep it short." for question in questions]
+    common += [f"How do I {task}?" for task in ('reset my password', 'cancel my order',
+                                               'contact support', 'update my card')]
+    weights = [1 / (rank + 1) for rank in range(len(common))]
+    templates = ["Hello! How can I help you today?", "You're welcome! Anything else?",
+                 "I'm sorry, I can't help with that request.",
+                 "Sure! Here is a short summary of the topic you asked about."]
+    
+    lines = []
+    for index in range(records):
+        if rng.random() < repeat_share:
+            prompt = rng.choices(common, weights)[0]
+        else:
+            prompt = make_text(rng.randint(40, 400), keywords, hit_rate=0.01, seed=rng.random())
+        if rng.random() < repeat_share:
+            response = rng.choice(templates)
+        else:
+            response = make_text(rng.randint(200, 1500), keywords, hit_rate=0.005,
+                                 seed=rng.random())
+        lines.append(json.dumps({'id': index, 'prompt': prompt, 'response': response}))
+    return lines
+
+
+def benchmark_verdicts(records: int = 20000, repeat_shares=(0.6, 0.9),
+                       cases=((10, 'substring'), (1000, 'substring'), (50000, 'substring'),
+                              (10, 'word'), (1000, 'word'))):
+    """Replay chat traffic through check_content/moderate_output with and without the verdict cache."""
+    from verdict_cache import VerdictCache
+    
+    print("=" * 70)
+    print(f"🗃️  Verdict cache: {records} replayed records (prompt check + response moderation)")
+    print("=" * 70)
+    print(f"{'repeats':>8} {'keywords':>9} {'mode':>10} {'off rec/s':>10} {'on rec/s':>10} "
+          f"{'speedup':>8} {'hit ratio':>10} {'entries':>8} {'KiB':>7}")
+    
+    consistent = True
+    for share in repeat_shares:
+        for count, mode in cases:
+            keywords = make_keywords(count)
+            lines = make_replay(records, keywords, repeat_share=share)
+            results = {}
+            rates = {}
+            for cached in (False, True):
+                cache = VerdictCache() if cached else None
+                moderator = ContentModerator(match_mode=mode, verdict_cache=cache)
+                moderator.swap_keywords(keywords, source='benchmark')
+                # Parsed afresh for each run, like requests arriving, so no string hash is reused
+                replay = [json.loads(line) for line in lines]
+                
+                start = time.perf_counter()
+                results[cached] = [(moderator.check_content(item['prompt']),
+                                    moderator.moderate_output(item['response'])) for item in replay]
+                rates[cached] = records / (time.perf_counter() - start)
+                record('verdicts', f"repeats={share} keywords={count} mode={mode} "
+                       f"cache={'on' if cached else 'off'}", rates[cached], 'records/s',
+                       higher_is_better=True)
+            
+            consistent = consistent and results[True] == results[False]
+            stats = cache.stats()
+            print(f"{share:>8.0%} {count:>9} {mode:>10} {rates[False]:>10,.0f} {rates[True]:>10,.0f} "
+                  f"{rates[True] / rates[False]:>7.2f}x {stats['hit_ratio']:>10.1%} "
+                  f"{stats['entries']:>8} {stats['bytes'] / 1024:>7.1f}")
+    
+    print("\nWith under 256 keywords, substring mode scans faster than it consults the cache")
+    print("and bypasses it. Unique texts (the rest of the replay) are scanned either way.")
+    if not consistent:
+        print("❌ Cached and uncached verdicts differ")
+    return consistent
+
+
+def benchmark_chat(message: str = 'What is machine learning?'):
+    """Measure the in-process overhead of Flask /chat around a zero-latency stub model."""
+    import app as web
+    from ai_client import AIClient
+    from stub_model import StubModel
+    
+    web.ai_client = AIClient(model=StubModel(), cache=None)
+    web.moderator = ContentModerator()
+    client = web.app.test_client()
+    
+    def post(text: str, status: int):
+        response = client.post('/chat', json={'message': text})
+        assert response.status_code == status, response.get_data(as_text=True)
+    
+    # Warm up routing, JSON and the moderator before timing
+    post(message, 200)
+    direct = time_call(lambda: web.ai_client.chat(message, moderate=web.moderator.moderate_output))
+    approved = time_call(lambda: post(message, 200))
+    blocked = time_call(lambda: post('How do I hack a server?', 400))
+    
+    print("=" * 70)
+    print("🌐 /chat overhead (Flask test client, stub model with no latency)")
+    print("=" * 70)
+    rows = [
+        ('ai_client.chat + moderation', direct),
+        ('POST /chat (approved)', approved),
+        ('POST /chat (blocked input)', blocked),
+        ('Flask + request handling', approved - direct),
+    ]
+    for name, seconds in rows:
+        record('chat', name, seconds * 1e6, 'us')
+        print(f"{name:<36} {seconds * 1e6:>10.1f} µs")
+    return True
+
+
+def benchmark_speculative(latency: float = 0.05, keyword_count: int = 1000,
+                          text_size: int = 50000, requests: int = 20):
+    """Compare /chat latency with and without speculative dispatch, and the calls it wastes."""
+    import app as web
+    from ai_client import AIClient
+    from speculative import SpeculativeDispatcher
+    from stub_model import StubModel
+    
+    # Expensive input moderation: word mode, a long list and long non-ASCII input
+    keywords = make_keywords(keyword_count)
+    moderator = ContentModerator(match_mode=ContentModerator.WORD_MODE)
+    moderator.swap_keywords(keywords, source='benchmark')
+    approved_text = make_unicode_text(make_text(text_size, keywords, hit_rate=0))
+    blocked_text = approved_text + ' ' + keywords[0]
+    
+    model = StubModel(reply='ok', latency=latency)
+    web.ai_client = AIClient(model=model, cache=None)
+    web.moderator = moderator
+    client = web.app.test_client()
+    moderation = time_call(lambda: moderator.moderate_input(approved_text), min_time=0.5)
+    
+    def run(text: str, status: int) -> Tuple[float, int]:
+        calls = model.calls
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = client.post('/chat', json={'message': text})
+            assert response.status_code == status, response.get_data(as_text=True)
+        elapsed = (time.perf_counter() - start) / requests
+        # Let discarded speculative calls finish before counting them
+        time.sleep(latency * 2)
+        return elapsed, model.calls - calls
+    
+    print("=" * 70)
+    print(f"🏎️  Speculative dispatch ({latency * 1000:.0f} ms stub model, "
+          f"input moderation {moderation * 1000:.1f} ms)")
+    print("=" * 70)
+    print(f"{'mode':<14} {'approved ms':>12} {'blocked ms':>11} {'calls per blocked':>18}")
+    
+    results = {}
+    for mode, speculator in (('sequential', None), ('speculative', SpeculativeDispatcher(4))):
+        web.speculator = speculator
+        run(approved_text, 200)
+        approved, _ = run(approved_text, 200)
+        blocked, wasted = run(blocked_text, 400)
+        results[mode] = (approved, wasted / requests)
+        record('speculative', f"{mode} approved", approved * 1000, 'ms')
+        record('speculative', f"{mode} upstream calls per blocked request", wasted / requests, 'calls')
+        print(f"{mode:<14} {approved * 1000:>12.1f} {blocked * 1000:>11.1f} {wasted / requests:>18.2f}")
+    web.speculator = None
+    
+    saved = results['sequential'][0] - results['speculative'][0]
+    record('speculative', 'latency saved per approved request', saved * 1000, 'ms',
+           higher_is_better=True)
+    print(f"\nSaved {saved * 1000:.1f} ms per approved request, at the cost of "
+          f"{results['speculative'][1]:.2f} upstream calls per blocked request")
+    return True
+
+
+def benchmark_admission(latency: float = 0.05, capacity: int = 4, noisy: int = 120,
+                        quiet: int = 4, client_timeout: float = 1.0):
+    """Flood /chat from one API key against a slow stub and compare another key's latency."""
+    import app as web
+    from admission import AdmissionController
+    from ai_client import AIClient
+    from stub_model import StubModel
+    
+    web.moderator = ContentModerator()
+    web.speculator = None
+    
+    def post(key: str, index: int) -> Tuple[str, int, float]:
+        start = time.perf_counter()
+        response = web.app.test_client().post('/chat', json={'message': f'Question {index}'},
+                                              headers={'X-API-Key': key})
+        return key, response.status_code, time.perf_counter() - start
+    
+    print("=" * 70)
+    print(f"🚧 Admission control: {noisy} noisy + {quiet} quiet requests, stub serving "
+          f"{capacity} at {latency * 1e3:.0f} ms, clients give up after {client_timeout:.1f} s")
+    print("=" * 70)
+    print(f"{'mode':<12} {'quiet p50 ms':>13} {'quiet max ms':>13} {'noisy ok':>9} "
+          f"{'shed':>6} {'timed out':>10}")
+    
+    results = {}
+    for mode, admission in (('unlimited', None),
+                            ('admission', AdmissionController(capacity, max_queue=capacity * 4,
+                                                              queue_timeout=client_timeout))):
+        # Latency grows with the load beyond the stub's capacity, like a slowed-down Gemini
+        web.ai_client = AIClient(model=StubModel(reply='ok', latency=latency, capacity=capacity),
+                                 cache=None)
+        web.admission = admission
+        with ThreadPoolExecutor(max_workers=noisy + quiet) as pool:
+            futures = [pool.submit(post, 'noisy', index) for index in range(noisy)]
+            time.sleep(latency)
+            futures += [pool.submit(post, 'quiet', index) for index in range(quiet)]
+            outcomes = [future.result() for future in futures]
+        
+        quiet_latencies = [seconds for key, _, seconds in outcomes if key == 'quiet']
+        noisy_ok = sum(1 for key, status, seconds in outcomes
+                       if key == 'noisy' and status == 200 and seconds <= client_timeout)
+        shed = sum(1 for _, status, _ in outcomes if status in (429, 503))
+        timed_out = sum(1 for _, status, seconds in outcomes
+                        if status == 200 and seconds > client_timeout)
+        results[mode] = percentile(quiet_latencies, 0.5)
+        record('admission', f"{mode} quiet client p50", results[mode] * 1e3, 'ms')
+        record('admission', f"{mode} requests past client timeout", timed_out, 'requests')
+        print(f"{mode:<12} {results[mode] * 1e3:>13.1f} {max(quiet_latencies) * 1e3:>13.1f} "
+              f"{noisy_ok:>9} {shed:>6} {timed_out:>10}")
+    web.admission = None
+    
+    print(f"\nQuiet client p50 {results['unlimited'] * 1e3:.0f} ms -> "
+          f"{results['admission'] * 1e3:.0f} ms with admission control")
+    return results['admission'] < results['unlimited']
+
+
+def benchmark_startup(runs: int = 3):
+    """Cold-start time of each entry point, from python -X importtime, and of pre-warming."""
+    # A key lets app.py build its client; nothing here reaches the network
+    env = dict(os.environ, GOOGLE_GEMINI_KEY=os.getenv('GOOGLE_GEMINI_KEY') or 'benchmark')
+    here = os.path.dirname(os.path.abspath(__file__))
+    cases = (
+        ('python', ['-c', 'pass'], None),
+        ('import app', ['-c', 'import app'], 'app'),
+        ('import asgi', ['-c', 'import asgi'], 'asgi'),
+        ('import cli', ['-c', 'import cli'], 'cli'),
+        ('cli.py --help', ['cli.py', '--help'], None),
+        ('list_models.py (no key)', ['list_models.py'], None),
+        ('app + warm_up()', ['-c', 'import app; app.warm_up()'], 'app'),
+    )
+    
+    print("=" * 70)
+    print(f"🚀 Startup time (best of {runs}, python -X importtime)")
+    print("=" * 70)
+    print(f"{'entry point':<26} {'imports ms':>11} {'process ms':>11} {'SDK loaded':>11}")
+    
+    for label, args, module in cases:
+        case_env = env
+        if label.startswith('list_models'):
+            case_env = dict(env, GOOGLE_GEMINI_KEY='')
+        best_wall = best_import = None
+        sdk_loaded = False
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=here,
+                                    env=case_env, capture_output=True, text=True)
+            wall = time.perf_counter() - start
+            imports = None
+            for line in result.stderr.splitlines():
+                if not line.startswith('import time:'):
+                    continue
+                fields = line.split('|')
+                name = fields[-1].strip()
+                if name == 'google.generativeai':
+                    sdk_loaded = True
+                if name == module and fields[-1] == f' {module}':
+                    imports = int(fields[1]) / 1e6
+            best_wall = wall if best_wall is None else min(best_wall, wall)
+            if imports is not None:
+                best_import = imports if best_import is None else min(best_import, imports)
+        
+        record('startup', f"{label} process", best_wall * 1e3, 'ms')
+        imports_text = f"{best_import * 1e3:>11.1f}" if best_import is not None else f"{'-':>11}"
+        print(f"{label:<26} {imports_text} {best_wall * 1e3:>11.1f} {'yes' if sdk_loaded else 'no':>11}")
+    return True
+
+
+def process_memory(pid: int) -> Dict[str, float]:
+    """
+    Get a process's memory from /proc/<pid>/smaps_rollup (Linux).
+    
+    Args:
+        pid (int): Process id
+    
+    Returns:
+        Dict[str, float]: 'rss', 'pss' (shared pages split between their
+                          users) and 'uss' (pages only this process has), in MB
+    """
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup', 'r') as handle:
+        for line in handle:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss': fields.get('Rss', 0.0),
+        'pss': fields.get('Pss', 0.0),
+        'uss': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0)
+    }
+
+
+def benchmark_serving(worker_counts=(1, 2, 4), keyword_count: int = 50000, texts: int = 20,
+                      text_size: int = 2000, duration: float = 3.0):
+    """Requests/sec and memory per worker of serve.py, with and without preloading."""
+    import socket
+    import tempfile
+    import urllib.request
+    
+    if not os.path.exists('/proc/self/smaps_rollup') or not hasattr(os, 'fork'):
+        print("⚠️  Serving benchmark needs Linux (fork and /proc); skipped")
+        return True
+    
+    here = os.path.dirname(os.path.abspath(__file__))
+    keywords = make_keywords(keyword_count)
+    body = json.dumps({
+        'texts': [make_text(text_size, keywords, seed=seed) for seed in range(texts)]
+    }).encode('utf-8')
+    
+    def free_port() -> int:
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            return probe.getsockname()[1]
+    
+    def post(url: str):
+        request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+    
+    def run(workers: int, preload: bool, keyword_path: str) -> Tuple[float, List[Dict[str, float]]]:
+        port = free_port()
+        env = dict(os.environ, KEYWORDS_PATH=keyword_path, KEYWORDS_RELOAD_INTERVAL='0',
+                   GOOGLE_GEMINI_KEY=os.getenv('GOOGLE_GEMINI_KEY') or 'benchmark')
+        args = [sys.executable, 'serve.py', '--host', '127.0.0.1', '--port', str(port),
+                '--workers', str(workers)] + ([] if preload else ['--no-preload'])
+        server = subprocess.Popen(args, cwd=here, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        url = f'http://127.0.0.1:{port}/moderate/batch'
+        try:
+            deadline = time.monotonic() + 120
+            while True:
+                try:
+                    post(url)
+                    break
+                except OSError:
+                    if time.monotonic() > deadline or server.poll() is not None:
+                        raise RuntimeError("serve.py did not start")
+                    time.sleep(0.2)
+            
+            # Every worker compiles (or touches) its matcher before memory is read
+            with ThreadPoolExecutor(max_workers=workers * 2) as pool:
+                list(pool.map(lambda _: post(url), range(workers * 4)))
+            
+            def load(_) -> int:
+                count = 0
+                stop_at = time.perf_counter() + duration
+                while time.perf_counter() < stop_at:
+                    post(url)
+                    count += 1
+                return count
+            
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers * 2) as pool:
+                done = sum(pool.map(load, range(workers * 2)))
+            rate = done / (time.perf_counter() - start)
+            
+            with open(f'/proc/{server.pid}/task/{server.pid}/children', 'r') as handle:
+                children = [int(pid) for pid in handle.read().split()]
+            return rate, [process_memory(pid) for pid in children]
+        finally:
+            server.terminate()
+            server.wait()
+    
+    print("=" * 70)
+    print(f"🏭 serve.py: /moderate/batch with {texts} x {text_size} B texts, "
+          f"{keyword_count} keywords, {os.cpu_count()} CPUs")
+    print("=" * 70)
+    print(f"{'mode':<12} {'workers':>8} {'req/s':>8} {'RSS MB':>9} {'PSS MB':>9} {'USS MB':>9}")
+    
+    uss = {}
+    with tempfile.TemporaryDirectory() as directory:
+        keyword_path = os.path.join(directory, 'keywords.txt')
+        with open(keyword_path, 'w', encoding='utf-8') as handle:
+            handle.write('\n'.join(keywords))
+        
+        runs = [(workers, True) for workers in worker_counts] + [(max(worker_counts), False)]
+        for workers, preload in runs:
+            mode = 'preload' if preload else 'no preload'
+            rate, memory = run(workers, preload, keyword_path)
+            average = {field: sum(worker[field] for worker in memory) / len(memory)
+                       for field in ('rss', 'pss', 'uss')}
+            uss[(workers, preload)] = average['uss']
+            record('serving', f"{mode} {workers} workers req/s", rate, 'req/s', higher_is_better=True)
+            record('serving', f"{mode} {workers} workers PSS per worker", average['pss'], 'MB')
+            print(f"{mode:<12} {workers:>8} {rate:>8.1f} {average['rss']:>9.1f} "
+                  f"{average['pss']:>9.1f} {average['uss']:>9.1f}")
+    
+    workers = max(worker_counts)
+    print(f"\nPrivate memory per worker at {workers} workers: "
+          f"{uss[(workers, False)]:.1f} MB without preload, {uss[(workers, True)]:.1f} MB with")
+    return True
+
+
+# Run in a fresh process per case: loads the keywords one way, reports time and memory
+_INDEX_PROBE = """
+import json, os, sys, time
+sys.path.insert(0, {here!r})
+from benchmark import process_memory
+from moderation import ContentModerator
+before = process_memory(os.getpid())['rss']
+start = time.perf_counter()
+if {mode!r} == 'build':
+    from keyword_store import load_keywords
+    moderator = ContentModerator()
+    moderator.swap_keywords(load_keywords({path!r}), source='benchmark')
+else:
+    moderator = ContentModerator.from_index({path!r})
+moderator.check_content('warm up')
+seconds = time.perf_counter() - start
+after = process_memory(os.getpid())
+print(json.dumps({{'seconds': seconds, 'rss': after['rss'] - before, 'uss': after['uss']}}))
+"""
+
+
+def benchmark_index(keyword_counts=(10000, 100000, 300000), text_size: int = 2000):
+    """Startup time and memory of loading a keyword index file, against compiling the list."""
+    import tempfile
+    from keyword_index import load_index, write_index
+    
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print("⚠️  Index benchmark needs Linux (/proc); skipped")
+        return True
+    
+    here = os.path.dirname(os.path.abspath(__file__))
+    
+    print("=" * 70)
+    print("🗂️  Keyword index: fresh process loading the keywords, then one check")
+    print("=" * 70)
+    print(f"{'keywords':>10} {'mode':>7} {'load ms':>10} {'+RSS MB':>9} {'USS MB':>8} "
+          f"{'file MB':>8} {'scan MB/s':>10}")
+    
+    consistent = True
+    with tempfile.TemporaryDirectory() as directory:
+        for count in keyword_counts:
+            keywords = make_keywords(count)
+            text_path = os.path.join(directory, f'keywords-{count}.txt')
+            index_path = os.path.join(directory, f'keywords-{count}.kwidx')
+            with open(text_path, 'w', encoding='utf-8') as handle:
+                handle.write('\n'.join(keywords))
+            info = write_index(keywords, index_path)
+            
+            # Same matches from both, and their scan speed
+            text = make_text(text_size, keywords)
+            compiled = KeywordMatcher(keywords)
+            mapped = load_index(index_path)
+            consistent = consistent and compiled.find_spans(text) == mapped.find_spans(text)
+            scan = {
+                'build': text_size / time_call(lambda: compiled.find_ids(text)) / 1e6,
+                'mmap': text_size / time_call(lambda: mapped.find_ids(text)) / 1e6
+            }
+            del compiled, mapped
+            
+            for mode, path in (('build', text_path), ('mmap', index_path)):
+                probe = _INDEX_PROBE.format(here=here, mode=mode, path=path)
+                result = subprocess.run([sys.executable, '-c', probe], cwd=here,
+                                        capture_output=True, text=True, check=True)
+                stats = json.loads(result.stdout.strip().splitlines()[-1])
+                record('index', f"{mode} keywords={count} load", stats['seconds'] * 1e3, 'ms')
+                record('index', f"{mode} keywords={count} RSS", stats['rss'], 'MB')
+                print(f"{count:>10} {mode:>7} {stats['seconds'] * 1e3:>10.1f} {stats['rss']:>9.1f} "
+                      f"{stats['uss']:>8.1f} {info['bytes'] / 1e6:>8.1f} {scan[mode]:>10.2f}")
+    
+    print("\n+RSS counts the mapped index pages a process touched; they stay in the page")
+    print("cache and are shared by every process mapping the file (USS: private memory).")
+    if not consistent:
+        print("❌ The index and the compiled matcher found different matches")
+    return consistent
+
+
+def benchmark_memory(keyword_counts=(10, 1000, 50000), instances: int = 20):
+    """Measure the memory held by a moderator instance, compiled matchers included."""
+    import tracemalloc
+    
+    print("=" * 70)
+    print("🧠 Memory per ContentModerator instance (tracemalloc)")
+    print("=" * 70)
+    print(f"{'keywords':>10} {'mode':>10} {'KiB per instance':>18}")
+    
+    for count in keyword_counts:
+        keywords = make_keywords(count)
+        modes = [ContentModerator.SUBSTRING_MODE]
+        if count <= 1000:
+            # Word mode compiles every inflection; the 50k list takes seconds
+            modes.append(ContentModerator.WORD_MODE)
+        
+        for mode in modes:
+            copies = instances if count <= 1000 else 1
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            moderators = []
+            for _ in range(copies):
+                moderator = ContentModerator(match_mode=mode)
+                moderator.swap_keywords(keywords, source='benchmark')
+                moderator.check_content('warm up the compiled matcher')
+                moderators.append(moderator)
+            per_instance = (tracemalloc.get_traced_memory()[0] - before) / copies
+            tracemalloc.stop()
+            
+            record('memory', f"moderator keywords={count} mode={mode}", per_instance / 1024, 'KiB')
+            print(f"{count:>10} {mode:>10} {per_instance / 1024:>18.1f}")
+    return True
+
+
+BENCHMARKS = {
+    'matcher': benchmark_matcher,
+    'redaction': benchmark_redaction,
+    'concurrency': benchmark_concurrency,
+    'coalescing': benchmark_coalescing,
+    'batch': benchmark_batch,
+    'tenants': benchmark_tenants,
+    'matching': benchmark_matching,
+    'normalization': benchmark_normalization,
+    'metrics': benchmark_metrics,
+    'throughput': benchmark_throughput,
+    'chat': benchmark_chat,
+    'memory': benchmark_memory,
+    'speculative': benchmark_speculative,
+    'admission': benchmark_admission,
+    'startup': benchmark_startup,
+    'serving': benchmark_serving,
+    'index': benchmark_index,
+    'verdicts': benchmark_verdicts,
+}
+
+
+def environment() -> dict:
+    """Describe the machine and revision the results were measured on."""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                  text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'revision': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def compare(results: List[dict], baseline: dict, tolerance: float) -> int:
+    """
+    Compare results with a saved baseline and print the changes.
+    
+    Args:
+        results (List[dict]): Results of this run
+        baseline (dict): Contents of a JSON file written by --json
+        tolerance (float): Relative change treated as noise, e.g. 0.15
+    
+    Returns:
+        int: Number of regressions beyond the tolerance
+    """
+    previous: Dict[tuple, dict] = {
+        (result['benchmark'], result['name']): result for result in baseline.get('results', [])
+    }
+    
+    print("=" * 70)
+    print(f"📐 Comparison with baseline {baseline.get('environment', {}).get('revision') or ''} "
+          f"(tolerance {tolerance:.0%})")
+    print("=" * 70)
+    
+    regressions = 0
+    compared = 0
+    for result in results:
+        base = previous.get((result['benchmark'], result['name']))
+        if base is None or not base['value']:
+            continue
+        compared += 1
+        change = (result['value'] - base['value']) / base['value']
+        worse = -change if result['higher_is_better'] else change
+        if abs(change) <= tolerance:
+            continue
+        
+        if worse > 0:
+            regressions += 1
+            marker = '❌'
+        else:
+            marker = '✅'
+        print(f"{marker} {result['benchmark']}: {result['name']}: {base['value']:g} -> "
+              f"{result['value']:g} {result['unit']} ({change:+.0%})")
+    
+    print(f"{compared} measurements compared, {regressions} regressions")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the benchmarks named on the command line, or all of them.
+    
+    Results can be saved as JSON (--json) and compared with a saved
+    baseline (--baseline); the exit code is 1 if a benchmark's own check
+    fails or a measurement regressed beyond the tolerance.
+    """
+    parser = argparse.ArgumentParser(description='Run moderation benchmarks')
+    parser.add_argument('names', nargs='*', help=f"benchmarks to run: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--json', dest='json_path', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare results with this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='relative change ignored as noise (default: 0.15)')
+    args = parser.parse_args(argv)
+    
+    names = args.names or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"❌ Unknown benchmark: {name}")
+            print(f"   Available: {', '.join(BENCHMARKS)}")
+            return 1
+    
+    failed = False
+    for name in names:
+        if BENCHMARKS[name]() is False:
+            print(f"❌ Benchmark check failed: {name}")
+            failed = True
+        print()
+    
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as handle:
+            json.dump({'environment': environment(), 'results': RESULTS}, handle, indent=2)
+        print(f"💾 Wrote {len(RESULTS)} results to {args.json_path}")
+    
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        if compare(RESULTS, baseline, args.tolerance):
+            failed = True
+    
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+Bulk Moderation Module
+Streams JSONL records through the content moderator with resumable checkpoints
+"""
+
+import json
+import mmap
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from moderation import ContentModerator
+
+# Moderator owned by each worker process
+_worker_moderator: Optional[ContentModerator] = None
+
+
+def _init_worker(keywords: List[str], match_mode: str = ContentModerator.SUBSTRING_MODE,
+                 index_path: Optional[str] = None):
+    """Build the worker's moderator once, with the parent's keyword list and mode."""
+    global _worker_moderator
+    _worker_moderator = ContentModerator.for_worker(keywords, match_mode, index_path)
+
+
+def moderate_lines(lines: List[bytes], first_line: int, field: str, id_field: str) -> bytes:
+    """
+    Moderate a batch of JSONL lines and serialize the results.
+    
+    Args:
+        lines (List[bytes]): Raw input lines
+        first_line (int): Line number of the first line (1-based)
+        field (str): Record field holding the text to moderate
+        id_field (str): Record field copied to the output as `id`
+    
+    Returns:
+        bytes: One JSON result line per non-blank input line
+    """
+    moderator = _worker_moderator
+    results = []
+    texts = []
+    pending = []
+    
+    for line_number, line in enumerate(lines, first_line):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            text = record.get(field, '') if isinstance(record, dict) else ''
+            if not isinstance(text, str):
+                text = json.dumps(text)
+        except ValueError:
+            results.append({'line': line_number, 'error': 'invalid JSON'})
+            continue
+        
+        result = {'line': line_number}
+        if isinstance(record, dict) and id_field in record:
+            result['id'] = record[id_field]
+        results.append(result)
+        texts.append(text)
+        pending.append(result)
+    
+    for result, (is_safe, violations, moderated) in zip(pending, moderator.moderate_batch(texts)):
+        result['is_safe'] = is_safe
+        result['violations'] = violations
+        result['moderated'] = moderated
+    
+    return b''.join(
+        json.dumps(result, ensure_ascii=False).encode('utf-8') + b'\n'
+        for result in results
+    )
+
+
+def read_batches(path: str, offset: int, batch_size: int,
+                 use_mmap: bool = False) -> Iterator[Tuple[List[bytes], int]]:
+    """
+    Read lines from a file in batches, starting at a byte offset.
+    
+    Args:
+        path (str): Input JSONL file
+        offset (int): Byte offset to start reading from
+        batch_size (int): Lines per batch
+        use_mmap (bool): Read through a memory map instead of buffered I/O
+    
+    Yields:
+        Tuple[List[bytes], int]: (lines, byte offset just past the batch)
+    """
+    with open(path, 'rb') as source:
+        if use_mmap and os.path.getsize(path) > 0:
+            with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                size = len(data)
+                position = offset
+                while position < size:
+                    lines = []
+                    while position < size and len(lines) < batch_size:
+                        end = data.find(b'\n', position)
+                        end = size if end == -1 else end + 1
+                        lines.append(data[position:end])
+                        position = end
+                    yield lines, position
+            return
+        
+        source.seek(offset)
+        position = offset
+        while True:
+            lines = []
+            for _ in range(batch_size):
+                line = source.readline()
+                if not line:
+                    break
+                lines.append(line)
+                position += len(line)
+            if not lines:
+                return
+            yield lines, position
+
+
+def _write_checkpoint(path: str, checkpoint: dict):
+    """Atomically replace the checkpoint file."""
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as handle:
+        json.dump(checkpoint, handle)
+    os.replace(temporary, path)
+
+
+def _run_identity(in_path: str, field: str, id_field: str, moderator: ContentModerator) -> dict:
+    """Describe what a run's output depends on, so a checkpoint is only resumed by the same run."""
+    stat = os.stat(in_path)
+    return {
+        'input': os.path.abspath(in_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'field': field,
+        'id_field': id_field,
+        'keywords': moderator.keyword_set.version,
+        'match_mode': moderator.match_mode
+    }
+
+
+def moderate_jsonl(in_path: str, out_path: str, field: str = 'text', id_field: str = 'id',
+                   processes: int = 1, batch_size: int = 1000, resume: bool = False,
+                   use_mmap: bool = False, keywords: Optional[List[str]] = None,
+                   moderator: Optional[ContentModerator] = None) -> dict:
+    """
+    Moderate every record of a JSONL file into a JSONL results file.
+    
+    Lines are read in batches, moderated in worker processes and written
+    in input order. At most two batches per worker are in flight, so
+    memory stays bounded regardless of file size. After each batch a
+    checkpoint (`<out_path>.checkpoint`) records how far both files got,
+    so an interrupted run can continue with resume=True. The checkpoint
+    also records the input file (path, size, modification time), the
+    fields and the keyword set, and is only resumed if they still match.
+    
+    Args:
+        in_path (str): Input JSONL file
+        out_path (str): Output JSONL file
+        field (str): Record field holding the text to moderate
+        id_field (str): Record field copied to the output as `id`
+        processes (int): Worker processes (1 moderates in this process)
+        batch_size (int): Lines per batch
+        resume (bool): Continue from an existing checkpoint
+        use_mmap (bool): Read the input through a memory map
+        keywords: Optional keyword list, replacing the moderator's
+        moderator (ContentModerator): Moderator whose keywords and match mode
+                                      are used; a default one if None
+    
+    Returns:
+        dict: Records processed, elapsed seconds and records/sec
+    
+    Raises:
+        ValueError: If resuming a checkpoint written for another input file,
+                    fields or keywords, or whose output file was cut short
+    """
+    global _worker_moderator
+    if moderator is None:
+        moderator = ContentModerator()
+    if keywords is not None:
+        moderator.blocked_keywords = keywords
+    checkpoint_path = out_path + '.checkpoint'
+    
+    run = _run_identity(in_path, field, id_field, moderator)
+    checkpoint = {'run': run, 'in_offset': 0, 'out_offset': 0, 'lines': 0}
+    if resume and os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as handle:
+            checkpoint = json.load(handle)
+        # Offsets into another file (or one that changed) would skip or repeat records
+        recorded = checkpoint.get('run') or {}
+        changed = [name for name in run if recorded.get(name) != run[name]]
+        if changed:
+            raise ValueError(f"Checkpoint {checkpoint_path} is for a different run "
+                             f"({', '.join(changed)} changed); run without --resume to start over")
+        if not os.path.exists(out_path) or os.path.getsize(out_path) < checkpoint['out_offset']:
+            raise ValueError(f"{out_path} is shorter than its checkpoint; run without --resume to start over")
+        print(f"↩️  Resuming at line {checkpoint['lines'] + 1} "
+              f"(byte {checkpoint['in_offset']})", file=sys.stderr)
+    elif os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    
+    pool = None
+    if processes > 1:
+        # Workers rebuild the moderator from its keywords (or index file) and mode
+        keyword_set = moderator.keyword_set
+        pool = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(
+            keyword_set.keywords, moderator.match_mode, keyword_set.index_path))
+    else:
+        _worker_moderator = moderator
+    
+    start = time.perf_counter()
+    last_report = start
+    lines_done = checkpoint['lines']
+    records = 0
+    
+    with open(out_path, 'r+b' if checkpoint['out_offset'] else 'wb') as output:
+        output.seek(checkpoint['out_offset'])
+        output.truncate()
+        
+        in_flight = deque()
+        batches = read_batches(in_path, checkpoint['in_offset'], batch_size, use_mmap)
+        next_line = lines_done + 1
+        
+        def write_oldest():
+            nonlocal lines_done, records, last_report
+            result, line_count, in_offset = in_flight.popleft()
+            data = result.result() if pool else result
+            output.write(data)
+            output.flush()
+            lines_done += line_count
+            records += data.count(b'\n')
+            _write_checkpoint(checkpoint_path, {
+                'run': run,
+                'in_offset': in_offset,
+                'out_offset': output.tell(),
+                'lines': lines_done
+            })
+            
+            now = time.perf_counter()
+            if now - last_report >= 1.0:
+                last_report = now
+                rate = records / (now - start)
+                print(f"\r📄 {records:,} records ({rate:,.0f}/s)", end='', file=sys.stderr, flush=True)
+        
+        try:
+            for lines, in_offset in batches:
+                if pool:
+                    result = pool.submit(moderate_lines, lines, next_line, field, id_field)
+                else:
+                    result = moderate_lines(lines, next_line, field, id_field)
+                in_flight.append((result, len(lines), in_offset))
+                next_line += len(lines)
+                
+                if len(in_flight) >= 2 * max(processes, 1):
+                    write_oldest()
+            
+            while in_flight:
+                write_oldest()
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+    
+    # Finished cleanly: nothing left to resume
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    
+    elapsed = time.perf_counter() - start
+    rate = records / elapsed if elapsed else 0.0
+    print(f"\r📄 {records:,} records ({rate:,.0f}/s)", file=sys.stderr)
+    return {'records': records, 'seconds': round(elapsed, 3), 'records_per_sec': round(rate, 1)}
@@ -0,0 +1,334 @@
+"""
+Chat Sessions Module
+Bounded conversation history per session id, in memory or on disk
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# (user message, model reply, estimated tokens of both)
+Exchange = Tuple[str, str, int]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the tokens a message costs in a request.
+    
+    Uses Gemini's rule of thumb of about 4 characters per token, plus a few
+    tokens for the role and turn markers; counting exactly would cost an
+    API call per message.
+    
+    Args:
+        text (str): Message text
+    
+    Returns:
+        int: Estimated token count
+    """
+    return len(text) // 4 + 4
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut text to the start that fits max_tokens by estimate_tokens()."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:max(0, (max_tokens - 4) * 4)]
+
+
+def truncate_exchange(exchange: Exchange, max_tokens: int) -> Exchange:
+    """
+    Shorten an exchange to fit the token budget.
+    
+    The user message keeps up to half the budget and the reply the rest,
+    each cut to its start.
+    
+    Args:
+        exchange (Exchange): Exchange over the budget
+        max_tokens (int): Token budget for the exchange
+    
+    Returns:
+        Exchange: The shortened exchange (still over budgets below 8 tokens)
+    """
+    user_message, reply, _ = exchange
+    user_message = _truncate(user_message, max_tokens // 2)
+    reply = _truncate(reply, max_tokens - estimate_tokens(user_message))
+    return user_message, reply, estimate_tokens(user_message) + estimate_tokens(reply)
+
+
+def trim_exchanges(exchanges: List[Exchange], max_tokens: int) -> List[Exchange]:
+    """
+    Drop the oldest exchanges until the history fits the token budget.
+    
+    A latest exchange that doesn't fit on its own is cut to its start
+    instead of dropped, so a follow-up question still has the answer it
+    refers to.
+    
+    Args:
+        exchanges (List[Exchange]): History, oldest first
+        max_tokens (int): Token budget for the history
+    
+    Returns:
+        List[Exchange]: The most recent exchanges that fit
+    """
+    total = 0
+    keep = len(exchanges)
+    while keep > 0 and total + exchanges[keep - 1][2] <= max_tokens:
+        total += exchanges[keep - 1][2]
+        keep -= 1
+    
+    if exchanges and keep == len(exchanges):
+        latest = truncate_exchange(exchanges[-1], max_tokens)
+        return [latest] if latest[2] <= max_tokens else []
+    return exchanges[keep:]
+
+
+def to_history(exchanges: List[Exchange]) -> List[dict]:
+    """
+    Convert exchanges to the SDK's chat history format.
+    
+    Args:
+        exchanges (List[Exchange]): History, oldest first
+    
+    Returns:
+        List[dict]: Alternating user/model contents for model.start_chat()
+    """
+    history = []
+    for user_message, reply, _ in exchanges:
+        history.append({'role': 'user', 'parts': [user_message]})
+        history.append({'role': 'model', 'parts': [reply]})
+    return history
+
+
+class SessionStore:
+    """Base class for session stores, with LRU and idle eviction."""
+    
+    backend = 'none'
+    
+    def __init__(self, max_sessions: int = 1000, idle_ttl: float = 1800.0,
+                 max_tokens: int = 2000):
+        """
+        Initialize the store.
+        
+        Args:
+            max_sessions (int): Sessions kept; the least recently used are evicted
+            idle_ttl (float): Seconds of inactivity after which a session expires
+            max_tokens (int): Token budget for each session's history
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_tokens = max_tokens
+        self.evictions = 0
+        self._lock = threading.Lock()
+    
+    def history(self, session_id: str) -> List[Exchange]:
+        """
+        Get a session's history.
+        
+        Args:
+            session_id (str): Session identifier
+        
+        Returns:
+            List[Exchange]: Exchanges within the token budget, oldest first;
+                            empty for new or expired sessions
+        """
+        with self._lock:
+            return self._load(session_id, time.time()) or []
+    
+    def append(self, session_id: str, user_message: str, reply: str) -> List[Exchange]:
+        """
+        Add an exchange to a session, trimming the history to the token budget.
+        
+        Args:
+            session_id (str): Session identifier
+            user_message (str): User's message
+            reply (str): Model's (moderated) reply
+        
+        Returns:
+            List[Exchange]: The session's history after the update
+        """
+        exchange = (user_message, reply, estimate_tokens(user_message) + estimate_tokens(reply))
+        with self._lock:
+            now = time.time()
+            exchanges = trim_exchanges((self._load(session_id, now) or []) + [exchange],
+                                       self.max_tokens)
+            self._save(session_id, exchanges, now)
+            return exchanges
+    
+    def delete(self, session_id: str):
+        """Forget a session."""
+        with self._lock:
+            self._delete(session_id)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._size()
+    
+    def stats(self) -> dict:
+        """
+        Get store statistics for monitoring.
+        
+        Returns:
+            dict: Backend name, session count, limits and evictions
+        """
+        return {
+            'backend': self.backend,
+            'sessions': len(self),
+            'max_sessions': self.max_sessions,
+            'idle_ttl': self.idle_ttl,
+            'max_tokens': self.max_tokens,
+            'evictions': self.evictions
+        }
+    
+    def reopen(self):
+        """Reconnect to the backing store in a forked worker process (no-op in memory)."""
+    
+    def _load(self, session_id: str, now: float) -> Optional[List[Exchange]]:
+        raise NotImplementedError
+    
+    def _save(self, session_id: str, exchanges: List[Exchange], now: float):
+        raise NotImplementedError
+    
+    def _delete(self, session_id: str):
+        raise NotImplementedError
+    
+    def _size(self) -> int:
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """In-process sessions, most recently used last."""
+    
+    backend = 'memory'
+    
+    def __init__(self, max_sessions: int = 1000, idle_ttl: float = 1800.0,
+                 max_tokens: int = 2000):
+        super().__init__(max_sessions, idle_ttl, max_tokens)
+        # session id -> (last used, exchanges)
+        self._sessions: 'OrderedDict[str, Tuple[float, List[Exchange]]]' = OrderedDict()
+    
+    def _load(self, session_id: str, now: float) -> Optional[List[Exchange]]:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        last_used, exchanges = entry
+        if last_used + self.idle_ttl <= now:
+            del self._sessions[session_id]
+            self.evictions += 1
+            return None
+        return exchanges
+    
+    def _save(self, session_id: str, exchanges: List[Exchange], now: float):
+        self._sessions[session_id] = (now, exchanges)
+        self._sessions.move_to_end(session_id)
+        
+        # Least recently used first: drop idle sessions, then any over the limit
+        while self._sessions:
+            oldest_id, (last_used, _) = next(iter(self._sessions.items()))
+            if last_used + self.idle_ttl > now and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[oldest_id]
+            self.evictions += 1
+    
+    def _delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+    
+    def _size(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """On-disk sessions that survive restarts."""
+    
+    backend = 'sqlite'
+    
+    def __init__(self, path: str, max_sessions: int = 1000, idle_ttl: float = 1800.0,
+                 max_tokens: int = 2000):
+        """
+        Open (or create) the session database.
+        
+        Args:
+            path (str): SQLite database file
+            max_sessions (int): Sessions kept; the least recently used are evicted
+            idle_ttl (float): Seconds of inactivity after which a session expires
+            max_tokens (int): Token budget for each session's history
+        """
+        super().__init__(max_sessions, idle_ttl, max_tokens)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            'id TEXT PRIMARY KEY, exchanges TEXT NOT NULL, last_used REAL NOT NULL)'
+        )
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)'
+        )
+        self._db.commit()
+    
+    def reopen(self):
+        """Open a connection of this process's own; SQLite connections must not cross fork()."""
+        with self._lock:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+    
+    def _load(self, session_id: str, now: float) -> Optional[List[Exchange]]:
+        row = self._db.execute(
+            'SELECT exchanges, last_used FROM sessions WHERE id = ?', (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        exchanges, last_used = row
+        if last_used + self.idle_ttl <= now:
+            self._delete(session_id)
+            self.evictions += 1
+            return None
+        return [tuple(exchange) for exchange in json.loads(exchanges)]
+    
+    def _save(self, session_id: str, exchanges: List[Exchange], now: float):
+        self._db.execute(
+            'INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)',
+            (session_id, json.dumps(exchanges, separators=(',', ':')), now)
+        )
+        evicted = self._db.execute(
+            'DELETE FROM sessions WHERE last_used <= ? OR id IN ('
+            'SELECT id FROM sessions ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+            (now - self.idle_ttl, self.max_sessions)
+        ).rowcount
+        self.evictions += max(evicted, 0)
+        self._db.commit()
+    
+    def _delete(self, session_id: str):
+        self._db.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+        self._db.commit()
+    
+    def _size(self) -> int:
+        return self._db.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+
+def create_session_store_from_env() -> Optional[SessionStore]:
+    """
+    Build the session store configured by environment variables.
+    
+    CHAT_SESSIONS selects the backend (memory, sqlite or off),
+    CHAT_SESSION_LIMIT the number of sessions kept, CHAT_SESSION_TTL the
+    idle lifetime in seconds, CHAT_HISTORY_TOKENS the history budget per
+    session and CHAT_SESSION_PATH the SQLite file.
+    
+    Returns:
+        Optional[SessionStore]: Configured store, or None if disabled
+    """
+    backend = os.getenv('CHAT_SESSIONS', 'memory').lower()
+    max_sessions = int(os.getenv('CHAT_SESSION_LIMIT', 1000))
+    idle_ttl = float(os.getenv('CHAT_SESSION_TTL', 1800))
+    max_tokens = int(os.getenv('CHAT_HISTORY_TOKENS', 2000))
+    
+    if backend == 'memory':
+        return MemorySessionStore(max_sessions, idle_ttl, max_tokens)
+    if backend == 'sqlite':
+        path = os.getenv('CHAT_SESSION_PATH', 'chat_sessions.sqlite3')
+        return SQLiteSessionStore(path, max_sessions, idle_ttl, max_tokens)
+    if backend not in ('off', 'none', ''):
+        raise ValueError(f"Unknown CHAT_SESSIONS backend: {backend}")
+    return None
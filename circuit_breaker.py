@@ -0,0 +1,154 @@
+"""
+Circuit Breaker Module
+Fails fast while the upstream model is degraded instead of piling up slow calls
+"""
+
+import threading
+import time
+from typing import Any, Awaitable, Callable
+
+from retry import is_retryable
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit is open."""
+    
+    def __init__(self, retry_after: float):
+        super().__init__(f"Upstream unavailable, circuit open for {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    
+    Closed: calls go through. After `failure_threshold` transient failures
+    in a row it opens and rejects calls for `reset_timeout` seconds. Then
+    it goes half-open and lets one trial call through: success closes it,
+    failure opens it again.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 is_failure: Callable[[BaseException], bool] = is_retryable,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the circuit breaker.
+        
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit
+            reset_timeout (float): Seconds to stay open before a trial call
+            is_failure: Decides which errors count as upstream failures
+                        (by default only transient ones, not bad requests)
+            clock: Monotonic time source
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+    
+    def before_call(self):
+        """
+        Check that a call may go upstream.
+        
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with the
+                              trial call already running
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            
+            remaining = self._opened_at + self.reset_timeout - self.clock()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+            
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            
+            self.rejected += 1
+            raise CircuitOpenError(max(remaining, 0.0))
+    
+    def record_success(self):
+        """Close the circuit after a successful call."""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+    
+    def record_failure(self, error: BaseException):
+        """
+        Count a failed call, opening the circuit once the threshold is hit.
+        
+        Args:
+            error: Exception raised by the upstream call
+        """
+        with self._lock:
+            self._trial_running = False
+            if not self.is_failure(error):
+                return
+            
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                self.state = self.OPEN
+                self._opened_at = self.clock()
+    
+    def call(self, func: Callable[[], Any]) -> Any:
+        """
+        Call func through the breaker.
+        
+        Args:
+            func: Function making the upstream call
+        
+        Returns:
+            Any: Result of func; its errors are re-raised after being counted
+        """
+        self.before_call()
+        try:
+            result = func()
+        except BaseException as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+    
+    async def acall(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await func through the breaker.
+        
+        Args:
+            func: Coroutine function making the upstream call
+        
+        Returns:
+            Any: Result of func, as for call()
+        """
+        self.before_call()
+        try:
+            result = await func()
+        except BaseException as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+    
+    def stats(self) -> dict:
+        """Get the circuit state and counters for monitoring."""
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'times_opened': self.opened,
+            'rejected': self.rejected
+        }
@@ -3,10 +3,19 @@ Command-Line Interface for AI Moderation App
 Interactive CLI for chatting with Gemini AI with content moderation
 """
 
+import argparse
 import os
+import sys
+import threading
+import time
+import uuid
 from dotenv import load_dotenv
 from ai_client import AIClient
+from keyword_store import watch_from_env
+from metrics import METRICS, observe_client, observe_verdict_cache, track_request
 from moderation import ContentModerator
+from speculative import create_speculator_from_env
+from verdict_cache import create_verdict_cache_from_env
 
 
 def main():
@@ -26,7 +35,18 @@ def main():
     try:
         # Initialize AI client and moderator
         ai_client = AIClient()
-        moderator = ContentModerator()
+        moderator = ContentModerator(match_mode=os.getenv('MODERATION_MODE', ContentModerator.SUBSTRING_MODE),
+                                     verdict_cache=create_verdict_cache_from_env())
+        watch_from_env(moderator)
+        observe_client(ai_client)
+        observe_verdict_cache(moderator)
+        speculator = create_speculator_from_env()
+        
+        # Load the Gemini SDK while the user types the first message
+        threading.Thread(target=ai_client.warm, daemon=True).start()
+        
+        # One conversation per run, so follow-up questions have context
+        session_id = uuid.uuid4().hex
         
         print("\n✅ System ready! Start chatting...\n")
         
@@ -50,28 +70,43 @@ def main():
                 print_keywords(moderator)
                 continue
             
+            # Check for metrics command
+            if user_input.lower() == 'metrics':
+                print_metrics()
+                continue
+            
             # Skip empty input
             if not user_input:
                 print("⚠️  Please enter a message.")
                 continue
             
-            # Moderate input
-            is_approved, moderation_message = moderator.moderate_input(user_input)
-            
-            if not is_approved:
-                print(f"\n{moderation_message}")
-                continue
-            
-            # Get AI response
-            print("\n🤖 AI: ", end="", flush=True)
-            ai_response = ai_client.chat(user_input)
-            
-            # Moderate output
-            moderated_response = moderator.moderate_output(ai_response)
-            
-            # Print response
-            print(moderated_response)
-            
+            with track_request('cli') as tracked:
+                # AI response, moderated as it streams in
+                chunks = ai_client.chat_stream(user_input, moderate_stream=moderator.moderate_stream,
+                                               cache_scope=moderator.keyword_set.version,
+                                               session_id=session_id)
+                
+                # Moderate input (with the AI request already under way when
+                # speculative dispatch is on; it is dropped if the input is rejected)
+                if speculator is not None:
+                    (is_approved, moderation_message), chunks = speculator.stream(
+                        lambda: moderator.moderate_input(user_input), chunks,
+                        is_approved=lambda verdict: verdict[0]
+                    )
+                else:
+                    is_approved, moderation_message = moderator.moderate_input(user_input)
+                
+                if not is_approved:
+                    tracked.outcome = 'rejected'
+                    print(f"\n{moderation_message}")
+                    continue
+                
+                # Print the AI response as it arrives
+                print("\n🤖 AI: ", end="", flush=True)
+                for chunk in chunks:
+                    print(chunk, end="", flush=True)
+                print()
+    
     except KeyboardInterrupt:
         print("\n\n👋 Goodbye! (Interrupted)")
     except ValueError as e:
@@ -93,6 +128,7 @@ def print_help():
     print("  quit/exit/q  - Exit the application")
     print("  help         - Show this help message")
     print("  keywords     - Show list of blocked keywords")
+    print("  metrics      - Show request counts and stage latencies")
     print("=" * 60)
 
 
@@ -105,8 +141,141 @@ def print_keywords(moderator: ContentModerator):
     for keyword in keywords:
         print(f"  - {keyword}")
     print("=" * 60)
-    print(f"Total: {len(keywords)} keywords")
+    print(f"Total: {len(keywords)} keywords (version {moderator.keyword_info()['version']})")
+
+
+def print_metrics():
+    """Print this session's metrics in the Prometheus text format."""
+    print("\n" + "=" * 60)
+    print("📊 Metrics:")
+    print("=" * 60)
+    if not METRICS.enabled:
+        print("  Metrics are disabled (METRICS_ENABLED=false)")
+    else:
+        lines = METRICS.render().splitlines()
+        print('\n'.join(line for line in lines if not line.startswith('#')))
+    print("=" * 60)
+
+
+def run_command(argv):
+    """
+    Run a non-interactive CLI command.
+    
+    Args:
+        argv: Command-line arguments after the script name
+    
+    Returns:
+        int: Process exit code
+    """
+    parser = argparse.ArgumentParser(prog='cli.py', description='AI Moderation App commands')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    moderate = commands.add_parser('moderate', help='Moderate a JSONL file of records')
+    moderate.add_argument('--in', dest='in_path', required=True, help='Input JSONL file')
+    moderate.add_argument('--out', dest='out_path', required=True, help='Output JSONL file')
+    moderate.add_argument('--field', default='text', help='Record field to moderate (default: text)')
+    moderate.add_argument('--id-field', default='id', help='Record field copied as id (default: id)')
+    moderate.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                          help='Worker processes (default: CPU count)')
+    moderate.add_argument('--batch-size', type=int, default=1000, help='Lines per batch')
+    moderate.add_argument('--resume', action='store_true', help='Continue from the last checkpoint')
+    moderate.add_argument('--mmap', action='store_true', help='Memory-map the input file')
+    
+    run = commands.add_parser('run', help='Replay JSONL prompts through moderation and Gemini')
+    run.add_argument('--in', dest='in_path', required=True, help='Input JSONL file of prompts')
+    run.add_argument('--out', dest='out_path', required=True, help='Output JSONL file')
+    run.add_argument('--field', default='prompt', help='Record field with the prompt (default: prompt)')
+    run.add_argument('--id-field', default='id', help='Record field copied as id (default: id)')
+    run.add_argument('--concurrency', type=int, default=8, help='Requests in flight (default: 8)')
+    run.add_argument('--rpm', type=float, default=60, help='Gemini requests per minute (default: 60)')
+    run.add_argument('--burst', type=float, default=None, help='Rate limiter burst size')
+    run.add_argument('--max-attempts', type=int, default=5, help='Attempts per prompt (default: 5)')
+    run.add_argument('--fake', action='store_true', help='Use a local stub model instead of Gemini')
+    run.add_argument('--fake-latency', type=float, default=0.2, help='Stub model latency in seconds')
+    run.add_argument('--fake-error-rate', type=float, default=0.0, help='Stub model transient error rate')
+    
+    build_index = commands.add_parser('build-index', help='Compile a keyword list into an index file')
+    build_index.add_argument('--in', dest='in_path', required=True,
+                             help='Keyword file or directory of *.txt files')
+    build_index.add_argument('--out', dest='out_path', required=True,
+                             help='Index file to write (use the .kwidx suffix for KEYWORDS_PATH)')
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == 'build-index':
+        from keyword_index import write_index
+        from keyword_store import load_keywords
+        
+        try:
+            start = time.perf_counter()
+            info = write_index(load_keywords(args.in_path), args.out_path)
+        except OSError as e:
+            print(f"\n❌ {str(e)}")
+            return 1
+        print(f"✅ Wrote {args.out_path}: {info['keywords']} keywords, {info['states']} states, "
+              f"{info['bytes'] / 1e6:.1f} MB in {time.perf_counter() - start:.1f}s")
+    
+    if args.command == 'moderate':
+        from bulk_moderation import moderate_jsonl
+        from keyword_store import load_from_env
+        
+        load_dotenv()
+        try:
+            # Same keywords (KEYWORDS_PATH) and match mode (MODERATION_MODE) as the app
+            moderator = ContentModerator(
+                match_mode=os.getenv('MODERATION_MODE', ContentModerator.SUBSTRING_MODE)
+            )
+            load_from_env(moderator)
+            moderate_jsonl(
+                args.in_path, args.out_path,
+                field=args.field,
+                id_field=args.id_field,
+                processes=args.processes,
+                batch_size=args.batch_size,
+                resume=args.resume,
+                use_mmap=args.mmap,
+                moderator=moderator
+            )
+        except KeyboardInterrupt:
+            print("\n⏸️  Interrupted. Run again with --resume to continue.")
+            return 130
+        except (OSError, ValueError) as e:
+            print(f"\n❌ {str(e)}")
+            return 1
+    
+    if args.command == 'run':
+        from batch_runner import run_jsonl
+        from stub_model import StubModel
+        
+        load_dotenv()
+        try:
+            if args.fake:
+                model = StubModel(latency=args.fake_latency, error_rate=args.fake_error_rate)
+                ai_client = AIClient(model=model)
+            else:
+                ai_client = AIClient()
+            
+            run_jsonl(
+                args.in_path, args.out_path,
+                ai_client=ai_client,
+                field=args.field,
+                id_field=args.id_field,
+                concurrency=args.concurrency,
+                requests_per_minute=args.rpm,
+                burst=args.burst,
+                max_attempts=args.max_attempts
+            )
+        except KeyboardInterrupt:
+            print("\n⏸️  Interrupted.")
+            return 130
+        except (OSError, ValueError) as e:
+            print(f"\n❌ {str(e)}")
+            return 1
+    
+    return 0
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_command(sys.argv[1:]))
     main()
\ No newline at end of file
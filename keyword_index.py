@@ -0,0 +1,432 @@
+"""
+Keyword Index Module
+Compiled keyword matcher saved to disk and memory-mapped, so processes start without rebuilding it
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Set, Tuple
+
+from keyword_matcher import KeywordMatcher
+from keyword_store import fold_keywords, keyword_version
+
+# Bumped whenever the layout changes; older files must be rebuilt
+FORMAT_VERSION = 1
+
+MAGIC = b'KWINDEX\x00'
+
+# magic, format version, keyword list version, keyword count, distinct
+# keywords, states, transitions, outputs, keyword text length (characters),
+# text size (bytes), longest keyword, id of the empty keyword (-1 if none)
+HEADER = struct.Struct('<8sI16s8Ii4x')
+
+# Tables following the header, in file order, as (name, length field)
+_TABLES = (
+    ('edge_start', 'states+1'),
+    ('edge_chars', 'edges'),
+    ('edge_targets', 'edges'),
+    ('fail', 'states'),
+    ('depth', 'states'),
+    ('output_start', 'states+1'),
+    ('output_ids', 'outputs'),
+    ('lengths', 'distinct'),
+    ('position_start', 'distinct+1'),
+    ('positions', 'keywords'),
+    ('text_start', 'keywords+1'),
+)
+
+
+def write_index(keywords: Sequence[str], path: str) -> dict:
+    """
+    Compile keywords and save the matcher as an index file.
+    
+    The automaton is stored as flat little-endian uint32 tables: each
+    state's transitions are a sorted run of (character, target) pairs,
+    and its merged outputs a run of keyword ids. The keyword list itself
+    follows as UTF-8 text. The file is written next to `path` and renamed
+    over it, so processes loading it never see half a file.
+    
+    Args:
+        keywords: Keywords in the order violations are reported; folded
+                  and deduplicated like a KeywordSet's
+        path (str): Index file to write
+    
+    Returns:
+        dict: Keyword count, state count and file size in bytes
+    """
+    keywords = list(fold_keywords(keywords))
+    matcher = KeywordMatcher(keywords)
+    
+    # The automaton's tables, as KeywordMatcher builds them
+    goto = matcher._goto
+    tables = {name: array('I') for name, _ in _TABLES}
+    for state, transitions in enumerate(goto):
+        tables['edge_start'].append(len(tables['edge_chars']))
+        for char in sorted(transitions, key=ord):
+            tables['edge_chars'].append(ord(char))
+            tables['edge_targets'].append(transitions[char])
+        tables['output_start'].append(len(tables['output_ids']))
+        tables['output_ids'].extend(matcher._output[state])
+    tables['edge_start'].append(len(tables['edge_chars']))
+    tables['output_start'].append(len(tables['output_ids']))
+    tables['fail'].extend(matcher._fail)
+    tables['depth'].extend(matcher._depth)
+    tables['lengths'].extend(matcher._lengths)
+    for positions in matcher._positions:
+        tables['position_start'].append(len(tables['positions']))
+        tables['positions'].extend(positions)
+    tables['position_start'].append(len(tables['positions']))
+    
+    offset = 0
+    for keyword in keywords:
+        tables['text_start'].append(offset)
+        offset += len(keyword)
+    tables['text_start'].append(offset)
+    text = ''.join(keywords).encode('utf-8')
+    
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, keyword_version(keywords).encode('ascii'),
+        len(keywords), len(matcher._distinct), len(goto), len(tables['edge_chars']),
+        len(tables['output_ids']), offset, len(text), matcher.max_length,
+        -1 if matcher._empty_id is None else matcher._empty_id
+    )
+    
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as handle:
+        handle.write(header)
+        for name, _ in _TABLES:
+            table = tables[name]
+            if sys.byteorder != 'little':
+                table.byteswap()
+            table.tofile(handle)
+        handle.write(text)
+    os.replace(temp_path, path)
+    
+    return {'keywords': len(keywords), 'states': len(goto), 'bytes': os.path.getsize(path)}
+
+
+class MappedKeywordMatcher:
+    """
+    KeywordMatcher backed by a memory-mapped index file.
+    
+    Loading maps the file and decodes only the keyword list, so it takes
+    milliseconds where compiling a large list takes seconds. The tables
+    stay in the page cache, shared by every process that maps the same
+    file. Apart from the few states nearest the root, which are copied
+    into dicts, scans read transitions straight from the mapped tables,
+    making them two to four times slower per character than
+    KeywordMatcher: worth it where startup time and memory per process
+    matter more than scan throughput.
+    """
+    
+    # States within this many characters of the root get dict transitions...
+    HOT_DEPTH = 2
+    
+    # ...unless there are more than this many of them
+    HOT_STATES = 4096
+    
+    def __init__(self, path: str):
+        """
+        Map an index file.
+        
+        Args:
+            path (str): File written by write_index()
+        
+        Raises:
+            ValueError: The file is not an index or was written by another format version
+        """
+        self.path = path
+        with open(path, 'rb') as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        
+        if len(view) < HEADER.size:
+            raise ValueError(f"Not a keyword index: {path}")
+        (magic, format_version, version, keyword_count, distinct, states, edges, outputs,
+         text_length, text_size, max_length, empty_id) = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"Not a keyword index: {path}")
+        if format_version != FORMAT_VERSION:
+            raise ValueError(f"Keyword index {path} has format {format_version}, "
+                             f"expected {FORMAT_VERSION}; rebuild it")
+        
+        sizes = {'states': states, 'states+1': states + 1, 'edges': edges, 'outputs': outputs,
+                 'distinct': distinct, 'distinct+1': distinct + 1,
+                 'keywords': keyword_count, 'keywords+1': keyword_count + 1}
+        offset = HEADER.size
+        tables = {}
+        for name, length in _TABLES:
+            end = offset + 4 * sizes[length]
+            if sys.byteorder == 'little':
+                tables[name] = view[offset:end].cast('I')
+            else:
+                # Big-endian hosts read a swapped copy instead of the mapping
+                tables[name] = array('I', view[offset:end].tobytes())
+                tables[name].byteswap()
+            offset = end
+        
+        self.version = version.rstrip(b'\x00').decode('ascii')
+        self.max_length = max_length
+        self._empty_id = empty_id if empty_id >= 0 else None
+        self._edge_start = tables['edge_start']
+        self._edge_chars = tables['edge_chars']
+        self._edge_targets = tables['edge_targets']
+        self._fail = tables['fail']
+        self._depth = tables['depth']
+        self._output_start = tables['output_start']
+        self._output_ids = tables['output_ids']
+        self._lengths = tables['lengths']
+        self._position_start = tables['position_start']
+        self._positions = tables['positions']
+        
+        text = str(view[offset:offset + text_size], 'utf-8')
+        starts = tables['text_start']
+        if len(text) != text_length:
+            raise ValueError(f"Keyword index {path} is truncated or corrupt")
+        # Same attributes as KeywordMatcher, so KeywordSet can hold either
+        self.keywords = tuple(text[starts[i]:starts[i + 1]] for i in range(keyword_count))
+        self._hot = self._hot_states()
+    
+    def __len__(self) -> int:
+        return len(self.keywords)
+    
+    @property
+    def state_count(self) -> int:
+        """Number of states in the compiled automaton."""
+        return len(self._fail)
+    
+    def _hot_states(self) -> Dict[int, Dict[str, int]]:
+        """
+        Copy the transitions of the states nearest the root into dicts.
+        
+        Scans spend most steps within HOT_DEPTH characters of the root, so
+        these few states (at most HOT_STATES) are looked up by dict like
+        KeywordMatcher's; deeper ones are searched in the mapped tables.
+        """
+        edge_start = self._edge_start
+        edge_chars = self._edge_chars
+        edge_targets = self._edge_targets
+        hot = {}
+        level = [0]
+        for _ in range(self.HOT_DEPTH + 1):
+            if len(hot) + len(level) > self.HOT_STATES:
+                break
+            next_level = []
+            for state in level:
+                low, high = edge_start[state], edge_start[state + 1]
+                hot[state] = dict(zip(map(chr, edge_chars[low:high]), edge_targets[low:high]))
+                next_level.extend(edge_targets[low:high])
+            level = next_level
+        return hot
+    
+    def _next_state(self, state: int, char: str) -> int:
+        """
+        Follow the automaton on one character, through failure links as needed.
+        
+        Outside the hot states, transitions are found by binary search in
+        the state's sorted run, or compared directly when, like most deep
+        states, it has only one. find_ids and find_spans inline this loop.
+        """
+        hot = self._hot
+        edge_start = self._edge_start
+        edge_chars = self._edge_chars
+        code = ord(char)
+        while True:
+            transitions = hot.get(state)
+            if transitions is not None:
+                next_state = transitions.get(char)
+                if next_state is not None:
+                    return next_state
+            else:
+                low, high = edge_start[state], edge_start[state + 1]
+                if high - low == 1:
+                    if edge_chars[low] == code:
+                        return self._edge_targets[low]
+                else:
+                    index = bisect_left(edge_chars, code, low, high)
+                    if index < high and edge_chars[index] == code:
+                        return self._edge_targets[index]
+            if not state:
+                return 0
+            state = self._fail[state]
+    
+    def find_ids(self, text: str) -> Set[int]:
+        """
+        Find which distinct keywords occur in the text.
+        
+        Args:
+            text (str): Text to scan, already case-normalized
+        
+        Returns:
+            Set[int]: Internal ids of the keywords found
+        """
+        found = set()
+        if not text:
+            return found
+        if self._empty_id is not None:
+            found.add(self._empty_id)
+        
+        hot = self._hot
+        edge_start = self._edge_start
+        edge_chars = self._edge_chars
+        edge_targets = self._edge_targets
+        fail = self._fail
+        output_start = self._output_start
+        output_ids = self._output_ids
+        state = 0
+        
+        for char in text:
+            # _next_state, inlined: this loop is the hot path
+            while True:
+                transitions = hot.get(state)
+                if transitions is not None:
+                    next_state = transitions.get(char)
+                    if next_state is not None:
+                        state = next_state
+                        break
+                else:
+                    code = ord(char)
+                    low, high = edge_start[state], edge_start[state + 1]
+                    if high - low == 1:
+                        if edge_chars[low] == code:
+                            state = edge_targets[low]
+                            break
+                    else:
+                        index = bisect_left(edge_chars, code, low, high)
+                        if index < high and edge_chars[index] == code:
+                            state = edge_targets[index]
+                            break
+                if not state:
+                    break
+                state = fail[state]
+            if state:
+                low, high = output_start[state], output_start[state + 1]
+                if low != high:
+                    found.update(output_ids[low:high])
+        
+        return found
+    
+    def find_spans(self, text: str) -> Tuple[Set[int], List[Tuple[int, int]]]:
+        """
+        Find every keyword occurrence in the text with its position.
+        
+        Args:
+            text (str): Text to scan, already case-normalized
+        
+        Returns:
+            Tuple[Set[int], List[Tuple[int, int]]]: (keyword_ids, spans)
+                - keyword_ids: Internal ids of the keywords found
+                - spans: (start, end) offsets of every non-empty match
+        """
+        found = set()
+        spans = []
+        if not text:
+            return found, spans
+        if self._empty_id is not None:
+            found.add(self._empty_id)
+        
+        hot = self._hot
+        edge_start = self._edge_start
+        edge_chars = self._edge_chars
+        edge_targets = self._edge_targets
+        fail = self._fail
+        output_start = self._output_start
+        output_ids = self._output_ids
+        lengths = self._lengths
+        state = 0
+        
+        for end, char in enumerate(text, 1):
+            while True:
+                transitions = hot.get(state)
+                if transitions is not None:
+                    next_state = transitions.get(char)
+                    if next_state is not None:
+                        state = next_state
+                        break
+                else:
+                    code = ord(char)
+                    low, high = edge_start[state], edge_start[state + 1]
+                    if high - low == 1:
+                        if edge_chars[low] == code:
+                            state = edge_targets[low]
+                            break
+                    else:
+                        index = bisect_left(edge_chars, code, low, high)
+                        if index < high and edge_chars[index] == code:
+                            state = edge_targets[index]
+                            break
+                if not state:
+                    break
+                state = fail[state]
+            if state:
+                low, high = output_start[state], output_start[state + 1]
+                if low != high:
+                    for keyword_id in output_ids[low:high]:
+                        found.add(keyword_id)
+                        spans.append((end - lengths[keyword_id], end))
+        
+        return found, spans
+    
+    def pending_length(self, text: str) -> int:
+        """
+        Length of the longest suffix of the text that starts some keyword.
+        
+        Args:
+            text (str): Text to check, already case-normalized
+        
+        Returns:
+            int: Number of trailing characters that may begin a keyword
+        """
+        state = 0
+        for char in text[-self.max_length:] if self.max_length else '':
+            state = self._next_state(state, char)
+        return self._depth[state]
+    
+    def keywords_for(self, keyword_ids: Set[int]) -> List[str]:
+        """
+        Convert internal keyword ids to keywords, in keyword-list order.
+        
+        Args:
+            keyword_ids (Set[int]): Ids returned by find_ids or find_spans
+        
+        Returns:
+            List[str]: Matching keywords
+        """
+        if not keyword_ids:
+            return []
+        starts = self._position_start
+        positions = sorted(
+            position
+            for keyword_id in keyword_ids
+            for position in self._positions[starts[keyword_id]:starts[keyword_id + 1]]
+        )
+        return [self.keywords[position] for position in positions]
+    
+    def find_all(self, text: str) -> List[str]:
+        """
+        Find which keywords occur in the text, in keyword-list order.
+        
+        Args:
+            text (str): Text to scan, already case-normalized
+        
+        Returns:
+            List[str]: Keywords found in the text
+        """
+        return self.keywords_for(self.find_ids(text))
+
+
+def load_index(path: str) -> MappedKeywordMatcher:
+    """
+    Map a keyword index file.
+    
+    Args:
+        path (str): File written by write_index()
+    
+    Returns:
+        MappedKeywordMatcher: Matcher reading the mapped tables
+    """
+    return MappedKeywordMatcher(path)
@@ -0,0 +1,324 @@
+"""
+Keyword Matcher Module
+Compiled multi-keyword matcher (Aho-Corasick) used by the content moderator
+"""
+
+from collections import deque
+from typing import Dict, List, Sequence, Set, Tuple
+
+
+class KeywordMatcher:
+    """Finds every occurrence of a set of keywords in a single pass over text."""
+    
+    def __init__(self, keywords: Sequence[str]):
+        """
+        Compile the keywords into an Aho-Corasick automaton.
+        
+        Args:
+            keywords: Keywords to match, in the order violations are reported
+        """
+        self.keywords = tuple(keywords)
+        
+        # Duplicate keywords share one entry in the automaton
+        self._distinct: List[str] = []
+        self._positions: List[List[int]] = []
+        distinct_ids: Dict[str, int] = {}
+        for position, keyword in enumerate(self.keywords):
+            keyword_id = distinct_ids.get(keyword)
+            if keyword_id is None:
+                keyword_id = distinct_ids[keyword] = len(self._distinct)
+                self._distinct.append(keyword)
+                self._positions.append([])
+            self._positions[keyword_id].append(position)
+        
+        # The empty keyword matches any non-empty text, like `'' in text` does
+        self._empty_id = distinct_ids.get('')
+        
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+        self._depth: List[int] = [0]
+        self._lengths = [len(keyword) for keyword in self._distinct]
+        self.max_length = max(self._lengths, default=0)
+        self._build()
+    
+    def _build(self):
+        """Build the trie, failure links and merged output sets."""
+        goto = self._goto
+        own_output: List[List[int]] = [[]]
+        
+        for keyword_id, keyword in enumerate(self._distinct):
+            if not keyword:
+                continue
+            state = 0
+            for char in keyword:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    own_output.append([])
+                    self._depth.append(self._depth[state] + 1)
+                state = next_state
+            own_output[state].append(keyword_id)
+        
+        fail = self._fail = [0] * len(goto)
+        output = self._output = [()] * len(goto)
+        
+        # Breadth-first so every failure target is finished before it is used
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            output[state] = tuple(own_output[state]) + output[fail[state]]
+            for char, next_state in goto[state].items():
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                queue.append(next_state)
+    
+    def __len__(self) -> int:
+        return len(self.keywords)
+    
+    @property
+    def state_count(self) -> int:
+        """Number of states in the compiled automaton."""
+        return len(self._goto)
+    
+    def find_ids(self, text: str) -> Set[int]:
+        """
+        Find which distinct keywords occur in the text.
+        
+        Args:
+            text (str): Text to scan, already case-normalized
+        
+        Returns:
+            Set[int]: Internal ids of the keywords found
+        """
+        found = set()
+        if not text:
+            return found
+        if self._empty_id is not None:
+            found.add(self._empty_id)
+        
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        
+        for char in text:
+            next_state = goto[state].get(char)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto[state].get(char)
+            if next_state is None:
+                state = 0
+                continue
+            state = next_state
+            if output[state]:
+                found.update(output[state])
+        
+        return found
+    
+    def find_spans(self, text: str) -> Tuple[Set[int], List[Tuple[int, int]]]:
+        """
+        Find every keyword occurrence in the text with its position.
+        
+        Args:
+            text (str): Text to scan, already case-normalized
+        
+        Returns:
+            Tuple[Set[int], List[Tuple[int, int]]]: (keyword_ids, spans)
+                - keyword_ids: Internal ids of the keywords found
+                - spans: (start, end) offsets of every non-empty match
+        """
+        found = set()
+        spans = []
+        if not text:
+            return found, spans
+        if self._empty_id is not None:
+            found.add(self._empty_id)
+        
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        lengths = self._lengths
+        state = 0
+        
+        for end, char in enumerate(text, 1):
+            next_state = goto[state].get(char)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto[state].get(char)
+            if next_state is None:
+                state = 0
+                continue
+            state = next_state
+            if output[state]:
+                found.update(output[state])
+                for keyword_id in output[state]:
+                    spans.append((end - lengths[keyword_id], end))
+        
+        return found, spans
+    
+    def pending_length(self, text: str) -> int:
+        """
+        Length of the longest suffix of the text that starts some keyword.
+        
+        Used by streaming moderation to hold back text that could still turn
+        into a match once more text arrives.
+        
+        Args:
+            text (str): Text to check, already case-normalized
+        
+        Returns:
+            int: Number of trailing characters that may begin a keyword
+        """
+        goto = self._goto
+        fail = self._fail
+        state = 0
+        
+        # The answer is never longer than a keyword, so only the tail matters
+        for char in text[-self.max_length:] if self.max_length else '':
+            next_state = goto[state].get(char)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto[state].get(char)
+            state = next_state or 0
+        
+        return self._depth[state]
+    
+    def keywords_for(self, keyword_ids: Set[int]) -> List[str]:
+        """
+        Convert internal keyword ids to keywords, in keyword-list order.
+        
+        Duplicated keywords are reported once per occurrence in the list,
+        matching a per-keyword `keyword in text` scan.
+        
+        Args:
+            keyword_ids (Set[int]): Ids returned by find_ids or find_spans
+        
+        Returns:
+            List[str]: Matching keywords
+        """
+        if not keyword_ids:
+            return []
+        positions = sorted(
+            position
+            for keyword_id in keyword_ids
+            for position in self._positions[keyword_id]
+        )
+        return [self.keywords[position] for position in positions]
+    
+    def find_all(self, text: str) -> List[str]:
+        """
+        Find which keywords occur in the text, in keyword-list order.
+        
+        Args:
+            text (str): Text to scan, already case-normalized
+        
+        Returns:
+            List[str]: Keywords found in the text
+        """
+        return self.keywords_for(self.find_ids(text))
+
+
+class LayeredKeywordMatcher:
+    """
+    Matches a compiled base matcher's keywords plus a small extra matcher's.
+    
+    Lets a list that only adds a few keywords to a large shared one reuse
+    the shared automaton: only the extra keywords are compiled, and each
+    scan merges both results as one matcher over base + extra would report them.
+    """
+    
+    def __init__(self, base, extra: KeywordMatcher):
+        """
+        Initialize the layered matcher.
+        
+        Args:
+            base: Matcher for the shared keywords (a KeywordMatcher or
+                  MappedKeywordMatcher), not copied
+            extra (KeywordMatcher): Matcher for the keywords added on top
+        """
+        self.base = base
+        self.extra = extra
+        self.keywords = base.keywords + extra.keywords
+        self.max_length = max(base.max_length, extra.max_length)
+        # Extra ids are shifted past every base id (ids never reach the keyword count)
+        self._split = len(base.keywords)
+    
+    def __len__(self) -> int:
+        return len(self.keywords)
+    
+    def _merge_ids(self, base_ids: Set[int], extra_ids: Set[int]) -> Set[int]:
+        """Combine ids from both matchers into ids of this one."""
+        split = self._split
+        return base_ids | {split + keyword_id for keyword_id in extra_ids}
+    
+    def find_ids(self, text: str) -> Set[int]:
+        """
+        Find which distinct keywords occur in the text.
+        
+        Args:
+            text (str): Text to scan, already case-normalized
+        
+        Returns:
+            Set[int]: Internal ids of the keywords found
+        """
+        return self._merge_ids(self.base.find_ids(text), self.extra.find_ids(text))
+    
+    def find_spans(self, text: str) -> Tuple[Set[int], List[Tuple[int, int]]]:
+        """
+        Find every keyword occurrence in the text with its position.
+        
+        Args:
+            text (str): Text to scan, already case-normalized
+        
+        Returns:
+            Tuple[Set[int], List[Tuple[int, int]]]: (keyword_ids, spans)
+        """
+        base_ids, spans = self.base.find_spans(text)
+        extra_ids, extra_spans = self.extra.find_spans(text)
+        return self._merge_ids(base_ids, extra_ids), spans + extra_spans
+    
+    def pending_length(self, text: str) -> int:
+        """
+        Length of the longest suffix of the text that starts some keyword.
+        
+        Args:
+            text (str): Text to check, already case-normalized
+        
+        Returns:
+            int: Number of trailing characters that may begin a keyword
+        """
+        return max(self.base.pending_length(text), self.extra.pending_length(text))
+    
+    def keywords_for(self, keyword_ids: Set[int]) -> List[str]:
+        """
+        Convert internal keyword ids to keywords, base keywords first.
+        
+        Args:
+            keyword_ids (Set[int]): Ids returned by find_ids or find_spans
+        
+        Returns:
+            List[str]: Matching keywords
+        """
+        if not keyword_ids:
+            return []
+        split = self._split
+        base_ids = {keyword_id for keyword_id in keyword_ids if keyword_id < split}
+        extra_ids = {keyword_id - split for keyword_id in keyword_ids if keyword_id >= split}
+        return self.base.keywords_for(base_ids) + self.extra.keywords_for(extra_ids)
+    
+    def find_all(self, text: str) -> List[str]:
+        """
+        Find which keywords occur in the text, base keywords first.
+        
+        Args:
+            text (str): Text to scan, already case-normalized
+        
+        Returns:
+            List[str]: Keywords found in the text
+        """
+        return self.keywords_for(self.find_ids(text))
@@ -0,0 +1,348 @@
+"""
+Keyword Store Module
+Versioned keyword sets loaded from files and hot-reloaded when they change
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from keyword_matcher import KeywordMatcher, LayeredKeywordMatcher
+from text_normalizer import normalize_text
+from word_matcher import LayeredWordMatcher, WordMatcher
+
+# File name suffix of compiled keyword index files (see keyword_index)
+INDEX_SUFFIX = '.kwidx'
+
+
+def fold_keywords(keywords: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Fold keywords like the text they are matched against, dropping duplicates.
+    
+    A keyword made only of characters folding drops (zero-width spaces and
+    the like) is left out rather than turned into one matching every text.
+    
+    Args:
+        keywords: Keywords in order
+    
+    Returns:
+        Tuple[str, ...]: Folded keywords, each at its first position
+    """
+    folded = {}
+    for keyword in keywords:
+        folded_keyword = normalize_text(keyword)
+        if folded_keyword or not keyword:
+            folded[folded_keyword] = None
+    return tuple(folded)
+
+
+def keyword_version(keywords: Sequence[str]) -> str:
+    """
+    Get a short content hash identifying a keyword list.
+    
+    Args:
+        keywords: Keywords in order
+    
+    Returns:
+        str: First 12 hex digits of the SHA-256 of the list
+    """
+    return hashlib.sha256('\n'.join(keywords).encode('utf-8')).hexdigest()[:12]
+
+
+class KeywordSet:
+    """
+    A keyword list together with its version and compiled matchers.
+    
+    A moderator holds one KeywordSet and replaces it as a whole, so a call
+    that picked up a set keeps a consistent list and matcher to the end.
+    The keywords are folded (see text_normalizer) and deduplicated here,
+    so however a list comes in it matches folded text, and they are kept
+    as a tuple: a set never changes, so its version and matchers stay
+    valid and are built once.
+    """
+    
+    def __init__(self, keywords: Sequence[str], source: str = 'built-in',
+                 matcher: Optional[KeywordMatcher] = None):
+        """
+        Initialize the keyword set.
+        
+        Args:
+            keywords: Blocked keywords
+            source (str): Where the keywords came from, for reporting
+            matcher: Already compiled substring matcher for the keywords,
+                     e.g. a MappedKeywordMatcher loaded from an index file
+                     (whose keywords were folded when it was written)
+        """
+        self.keywords: Tuple[str, ...] = tuple(keywords) if matcher is not None else fold_keywords(keywords)
+        self.source = source
+        self.version = keyword_version(self.keywords)
+        self.loaded_at = time.time()
+        # Index file the matcher is mapped from, which other processes can map too
+        self.index_path: Optional[str] = getattr(matcher, 'path', None)
+        self._matcher = matcher
+        self._word_matcher: Optional[WordMatcher] = None
+    
+    def matcher(self) -> KeywordMatcher:
+        """
+        Get the compiled substring matcher, building it on first use.
+        
+        Returns:
+            KeywordMatcher: Matcher for the keywords
+        """
+        matcher = self._matcher
+        if matcher is None:
+            matcher = self._matcher = KeywordMatcher(self.keywords)
+        return matcher
+    
+    def word_matcher(self) -> WordMatcher:
+        """
+        Get the compiled whole-word matcher, building it on first use.
+        
+        Returns:
+            WordMatcher: Matcher for the keywords and their inflections
+        """
+        matcher = self._word_matcher
+        if matcher is None:
+            matcher = self._word_matcher = WordMatcher(self.keywords)
+        return matcher
+    
+    def info(self) -> dict:
+        """
+        Get the set's identity for monitoring.
+        
+        Returns:
+            dict: Version hash, keyword count, source and load time
+        """
+        return {
+            'version': self.version,
+            'count': len(self.keywords),
+            'source': self.source,
+            'loaded_at': self.loaded_at
+        }
+
+
+class LayeredKeywordSet(KeywordSet):
+    """
+    A shared keyword set plus a few extra keywords on top of it.
+    
+    Matches like a set of base + extra keywords, but reuses the base set's
+    compiled matchers: only the extra keywords are compiled, and checks
+    merge both matchers' results.
+    """
+    
+    def __init__(self, base: KeywordSet, extra: KeywordSet, source: Optional[str] = None):
+        """
+        Initialize the layered set.
+        
+        Args:
+            base (KeywordSet): Shared keyword set, whose matchers are reused
+            extra (KeywordSet): Keywords added on top, none of them in base
+            source (str): Where the keywords came from, for reporting
+        """
+        super().__init__(base.keywords + extra.keywords,
+                         source or f"{base.source} + {len(extra.keywords)} keywords")
+        self.base = base
+        self.extra = extra
+    
+    def matcher(self) -> LayeredKeywordMatcher:
+        """
+        Get the substring matcher over both sets, building it on first use.
+        
+        Returns:
+            LayeredKeywordMatcher: Matcher for the base and extra keywords
+        """
+        matcher = self._matcher
+        if matcher is None:
+            matcher = self._matcher = LayeredKeywordMatcher(self.base.matcher(), self.extra.matcher())
+        return matcher
+    
+    def word_matcher(self) -> LayeredWordMatcher:
+        """
+        Get the whole-word matcher over both sets, building it on first use.
+        
+        Returns:
+            LayeredWordMatcher: Matcher for the base and extra keywords
+        """
+        matcher = self._word_matcher
+        if matcher is None:
+            matcher = self._word_matcher = LayeredWordMatcher(self.base.word_matcher(),
+                                                              self.extra.word_matcher())
+        return matcher
+
+
+def _keyword_files(path: str) -> List[str]:
+    """List the keyword files at path: the file itself, or a directory's *.txt files."""
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.endswith('.txt') and not name.startswith('.')
+        )
+    return [path]
+
+
+def load_keywords(path: str) -> List[str]:
+    """
+    Load blocked keywords from a file or a directory of *.txt files.
+    
+    One keyword per line; blank lines and lines starting with # are
+    skipped. Keywords are folded like the text they are matched against
+    (see text_normalizer) and duplicates dropped.
+    
+    Args:
+        path (str): Keyword file or directory
+    
+    Returns:
+        List[str]: Keywords in file order
+    """
+    keywords = []
+    for file_path in _keyword_files(path):
+        with open(file_path, 'r', encoding='utf-8') as handle:
+            for line in handle:
+                keyword = line.strip()
+                if keyword and not keyword.startswith('#'):
+                    keywords.append(keyword)
+    return list(fold_keywords(keywords))
+
+
+class KeywordWatcher:
+    """Polls a keyword file or directory and swaps new sets into a moderator."""
+    
+    def __init__(self, moderator, path: str, interval: float = 2.0):
+        """
+        Initialize the watcher.
+        
+        Args:
+            moderator (ContentModerator): Moderator whose keywords are replaced
+            path (str): Keyword file or directory
+            interval (float): Seconds between checks for changes
+        """
+        self.moderator = moderator
+        self.path = path
+        self.interval = interval
+        self.reloads = 0
+        self._signature = None
+        self._pending = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _current_signature(self) -> Tuple:
+        """Get the names, sizes and modification times of the keyword files."""
+        signature = []
+        for file_path in _keyword_files(self.path):
+            stat = os.stat(file_path)
+            signature.append((file_path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+    
+    def check(self, settle: bool = True) -> bool:
+        """
+        Reload the keywords if the files changed since the last check.
+        
+        The new set (and its matcher) is built on the calling thread and
+        then swapped in, so moderation calls are never blocked by a reload.
+        
+        Args:
+            settle (bool): Only reload once the files look the same on two
+                           checks in a row, so a file still being written
+                           isn't loaded half-way
+        
+        Returns:
+            bool: True if a new keyword set was swapped in
+        """
+        signature = self._current_signature()
+        if signature == self._signature:
+            return False
+        if settle and signature != self._pending:
+            self._pending = signature
+            return False
+        
+        if self.path.endswith(INDEX_SUFFIX):
+            # Compiled index: mapping it is cheap, so load it and compare versions
+            from keyword_index import load_index
+            matcher = load_index(self.path)
+            keywords = matcher.keywords
+        else:
+            matcher = None
+            keywords = load_keywords(self.path)
+        self._signature = signature
+        if keyword_version(keywords) == self.moderator.keyword_info()['version']:
+            return False
+        
+        if matcher is not None:
+            keyword_set = self.moderator.use_matcher(matcher, source=self.path)
+        else:
+            keyword_set = self.moderator.swap_keywords(keywords, source=self.path)
+        self.reloads += 1
+        print(f"🔄 Loaded {len(keywords)} keywords from {self.path} (version {keyword_set.version})")
+        return True
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # Keep serving the current set until the files are fixed
+                print(f"❌ Error reloading keywords: {str(e)}")
+    
+    def start(self) -> 'KeywordWatcher':
+        """
+        Load the keywords now and keep watching in a background thread.
+        
+        Returns:
+            KeywordWatcher: self
+        """
+        self.check(settle=False)
+        if self.interval > 0 and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='keyword-watcher', daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self):
+        """Stop watching for changes."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def watch_from_env(moderator) -> Optional[KeywordWatcher]:
+    """
+    Load and watch the keyword file configured by environment variables.
+    
+    KEYWORDS_PATH names a keyword file or directory, or a compiled index
+    file (*.kwidx, see keyword_index), replacing the built-in list;
+    KEYWORDS_RELOAD_INTERVAL sets the seconds between checks (0 loads once
+    without watching).
+    
+    Args:
+        moderator (ContentModerator): Moderator to load the keywords into
+    
+    Returns:
+        Optional[KeywordWatcher]: Running watcher, or None if not configured
+    """
+    path = os.getenv('KEYWORDS_PATH')
+    if not path:
+        return None
+    interval = float(os.getenv('KEYWORDS_RELOAD_INTERVAL', 2))
+    return KeywordWatcher(moderator, path, interval).start()
+
+
+def load_from_env(moderator) -> Optional[KeywordSet]:
+    """
+    Load the keyword file named by KEYWORDS_PATH once, without watching it.
+    
+    For one-off commands; servers use watch_from_env() instead.
+    
+    Args:
+        moderator (ContentModerator): Moderator to load the keywords into
+    
+    Returns:
+        Optional[KeywordSet]: The set now in use, or None if not configured
+    """
+    path = os.getenv('KEYWORDS_PATH')
+    if not path:
+        return None
+    KeywordWatcher(moderator, path, interval=0).start()
+    return moderator.keyword_set
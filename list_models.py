@@ -5,7 +5,6 @@ Run this to see which models you can use
 
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
 
 # Load environment
 load_dotenv()
@@ -16,6 +15,9 @@ if not api_key:
     print("❌ GOOGLE_GEMINI_KEY not set")
     exit(1)
 
+# Imported once the key is known to be set: the SDK is slow to import
+import google.generativeai as genai
+
 genai.configure(api_key=api_key)
 
 print("=" * 70)
@@ -0,0 +1,437 @@
+"""
+Metrics Module
+Prometheus-style counters, gauges and latency histograms shared by the CLI and web app
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds) spanning in-process moderation and upstream calls
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    """Escape a label value for the text format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """Render a {name="value",...} label set."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value the way Prometheus expects."""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base for metric families: a name, help text and label names."""
+    
+    TYPE = 'untyped'
+    
+    def __init__(self, registry: 'MetricsRegistry', name: str, help_text: str,
+                 labels: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+    
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """Get (suffix, labels, value) samples for the exposition format."""
+        raise NotImplementedError
+    
+    def render(self) -> List[str]:
+        """Render the family in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.TYPE}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, per label values."""
+    
+    TYPE = 'counter'
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, *label_values: str, amount: float = 1):
+        """
+        Add to the count.
+        
+        Args:
+            *label_values: One value per label name, in order
+            amount (float): Increment
+        """
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+    
+    def value(self, *label_values: str) -> float:
+        """Get the current count for the label values."""
+        return self._values.get(label_values, 0)
+    
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [('', _format_labels(self.labels, key), value) for key, value in values]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is read from a function at scrape time."""
+    
+    TYPE = 'gauge'
+    
+    def __init__(self, *args, function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None,
+                 **kwargs):
+        """
+        Initialize the gauge.
+        
+        Args:
+            function: Optional callable returning {label values: value},
+                      read on every scrape instead of stored values
+        """
+        super().__init__(*args, **kwargs)
+        self.function = function
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, *label_values: str, amount: float = 1):
+        """Add to the gauge."""
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+    
+    def dec(self, *label_values: str, amount: float = 1):
+        """Subtract from the gauge."""
+        self.inc(*label_values, amount=-amount)
+    
+    def set(self, value: float, *label_values: str):
+        """Set the gauge."""
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[label_values] = value
+    
+    def value(self, *label_values: str) -> float:
+        """Get the current value for the label values."""
+        return self._values.get(label_values, 0)
+    
+    def samples(self) -> List[Tuple[str, str, float]]:
+        if self.function is not None:
+            values = sorted((self.function() or {}).items())
+        else:
+            with self._lock:
+                values = sorted(self._values.items())
+        return [('', _format_labels(self.labels, key), value) for key, value in values]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, per label values."""
+    
+    TYPE = 'histogram'
+    
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+    
+    def observe(self, value: float, *label_values: str):
+        """
+        Record one observation.
+        
+        Args:
+            value (float): Observed value, e.g. seconds
+            *label_values: One value per label name, in order
+        """
+        if not self.registry.enabled:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+    
+    def time(self, *label_values: str) -> '_Timer':
+        """
+        Time a block and observe its duration in seconds.
+        
+        Returns a shared no-op context manager when metrics are disabled.
+        """
+        if not self.registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self, label_values)
+    
+    def count(self, *label_values: str) -> int:
+        """Get the number of observations for the label values."""
+        entry = self._values.get(label_values)
+        return sum(entry[0]) if entry else 0
+    
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        
+        samples = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                samples.append(('_bucket', _format_labels(self.labels, key, le), cumulative))
+            samples.append(('_sum', _format_labels(self.labels, key), total))
+            samples.append(('_count', _format_labels(self.labels, key), cumulative))
+        return samples
+
+
+class _Timer:
+    """Context manager observing the time spent in a block."""
+    
+    __slots__ = ('histogram', 'label_values', 'start')
+    
+    def __init__(self, histogram: Histogram, label_values: Tuple[str, ...]):
+        self.histogram = histogram
+        self.label_values = label_values
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+        return False
+
+
+class _NullTimer:
+    """Shared do-nothing timer used while metrics are disabled."""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """Set of metric families rendered together in the Prometheus text format."""
+    
+    def __init__(self, enabled: bool = True):
+        """
+        Initialize the registry.
+        
+        Args:
+            enabled (bool): Record observations; when False every hook
+                            returns immediately
+        """
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+    
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        """Create and register a counter."""
+        return self._register(Counter(self, name, help_text, labels))
+    
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = (),
+              function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None) -> Gauge:
+        """Create and register a gauge, optionally read from a function at scrape time."""
+        return self._register(Gauge(self, name, help_text, labels, function=function))
+    
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Create and register a histogram."""
+        return self._register(Histogram(self, name, help_text, labels, buckets=buckets))
+    
+    def unregister(self, name: str):
+        """Remove a metric family, e.g. a scrape-time gauge being replaced."""
+        self._metrics.pop(name, None)
+    
+    def render(self) -> str:
+        """
+        Render every metric family.
+        
+        Returns:
+            str: Prometheus text exposition format (version 0.0.4)
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry; METRICS_ENABLED=false turns every hook into a no-op
+METRICS = MetricsRegistry(enabled=os.getenv('METRICS_ENABLED', 'true').lower() == 'true')
+
+REQUESTS = METRICS.counter(
+    'moderation_requests_total', 'Requests handled, by endpoint and outcome (ok, rejected, error)',
+    ('endpoint', 'outcome'))
+IN_FLIGHT = METRICS.gauge(
+    'moderation_requests_in_flight', 'Requests in progress, by endpoint', ('endpoint',))
+STAGE_SECONDS = METRICS.histogram(
+    'moderation_stage_seconds', 'Latency of each request stage in seconds', ('stage',))
+BLOCKED = METRICS.counter(
+    'moderation_blocked_total', 'User inputs blocked by input moderation')
+REDACTED = METRICS.counter(
+    'moderation_redacted_total', 'AI responses with keywords redacted by output moderation')
+UPSTREAM_ERRORS = METRICS.counter(
+    'gemini_errors_total', 'Failed Gemini attempts, by exception type', ('type',))
+UPSTREAM_IN_FLIGHT = METRICS.gauge(
+    'gemini_requests_in_flight', 'Gemini calls in progress, retries included')
+ROUTED = METRICS.counter(
+    'gemini_routed_total',
+    'Model chosen for each request by reason (preferred, prompt_size, latency_budget, '
+    'cooldown), and failovers', ('model', 'reason'))
+MODEL_SECONDS = METRICS.histogram(
+    'gemini_model_seconds', 'Latency of successful Gemini calls by model', ('model',))
+SPECULATIVE = METRICS.counter(
+    'gemini_speculative_total',
+    'Gemini calls started during input moderation, by outcome (used, cancelled, discarded)',
+    ('outcome',))
+ADMISSION_QUEUED = METRICS.gauge(
+    'chat_admission_queue_depth', 'Chat requests waiting for an upstream slot')
+SHED = METRICS.counter(
+    'chat_shed_total',
+    'Chat requests rejected by admission control, by reason (queue_full, client_limit, '
+    'deadline, timeout)', ('reason',))
+
+
+def outcome_for_status(status: int) -> str:
+    """Map an HTTP status code to a request outcome label."""
+    if status >= 500:
+        return 'error'
+    if status >= 400:
+        return 'rejected'
+    return 'ok'
+
+
+def observe_client(ai_client):
+    """
+    Expose an AIClient's cache, coalescing, retry and session counters as scrape-time gauges.
+    
+    Calling it again (e.g. with a new client) replaces the previous gauges.
+    
+    Args:
+        ai_client (AIClient): Client whose stats are reported
+    """
+    def cache_stat(field):
+        def read():
+            cache = ai_client.cache
+            return {(): cache.stats()[field]} if cache is not None else {}
+        return read
+    
+    def coalescing_stat(field):
+        def read():
+            stats = ai_client.coalescing_stats()
+            return {(): stats[field]} if stats is not None else {}
+        return read
+    
+    def session_count():
+        sessions = ai_client.sessions
+        return {(): len(sessions)} if sessions is not None else {}
+    
+    def breaker_open():
+        breaker = ai_client.breaker
+        return {(): int(breaker.state != breaker.CLOSED)} if breaker is not None else {}
+    
+    gauges = [
+        ('response_cache_hits', 'Response cache hits', cache_stat('hits')),
+        ('response_cache_misses', 'Response cache misses', cache_stat('misses')),
+        ('response_cache_hit_ratio', 'Response cache hits / lookups', cache_stat('hit_ratio')),
+        ('response_cache_entries', 'Responses in the cache', cache_stat('entries')),
+        ('gemini_coalesced_requests', 'Requests that shared an in-flight Gemini call',
+         coalescing_stat('coalesced')),
+        ('gemini_retries', 'Gemini attempts retried', lambda: {(): ai_client.retries}),
+        ('gemini_circuit_open', '1 while the circuit breaker rejects calls', breaker_open),
+        ('chat_sessions', 'Conversations with stored history', session_count),
+    ]
+    for name, help_text, function in gauges:
+        METRICS.unregister(name)
+        METRICS.gauge(name, help_text, function=function)
+
+
+def observe_verdict_cache(moderator):
+    """
+    Expose a moderator's verdict cache hit ratio, size and memory as scrape-time gauges.
+    
+    Calling it again (e.g. with a new moderator) replaces the previous gauges.
+    
+    Args:
+        moderator (ContentModerator): Moderator whose verdict cache is reported
+    """
+    def cache_stat(field):
+        def read():
+            cache = moderator.verdict_cache
+            return {(): cache.stats()[field]} if cache is not None else {}
+        return read
+    
+    gauges = [
+        ('moderation_verdict_cache_hit_ratio', 'Verdict cache hits / lookups', cache_stat('hit_ratio')),
+        ('moderation_verdict_cache_entries', 'Verdicts in the cache', cache_stat('entries')),
+        ('moderation_verdict_cache_bytes', 'Approximate memory held by cached verdicts',
+         cache_stat('bytes')),
+    ]
+    for name, help_text, function in gauges:
+        METRICS.unregister(name)
+        METRICS.gauge(name, help_text, function=function)
+
+
+class track_request:
+    """
+    Count a request and time it end to end.
+    
+    Usage:
+        with track_request('cli') as tracked:
+            ...
+            tracked.outcome = 'rejected'
+    
+    The outcome defaults to 'ok' and becomes 'error' if the block raises.
+    """
+    
+    __slots__ = ('endpoint', 'outcome', 'start')
+    
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.outcome = 'ok'
+        self.start = None
+    
+    def __enter__(self) -> 'track_request':
+        if METRICS.enabled:
+            IN_FLIGHT.inc(self.endpoint)
+            self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        if self.start is not None:
+            if exc_type is not None:
+                self.outcome = 'error'
+            STAGE_SECONDS.observe(time.perf_counter() - self.start, 'total')
+            REQUESTS.inc(self.endpoint, self.outcome)
+            IN_FLIGHT.dec(self.endpoint)
+        return False
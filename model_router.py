@@ -0,0 +1,282 @@
+"""
+Model Router Module
+Routes each request to the cheapest Gemini model that fits its prompt and latency budget
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from metrics import MODEL_SECONDS, ROUTED
+
+# Catalog of discovered models: name -> input token limit
+_catalog_lock = threading.Lock()
+_catalog: Optional[Dict[str, int]] = None
+
+
+class ModelRoute(NamedTuple):
+    """A model the router can send requests to."""
+    
+    name: str
+    input_token_limit: int
+    model: Any
+
+
+def discover_models(path: Optional[str] = None, max_age: float = 86400.0,
+                    list_models: Optional[Callable[[], Iterable]] = None) -> Dict[str, int]:
+    """
+    Get the models that support generateContent and their input token limits.
+    
+    The list is fetched once per process and, with a path, shared through a
+    JSON file for `max_age` seconds so restarts and worker processes skip
+    the API call. If listing fails (offline, bad key), the catalog is empty
+    and nothing is cached, so the next client tries again.
+    
+    Args:
+        path (str): Optional JSON file caching the catalog
+        max_age (float): Seconds before the file is considered stale
+        list_models: Lists models; genai.list_models by default
+    
+    Returns:
+        Dict[str, int]: Model name (without 'models/') -> input token limit,
+                        empty if the models couldn't be listed
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is not None:
+            return _catalog
+        
+        if path and os.path.exists(path) and time.time() - os.path.getmtime(path) < max_age:
+            with open(path, 'r', encoding='utf-8') as handle:
+                _catalog = json.load(handle)
+            return _catalog
+        
+        if list_models is None:
+            import google.generativeai as genai
+            list_models = genai.list_models
+        try:
+            catalog = {
+                model.name.split('/', 1)[-1]: int(getattr(model, 'input_token_limit', 0) or 0)
+                for model in list_models()
+                if 'generateContent' in model.supported_generation_methods
+            }
+        except Exception as e:
+            print(f"⚠️  Could not list Gemini models: {str(e)}")
+            return {}
+        if path:
+            with open(path, 'w', encoding='utf-8') as handle:
+                json.dump(catalog, handle, indent=2, sort_keys=True)
+        _catalog = catalog
+        return catalog
+
+
+class _ModelStats:
+    """Observed latency and errors for one model."""
+    
+    __slots__ = ('latency', 'requests', 'errors', 'cooldown_until')
+    
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.requests = 0
+        self.errors = 0
+        self.cooldown_until = 0.0
+
+
+class ModelRouter:
+    """
+    Orders models for each request: cheapest first, skipping the ones that don't fit.
+    
+    Routes are given cheapest/fastest first. A request goes to the first
+    model whose input token limit fits the prompt and whose observed latency
+    (an exponential moving average) is within the request's latency budget.
+    The remaining fitting models follow in order as failovers, and a model
+    that just failed is tried last for `cooldown` seconds.
+    """
+    
+    def __init__(self, routes: List[ModelRoute], cooldown: float = 30.0, smoothing: float = 0.2,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the router.
+        
+        Args:
+            routes (List[ModelRoute]): Models, cheapest/fastest first
+            cooldown (float): Seconds a failed model is tried last
+            smoothing (float): Weight of each new latency in the moving average
+            clock: Monotonic time source
+        """
+        if not routes:
+            raise ValueError("Model router needs at least one model")
+        self.routes = list(routes)
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.clock = clock
+        self._stats = {route.name: _ModelStats() for route in self.routes}
+        self._lock = threading.Lock()
+    
+    @property
+    def names(self) -> List[str]:
+        """Model names in preference order."""
+        return [route.name for route in self.routes]
+    
+    def _fitting(self, prompt_tokens: int) -> List[ModelRoute]:
+        """Get the models whose input token limit fits the prompt, in preference order."""
+        fitting = [route for route in self.routes if route.input_token_limit >= prompt_tokens]
+        if not fitting:
+            # Nothing fits: the model with the largest window is the best chance
+            fitting = [max(self.routes, key=lambda route: route.input_token_limit)]
+        return fitting
+    
+    def preferred(self, prompt_tokens: int) -> ModelRoute:
+        """
+        Get the model a prompt goes to while every model is healthy and fast enough.
+        
+        Depends only on the prompt size, so it can key caches; plan() may
+        pick another model for the latency budget or after failures.
+        
+        Args:
+            prompt_tokens (int): Estimated tokens of the prompt
+        
+        Returns:
+            ModelRoute: First model that fits the prompt
+        """
+        return self._fitting(prompt_tokens)[0]
+    
+    def plan(self, prompt_tokens: int, latency_budget: Optional[float] = None) -> List[ModelRoute]:
+        """
+        Order the models to try for a request.
+        
+        Args:
+            prompt_tokens (int): Estimated tokens of the prompt, history and
+                                 system instruction
+            latency_budget (float): Optional seconds the caller can wait
+        
+        Returns:
+            List[ModelRoute]: Models to try in order; the first is the choice
+                              and the rest are failovers
+        """
+        fitting = self._fitting(prompt_tokens)
+        now = self.clock()
+        with self._lock:
+            cooling = [route for route in fitting if self._stats[route.name].cooldown_until > now]
+            ready = [route for route in fitting if route not in cooling]
+            if latency_budget is not None:
+                fast = [route for route in ready
+                        if self._stats[route.name].latency is None
+                        or self._stats[route.name].latency <= latency_budget]
+                ready = fast + [route for route in ready if route not in fast]
+        
+        ordered = ready + cooling
+        
+        # Why the first choice isn't simply the cheapest model
+        cheapest = self.routes[0]
+        if ordered[0] is cheapest:
+            reason = 'preferred'
+        elif cheapest not in fitting:
+            reason = 'prompt_size'
+        elif cheapest in cooling:
+            reason = 'cooldown'
+        else:
+            reason = 'latency_budget'
+        ROUTED.inc(ordered[0].name, reason)
+        return ordered
+    
+    def record_success(self, name: str, seconds: float):
+        """
+        Record a successful call's latency.
+        
+        Args:
+            name (str): Model name
+            seconds (float): Time to the response (for streams, to its start)
+        """
+        MODEL_SECONDS.observe(seconds, name)
+        with self._lock:
+            stats = self._stats[name]
+            stats.requests += 1
+            stats.cooldown_until = 0.0
+            if stats.latency is None:
+                stats.latency = seconds
+            else:
+                stats.latency += self.smoothing * (seconds - stats.latency)
+    
+    def record_failure(self, name: str, next_name: Optional[str] = None):
+        """
+        Record a failed call, cooling the model down.
+        
+        Args:
+            name (str): Model name
+            next_name (str): Model the request fails over to, if any
+        """
+        with self._lock:
+            stats = self._stats[name]
+            stats.requests += 1
+            stats.errors += 1
+            stats.cooldown_until = self.clock() + self.cooldown
+        if next_name is not None:
+            ROUTED.inc(next_name, 'failover')
+    
+    def stats(self) -> dict:
+        """
+        Get per-model routing statistics for monitoring.
+        
+        Returns:
+            dict: Model name -> input token limit, average latency, requests,
+                  errors and whether it is cooling down
+        """
+        now = self.clock()
+        with self._lock:
+            return {
+                route.name: {
+                    'input_token_limit': route.input_token_limit,
+                    'latency': self._stats[route.name].latency,
+                    'requests': self._stats[route.name].requests,
+                    'errors': self._stats[route.name].errors,
+                    'cooling_down': self._stats[route.name].cooldown_until > now
+                }
+                for route in self.routes
+            }
+
+
+def create_router_from_env(make_model: Callable[[str], Any],
+                           list_models: Optional[Callable[[], Iterable]] = None
+                           ) -> Optional[ModelRouter]:
+    """
+    Build the model router configured by environment variables.
+    
+    GEMINI_MODELS lists the models to route between, cheapest/fastest first
+    (comma-separated); MODEL_CATALOG_PATH and MODEL_CATALOG_TTL cache the
+    discovered token limits on disk, and GEMINI_MODEL_COOLDOWN sets how long
+    a failed model is tried last.
+    
+    Args:
+        make_model: Builds the SDK model for a model name
+        list_models: Lists models, for discovery; genai.list_models by default
+    
+    Returns:
+        Optional[ModelRouter]: Configured router, or None if GEMINI_MODELS is
+                               unset or names no available model
+    """
+    names = [name.strip() for name in os.getenv('GEMINI_MODELS', '').split(',') if name.strip()]
+    if not names:
+        return None
+    
+    catalog = discover_models(os.getenv('MODEL_CATALOG_PATH') or None,
+                              float(os.getenv('MODEL_CATALOG_TTL', 86400)), list_models)
+    if not catalog:
+        print("⚠️  No model catalog, routing disabled; using the default model")
+        return None
+    
+    routes = []
+    for name in names:
+        if name not in catalog:
+            print(f"⚠️  Model {name} is not available, leaving it out of routing")
+            continue
+        routes.append(ModelRoute(name, catalog[name], make_model(name)))
+    
+    if not routes:
+        # Keep serving with the default model rather than failing at startup
+        print("⚠️  None of GEMINI_MODELS is available, routing disabled; using the default model")
+        return None
+    
+    return ModelRouter(routes, cooldown=float(os.getenv('GEMINI_MODEL_COOLDOWN', 30)))
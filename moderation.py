@@ -3,7 +3,15 @@ Content Moderation Module
 Provides input and output filtering for harmful keywords
 """
 
-from typing import List, Tuple
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from keyword_store import KeywordSet
+from metrics import BLOCKED, REDACTED, STAGE_SECONDS
+from text_normalizer import NormalizedText, normalize_text
+from verdict_cache import VerdictCache
 
 
 class ContentModerator:
@@ -23,17 +31,186 @@ class ContentModerator:
         'harm'
     ]
     
-    def __init__(self, custom_keywords: List[str] = None):
+    # Keyword count from which the compiled matcher beats per-keyword scans
+    MATCHER_THRESHOLD = 256
+    
+    # Replacement for blocked keywords in AI output
+    REDACTION = '[REDACTED]'
+    
+    # Batch size from which check_batch/moderate_batch scan the joined batch
+    BATCH_JOIN_THRESHOLD = 16
+    
+    # Batch size from which check_batch/moderate_batch use worker processes
+    BATCH_PROCESS_THRESHOLD = 5000
+    
+    # Matching modes: raw substrings, or whole words seen through leetspeak,
+    # spelled-out letters and inflections ('harm' no longer flags 'pharmacy')
+    SUBSTRING_MODE = 'substring'
+    WORD_MODE = 'word'
+    
+    def __init__(self, custom_keywords: List[str] = None, match_mode: str = SUBSTRING_MODE,
+                 verdict_cache: Optional[VerdictCache] = None):
         """
         Initialize the content moderator.
         
         Args:
             custom_keywords: Optional list of additional keywords to block
+            match_mode (str): 'substring' (default) or 'word'
+            verdict_cache (VerdictCache): Optional cache of check_content and
+                                          moderate_output verdicts for repeated texts
         """
-        self.blocked_keywords = self.BLOCKED_KEYWORDS.copy()
+        if match_mode not in (self.SUBSTRING_MODE, self.WORD_MODE):
+            raise ValueError(f"Unknown match mode: {match_mode}")
+        self.match_mode = match_mode
+        self.verdict_cache = verdict_cache
+        self._check_kind = f"{match_mode}:check"
+        self._output_kind = f"{match_mode}:output"
+        
+        blocked_keywords = self.BLOCKED_KEYWORDS.copy()
         
         if custom_keywords:
-            self.blocked_keywords.extend(custom_keywords)
+            blocked_keywords.extend(custom_keywords)
+        
+        # Active keyword set; replaced as a whole, never modified, so readers
+        # take one reference and need no lock
+        self._keyword_set = KeywordSet(blocked_keywords)
+    
+    @property
+    def keyword_set(self) -> KeywordSet:
+        """The active keyword set (list, version and compiled matcher)."""
+        return self._keyword_set
+    
+    @property
+    def blocked_keywords(self) -> Tuple[str, ...]:
+        """The active blocked keywords; assign a new list (or call swap_keywords) to change them."""
+        return self._keyword_set.keywords
+    
+    @blocked_keywords.setter
+    def blocked_keywords(self, keywords: List[str]):
+        self._activate(KeywordSet(keywords, source='custom'))
+    
+    def swap_keywords(self, keywords: List[str], source: str = 'custom') -> KeywordSet:
+        """
+        Replace the blocked keywords atomically.
+        
+        The new set, including its compiled matcher, is built before it is
+        swapped in, so calls already running finish with the old set and
+        later calls never wait for a build.
+        
+        Args:
+            keywords (List[str]): New blocked keywords
+            source (str): Where the keywords came from, for reporting
+        
+        Returns:
+            KeywordSet: The set now in use
+        """
+        return self.use_keyword_set(KeywordSet(keywords, source))
+    
+    def use_keyword_set(self, keyword_set: KeywordSet) -> KeywordSet:
+        """
+        Replace the blocked keywords with a keyword set, compiling it first.
+        
+        Args:
+            keyword_set (KeywordSet): Set to use, e.g. a LayeredKeywordSet
+                                      sharing another moderator's matchers
+        
+        Returns:
+            KeywordSet: The set now in use
+        """
+        self._compile(keyword_set)
+        self._activate(keyword_set)
+        return keyword_set
+    
+    def use_matcher(self, matcher, source: str = 'index') -> KeywordSet:
+        """
+        Replace the blocked keywords with an already compiled matcher's.
+        
+        Args:
+            matcher: Substring matcher, e.g. from keyword_index.load_index()
+            source (str): Where the keywords came from, for reporting
+        
+        Returns:
+            KeywordSet: The set now in use
+        """
+        return self.use_keyword_set(KeywordSet(matcher.keywords, source, matcher=matcher))
+    
+    @classmethod
+    def from_index(cls, path: str, match_mode: str = SUBSTRING_MODE) -> 'ContentModerator':
+        """
+        Create a moderator whose keywords come from a compiled index file.
+        
+        The index is memory-mapped, not rebuilt, so this takes milliseconds
+        even for hundreds of thousands of keywords, and processes mapping
+        the same file share its pages. Word mode still compiles its own
+        matcher from the index's keyword list.
+        
+        Args:
+            path (str): Index file written by keyword_index.write_index()
+            match_mode (str): 'substring' (default) or 'word'
+        
+        Returns:
+            ContentModerator: Moderator checking against the index's keywords
+        """
+        from keyword_index import load_index
+        moderator = cls(match_mode=match_mode)
+        moderator.use_matcher(load_index(path), source=path)
+        return moderator
+    
+    @classmethod
+    def for_worker(cls, keywords: Sequence[str], match_mode: str = SUBSTRING_MODE,
+                   index_path: Optional[str] = None) -> 'ContentModerator':
+        """
+        Rebuild a parent process's moderator in a worker process.
+        
+        Args:
+            keywords: The parent's active keywords
+            match_mode (str): The parent's match mode
+            index_path (str): Index file the parent's keywords were mapped
+                              from, mapped here too instead of compiling the
+                              list again unless it was rebuilt since
+        
+        Returns:
+            ContentModerator: Moderator with the same keywords and mode
+        """
+        if index_path is not None:
+            moderator = cls.from_index(index_path, match_mode)
+            if moderator.blocked_keywords == tuple(keywords):
+                return moderator
+        moderator = cls(match_mode=match_mode)
+        moderator.blocked_keywords = keywords
+        return moderator
+    
+    def _activate(self, keyword_set: KeywordSet):
+        """Swap a keyword set in, dropping the cached verdicts of the one it replaces."""
+        previous = self._keyword_set
+        self._keyword_set = keyword_set
+        if self.verdict_cache is not None and previous.version != keyword_set.version:
+            self.verdict_cache.invalidate(previous.version)
+    
+    def _compile(self, keyword_set: KeywordSet):
+        """Build the matcher this moderator checks the set with, if it uses one."""
+        if self.match_mode == self.WORD_MODE:
+            keyword_set.word_matcher()
+        elif len(keyword_set.keywords) >= self.MATCHER_THRESHOLD:
+            keyword_set.matcher()
+    
+    def warm(self):
+        """
+        Compile the active keyword set's matcher now instead of on the first check.
+        
+        Pre-fork servers call it before forking, so the workers share one
+        copy of the compiled matcher instead of each building its own.
+        """
+        self._compile(self._keyword_set)
+    
+    def keyword_info(self) -> dict:
+        """
+        Get the version and size of the active keyword set.
+        
+        Returns:
+            dict: Version hash, keyword count, source and load time
+        """
+        return self._keyword_set.info()
     
     def check_content(self, text: str) -> Tuple[bool, List[str]]:
         """
@@ -41,7 +218,7 @@ class ContentModerator:
         
         Args:
             text (str): Text to check
-            
+        
         Returns:
             Tuple[bool, List[str]]: (is_safe, list_of_violations)
                 - is_safe: True if no violations found
@@ -50,31 +227,120 @@ class ContentModerator:
         if not text:
             return True, []
         
-        text_lower = text.lower()
-        violations = []
+        keyword_set = self._keyword_set
+        key = self._verdict_key(self._check_kind, keyword_set, text)
+        if key is not None:
+            cached = self.verdict_cache.get(key)
+            if cached is not None:
+                return not cached[0], list(cached[0])
         
-        for keyword in self.blocked_keywords:
-            if keyword in text_lower:
-                violations.append(keyword)
+        violations = self._check_text(keyword_set, text)
+        if key is not None:
+            self.verdict_cache.set(key, (tuple(violations),))
         
         is_safe = len(violations) == 0
         return is_safe, violations
     
+    def _check_text(self, keyword_set: KeywordSet, text: str) -> List[str]:
+        """Find the keywords of a set in non-empty text, in the moderator's mode."""
+        if self.match_mode == self.WORD_MODE:
+            return keyword_set.word_matcher().find_all(text)
+        return self._find_violations(keyword_set, normalize_text(text))
+    
+    def _find_violations(self, keyword_set: KeywordSet, text_lower: str) -> List[str]:
+        """Find the keywords of a set contained in folded text."""
+        # Large lists are scanned in one pass by the compiled matcher
+        if len(keyword_set.keywords) >= self.MATCHER_THRESHOLD:
+            return keyword_set.matcher().find_all(text_lower)
+        
+        violations = []
+        for keyword in keyword_set.keywords:
+            if keyword in text_lower:
+                violations.append(keyword)
+        return violations
+    
+    def _find_matches(self, keyword_set: KeywordSet,
+                      text_lower: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+        """
+        Find the keywords of a set in folded text and where they occur.
+        
+        Args:
+            keyword_set (KeywordSet): Keywords to look for
+            text_lower (str): Folded text to check
+        
+        Returns:
+            Tuple[List[str], List[Tuple[int, int]]]: (violations, spans)
+                - violations: Same list check_content would return
+                - spans: (start, end) offsets of every keyword occurrence
+        """
+        if len(keyword_set.keywords) >= self.MATCHER_THRESHOLD:
+            matcher = keyword_set.matcher()
+            keyword_ids, spans = matcher.find_spans(text_lower)
+            return matcher.keywords_for(keyword_ids), spans
+        
+        violations = self._find_violations(keyword_set, text_lower)
+        spans = []
+        for keyword in dict.fromkeys(violations):
+            if not keyword:
+                continue
+            start = text_lower.find(keyword)
+            while start != -1:
+                spans.append((start, start + len(keyword)))
+                start = text_lower.find(keyword, start + 1)
+        return violations, spans
+    
+    def _redact_spans(self, text: str, spans: List[Tuple[int, int]]) -> str:
+        """
+        Replace the given spans of text in a single pass.
+        
+        Overlapping and adjacent spans are merged into one redaction.
+        
+        Args:
+            text (str): Original text
+            spans (List[Tuple[int, int]]): (start, end) offsets to redact
+        
+        Returns:
+            str: Text with every span replaced
+        """
+        parts = []
+        position = 0
+        current_start = current_end = -1
+        
+        for start, end in sorted(spans):
+            if start <= current_end:
+                if end > current_end:
+                    current_end = end
+                continue
+            if current_end >= 0:
+                parts.append(text[position:current_start])
+                parts.append(self.REDACTION)
+                position = current_end
+            current_start, current_end = start, end
+        
+        if current_end >= 0:
+            parts.append(text[position:current_start])
+            parts.append(self.REDACTION)
+            position = current_end
+        parts.append(text[position:])
+        return ''.join(parts)
+    
     def moderate_input(self, user_input: str) -> Tuple[bool, str]:
         """
         Moderate user input before sending to AI.
         
         Args:
             user_input (str): User's input message
-            
+        
         Returns:
             Tuple[bool, str]: (is_approved, message)
                 - is_approved: True if input is safe
                 - message: Error message if blocked, empty string if approved
         """
-        is_safe, violations = self.check_content(user_input)
+        with STAGE_SECONDS.time('moderate_input'):
+            is_safe, violations = self.check_content(user_input)
         
         if not is_safe:
+            BLOCKED.inc()
             violation_list = ', '.join(violations)
             message = f"⚠️  Input blocked: Contains harmful keywords: {violation_list}"
             return False, message
@@ -87,23 +353,298 @@ class ContentModerator:
         
         Args:
             ai_response (str): AI's response
-            
+        
         Returns:
             str: Moderated response with keywords replaced
         """
-        is_safe, violations = self.check_content(ai_response)
+        with STAGE_SECONDS.time('moderate_output'):
+            violations, moderated_text = self._cached_moderate_text(ai_response)
+        if violations:
+            REDACTED.inc()
+        return moderated_text
+    
+    def _uses_verdict_cache(self, keyword_set: KeywordSet) -> bool:
+        """Whether checks against keyword_set go through the verdict cache."""
+        if self.verdict_cache is None:
+            return False
+        # A short list is scanned keyword by keyword faster than the cache is consulted
+        return not (self.match_mode == self.SUBSTRING_MODE
+                    and len(keyword_set.keywords) < self.MATCHER_THRESHOLD)
+    
+    def verdict_cache_stats(self) -> Optional[dict]:
+        """
+        Get the verdict cache's statistics for monitoring.
         
-        if not is_safe:
-            # Replace blocked keywords with [REDACTED]
-            moderated_text = ai_response
-            for keyword in violations:
-                import re
-                pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-                moderated_text = pattern.sub('[REDACTED]', moderated_text)
+        Returns:
+            Optional[dict]: VerdictCache.stats() plus `active`, False while the
+                            keyword list is short enough to skip the cache;
+                            None without a cache
+        """
+        if self.verdict_cache is None:
+            return None
+        return dict(self.verdict_cache.stats(), active=self._uses_verdict_cache(self._keyword_set))
+    
+    def _verdict_key(self, kind: str, keyword_set: KeywordSet, text: str) -> Optional[tuple]:
+        """Get the verdict cache key for text, or None if it shouldn't go through the cache."""
+        if not text or not self._uses_verdict_cache(keyword_set):
+            return None
+        return self.verdict_cache.key(kind, keyword_set.version, text)
+    
+    def _cached_moderate_text(self, text: str) -> Tuple[List[str], str]:
+        """_moderate_text with the active keyword set, through the verdict cache if any."""
+        keyword_set = self._keyword_set
+        key = self._verdict_key(self._output_kind, keyword_set, text)
+        if key is None:
+            return self._moderate_text(keyword_set, text)
+        
+        cached = self.verdict_cache.get(key)
+        if cached is not None:
+            violations, redacted = cached
+            # Clean text is stored as None rather than kept alive by the cache
+            return list(violations), text if redacted is None else redacted
+        
+        violations, moderated_text = self._moderate_text(keyword_set, text)
+        self.verdict_cache.set(key, (tuple(violations), moderated_text if violations else None))
+        return violations, moderated_text
+    
+    def _moderate_text(self, keyword_set: KeywordSet, text: str) -> Tuple[List[str], str]:
+        """
+        Find violations in text and redact them, folding it only once.
+        
+        Args:
+            keyword_set (KeywordSet): Keywords to redact
+            text (str): Text to moderate
+        
+        Returns:
+            Tuple[List[str], str]: (violations, moderated_text)
+        """
+        if not text:
+            return [], text
+        
+        if self.match_mode == self.WORD_MODE:
+            # Word spans are already offsets into the original text
+            violations, spans = keyword_set.word_matcher().find_spans(text)
+            return violations, self._redact_spans(text, spans) if violations else text
+        
+        normalized = NormalizedText(text)
+        
+        # Replace blocked keywords with [REDACTED] using the detected offsets,
+        # mapped back to the original text
+        violations, spans = self._find_matches(keyword_set, normalized.folded)
+        
+        if violations:
+            return violations, self._redact_spans(text, normalized.spans(spans))
+        
+        return violations, text
+    
+    def moderate_stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """
+        Moderate streamed AI output, redacting keywords across chunk boundaries.
+        
+        Text is released as soon as it can no longer be part of a match; only
+        the trailing characters that could still start a blocked keyword (or
+        extend a redaction) are held back until the next chunk arrives.
+        
+        Args:
+            chunks (Iterable[str]): AI response chunks in order
+        
+        Yields:
+            str: Moderated text, released as soon as it is final
+        """
+        # The whole response is moderated with the set active when it started
+        keyword_set = self._keyword_set
+        buffer = ''
+        redacted = False
+        
+        for chunk in chunks:
+            if not chunk:
+                continue
+            buffer += chunk
+            
+            if self.match_mode == self.WORD_MODE:
+                # Word spans and the held-back tail are measured on the original text
+                word_matcher = keyword_set.word_matcher()
+                violations, spans = word_matcher.find_spans(buffer)
+                cut = len(buffer) - word_matcher.pending_length(buffer)
+            else:
+                # Matches and the held-back tail are found in the folded text
+                # and mapped back to the original
+                normalized = NormalizedText(buffer)
+                text_lower = normalized.folded
+                violations, spans = self._find_matches(keyword_set, text_lower)
+                spans = normalized.spans(spans)
+                cut = normalized.offset(len(text_lower) - keyword_set.matcher().pending_length(text_lower))
             
-            return moderated_text
+            redacted = redacted or bool(violations)
+            
+            # A redaction reaching the held-back tail could still grow or merge
+            for start, end in sorted(spans, reverse=True):
+                if end >= cut and start < cut:
+                    cut = start
+            
+            if cut <= 0:
+                continue
+            
+            ready = [(start, end) for start, end in spans if end <= cut]
+            released = self._redact_spans(buffer[:cut], ready)
+            buffer = buffer[cut:]
+            if released:
+                yield released
         
-        return ai_response
+        if buffer:
+            violations, moderated_text = self._moderate_text(keyword_set, buffer)
+            redacted = redacted or bool(violations)
+            yield moderated_text
+        
+        if redacted:
+            REDACTED.inc()
+    
+    def check_batch(self, texts: List[str], processes: int = 1) -> List[Tuple[bool, List[str]]]:
+        """
+        Check many texts for blocked keywords.
+        
+        The matcher is resolved once for the whole batch. Large batches can
+        be split across worker processes, each building its matcher once.
+        
+        Args:
+            texts (List[str]): Texts to check
+            processes (int): Worker processes to use for large batches
+        
+        Returns:
+            List[Tuple[bool, List[str]]]: check_content result for each text
+        """
+        keyword_set = self._keyword_set
+        
+        if processes > 1 and len(texts) >= self.BATCH_PROCESS_THRESHOLD:
+            return self._map_in_processes(keyword_set, _check_chunk, texts, processes)
+        
+        if (len(texts) >= self.BATCH_JOIN_THRESHOLD
+                and self.match_mode == self.SUBSTRING_MODE
+                and len(keyword_set.keywords) < self.MATCHER_THRESHOLD):
+            scanned = self._scan_joined(keyword_set, texts, with_spans=False)
+            if scanned is not None:
+                violations, _ = scanned
+                return [
+                    (False, violations[index]) if index in violations else (True, [])
+                    for index in range(len(texts))
+                ]
+        
+        results = []
+        for text in texts:
+            violations = self._check_text(keyword_set, text) if text else []
+            results.append((not violations, violations))
+        return results
+    
+    def moderate_batch(self, texts: List[str],
+                       processes: int = 1) -> List[Tuple[bool, List[str], str]]:
+        """
+        Check and redact many texts.
+        
+        Args:
+            texts (List[str]): Texts to moderate
+            processes (int): Worker processes to use for large batches
+        
+        Returns:
+            List[Tuple[bool, List[str], str]]: (is_safe, violations, moderated_text)
+                for each text, as check_content and moderate_output would give
+        """
+        keyword_set = self._keyword_set
+        
+        if processes > 1 and len(texts) >= self.BATCH_PROCESS_THRESHOLD:
+            return self._map_in_processes(keyword_set, _moderate_chunk, texts, processes)
+        
+        if (len(texts) >= self.BATCH_JOIN_THRESHOLD
+                and self.match_mode == self.SUBSTRING_MODE
+                and len(keyword_set.keywords) < self.MATCHER_THRESHOLD):
+            scanned = self._scan_joined(keyword_set, texts, with_spans=True)
+            if scanned is not None:
+                violations, spans = scanned
+                results = [(True, [], text) for text in texts]
+                for index, text_violations in violations.items():
+                    moderated_text = self._redact_spans(texts[index], spans.get(index, []))
+                    results[index] = (False, text_violations, moderated_text)
+                return results
+        
+        results = []
+        for text in texts:
+            violations, moderated_text = self._moderate_text(keyword_set, text)
+            results.append((not violations, violations, moderated_text))
+        return results
+    
+    def _scan_joined(self, keyword_set: KeywordSet, texts: List[str], with_spans: bool):
+        """
+        Scan a whole batch with one substring search per keyword.
+        
+        The texts are joined and lowercased once (ASCII batches only), and each keyword is looked
+        for across the joined string, jumping to the next text after a hit,
+        so per-text Python work only happens where keywords occur.
+        
+        Args:
+            keyword_set (KeywordSet): Keywords to look for
+            texts (List[str]): Texts to scan
+            with_spans (bool): Also collect match offsets for redaction
+        
+        Returns:
+            Optional[Tuple[Dict[int, List[str]], Dict[int, List[Tuple[int, int]]]]]:
+                (violations, spans) keyed by index of the texts with hits, or
+                None if the batch can't be joined safely and must be scanned
+                text by text
+        """
+        separator = '\x00'
+        keywords = keyword_set.keywords
+        if any(separator in keyword for keyword in keywords):
+            return None
+        
+        joined = separator.join([text or '' for text in texts])
+        if not joined.isascii():
+            return None
+        joined_lower = joined.lower()
+        
+        # starts[i] is where text i begins; starts[i + 1] is just past its end
+        starts = list(accumulate([len(text) + 1 if text else 1 for text in texts], initial=0))
+        
+        violations: Dict[int, List[str]] = {}
+        spans: Dict[int, List[Tuple[int, int]]] = {}
+        
+        for keyword in keywords:
+            if not keyword:
+                for index, text in enumerate(texts):
+                    if text:
+                        violations.setdefault(index, []).append(keyword)
+                continue
+            
+            found = joined_lower.find(keyword)
+            while found != -1:
+                index = bisect_right(starts, found) - 1
+                end = starts[index + 1]
+                violations.setdefault(index, []).append(keyword)
+                
+                if with_spans:
+                    start = starts[index]
+                    text_spans = spans.setdefault(index, [])
+                    while found != -1:
+                        text_spans.append((found - start, found - start + len(keyword)))
+                        found = joined_lower.find(keyword, found + 1, end)
+                
+                found = joined_lower.find(keyword, end)
+        
+        return violations, spans
+    
+    def _map_in_processes(self, keyword_set: KeywordSet, func, texts: List[str],
+                          processes: int) -> list:
+        """Run a chunk function over texts in a process pool, keeping order."""
+        chunk_size = max(1, -(-len(texts) // (processes * 4)))
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_batch_worker,
+            initargs=(keyword_set.keywords, self.match_mode, keyword_set.index_path)
+        ) as pool:
+            results = []
+            for chunk_results in pool.map(func, chunks):
+                results.extend(chunk_results)
+            return results
     
     def get_blocked_keywords(self) -> List[str]:
         """
@@ -112,7 +653,72 @@ class ContentModerator:
         Returns:
             List[str]: List of blocked keywords
         """
-        return self.blocked_keywords.copy()
+        return list(self._keyword_set.keywords)
+
+
+# Moderator owned by each batch worker process
+_batch_moderator = None
+
+
+def _init_batch_worker(keywords: List[str], match_mode: str = ContentModerator.SUBSTRING_MODE,
+                       index_path: str = None):
+    """Build the worker's moderator once, with the parent's keyword list and mode."""
+    global _batch_moderator
+    _batch_moderator = ContentModerator.for_worker(keywords, match_mode, index_path)
+
+
+def _check_chunk(texts: List[str]) -> List[Tuple[bool, List[str]]]:
+    """Check a chunk of a batch in a worker process."""
+    return _batch_moderator.check_batch(texts)
+
+
+def _moderate_chunk(texts: List[str]) -> List[Tuple[bool, List[str], str]]:
+    """Moderate a chunk of a batch in a worker process."""
+    return _batch_moderator.moderate_batch(texts)
+
+
+# Accuracy fixtures for the matching modes: (text, keywords it should flag)
+MATCHING_FIXTURES = [
+    # Harmless words that contain a keyword
+    ("Pick up the prescription at the pharmacy", []),
+    ("She has real skill with a paintbrush", []),
+    ("What a charming little village", []),
+    ("The speech was bombastic and long", []),
+    ("The cat moved with stealth", []),
+    ("Adding a third monitor is overkill", []),
+    ("It was a harmless prank", []),
+    ("Our year in review: 2024 had 1337 new users", []),
+    # Plain and inflected keywords
+    ("How do I hack a wifi network?", ['hack']),
+    ("My account was hacked yesterday", ['hack']),
+    ("The bombing made the news", ['bomb']),
+    ("He was murdered in the novel", ['murder']),
+    ("Stop stealing my lunch", ['steal']),
+    ("They attacks from the north", ['attack']),
+    ("Where can I buy weapons", ['weapon']),
+    ("Destroying evidence is a crime", ['destroy']),
+    ("Nobody was harmed", ['harm']),
+    ("Killing time before the show", ['kill']),
+    ("Violence, again.", ['violence']),
+    # Obfuscated keywords
+    ("how to h4ck a router", ['hack']),
+    ("build a b.o.m.b", ['bomb']),
+    ("k i l l them all", ['kill']),
+    ("st3al a car", ['steal']),
+    ("w3apon stash", ['weapon']),
+    ("@ttack at dawn", ['attack']),
+    ("d-e-s-t-r-o-y it", ['destroy']),
+    ("v10lence everywhere", ['violence']),
+    ("K!LL", ['kill']),
+    ("m_u_r_d_e_r", ['murder']),
+    # Unicode variants
+    ("ＨＡＣＫ the planet", ['hack']),
+    ("Bómb threat", ['bomb']),
+    ("we\u0301apon cache", ['weapon']),
+    ("h\u0430ck the box", ['hack']),
+    ("ki\u200bll switch", ['kill']),
+    ("Stra\u00dfe und Caf\u00e9", []),
+]
 
 
 if __name__ == "__main__":
@@ -153,4 +759,20 @@ if __name__ == "__main__":
             print(f"⚠️  Moderated: {test_output}")
             print(f"   Result: {moderated}")
         else:
-            print(f"✅ Clean: {test_output}")
\ No newline at end of file
+            print(f"✅ Clean: {test_output}")
+    
+    print("\n" + "=" * 50)
+    print("Testing Matching Modes:")
+    print("-" * 50)
+    
+    for match_mode in (ContentModerator.SUBSTRING_MODE, ContentModerator.WORD_MODE):
+        mode_moderator = ContentModerator(match_mode=match_mode)
+        correct = 0
+        for text, expected in MATCHING_FIXTURES:
+            is_safe, violations = mode_moderator.check_content(text)
+            if violations == expected:
+                correct += 1
+            elif match_mode == ContentModerator.WORD_MODE:
+                print(f"❌ {text!r}: expected {expected}, got {violations}")
+        print(f"{'✅' if correct == len(MATCHING_FIXTURES) else '⚠️ '} {match_mode}: "
+              f"{correct}/{len(MATCHING_FIXTURES)} fixtures correct")
@@ -0,0 +1,246 @@
+"""
+Prompt Cache Module
+Caches the system prompt upstream once (Gemini context caching) and reuses it across requests
+"""
+
+import hashlib
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+
+class CachedPrompt(NamedTuple):
+    """A system prompt cached upstream and a model that references it."""
+    
+    # Model whose requests reference the cached prompt instead of sending it
+    model: Any
+    # Extends the upstream entry's lifetime by the given seconds
+    renew: Callable[[float], None]
+
+
+def prompt_name(model_name: str, system_prompt: str) -> str:
+    """
+    Name the cached content for a model and system prompt.
+    
+    The name changes with either, so a new prompt or model never reuses a
+    stale entry, and processes with the same configuration find each other's.
+    
+    Args:
+        model_name (str): Gemini model name
+        system_prompt (str): System instruction
+    
+    Returns:
+        str: Display name for the cached content
+    """
+    digest = hashlib.sha256(f"{model_name}\x00{system_prompt}".encode('utf-8')).hexdigest()
+    return f"ai-moderation-prompt-{digest[:32]}"
+
+
+def is_missing_cache_error(error: BaseException) -> bool:
+    """Check whether an upstream error means the cached content no longer exists."""
+    return getattr(error, 'code', None) == 404 or type(error).__name__ == 'NotFound'
+
+
+def create_gemini_prompt(model_name: str, system_prompt: str, ttl: float) -> CachedPrompt:
+    """
+    Cache a system prompt with Gemini's context caching.
+    
+    An entry left by another process with the same model and prompt is
+    reused (and renewed) rather than uploaded again.
+    
+    Args:
+        model_name (str): Gemini model name (context caching needs a model
+                          version that supports it)
+        system_prompt (str): System instruction to cache
+        ttl (float): Lifetime of the upstream entry, in seconds
+    
+    Returns:
+        CachedPrompt: Model referencing the cached prompt, and its renewal
+    """
+    import google.generativeai as genai
+    from google.generativeai import caching
+    
+    display_name = prompt_name(model_name, system_prompt)
+    cached = next(
+        (entry for entry in caching.CachedContent.list() if entry.display_name == display_name),
+        None
+    )
+    if cached is None:
+        cached = caching.CachedContent.create(model=model_name, display_name=display_name,
+                                              system_instruction=system_prompt,
+                                              ttl=timedelta(seconds=ttl))
+    else:
+        cached.update(ttl=timedelta(seconds=ttl))
+    
+    def renew(seconds: float):
+        cached.update(ttl=timedelta(seconds=seconds))
+    
+    return CachedPrompt(genai.GenerativeModel.from_cached_content(cached), renew)
+
+
+class _Entry:
+    """Upstream cache state for one model."""
+    
+    __slots__ = ('key', 'prompt', 'renew_at', 'retry_at', 'busy')
+    
+    def __init__(self, key: str):
+        self.key = key
+        self.prompt: Optional[CachedPrompt] = None
+        self.renew_at = 0.0
+        self.retry_at = 0.0
+        self.busy = False
+
+
+class PromptCache:
+    """
+    Keeps the current system prompt cached upstream, per model.
+    
+    Each model's entry is keyed on the model name and prompt, so changing
+    the prompt caches it again on the next request. Entries are renewed
+    halfway through their lifetime; while one request renews or creates an
+    entry, the others keep using the current one (or send the prompt
+    themselves) instead of waiting. When caching fails, e.g. the prompt is
+    below the provider's minimum size or the model doesn't support it,
+    requests fall back to sending the prompt and caching is retried after
+    one TTL.
+    """
+    
+    def __init__(self, create: Callable[[str, str, float], CachedPrompt] = create_gemini_prompt,
+                 ttl: float = 3600.0):
+        """
+        Initialize the prompt cache.
+        
+        Args:
+            create: Caches a prompt upstream: (model_name, system_prompt, ttl)
+                    -> CachedPrompt; Gemini context caching by default
+            ttl (float): Lifetime of the upstream entries, in seconds
+        """
+        self.create = create
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.creations = 0
+        self.renewals = 0
+        self.failures = 0
+        # model name -> its entry
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+    
+    def model_for(self, model_name: str, system_prompt: str, wait: bool = True):
+        """
+        Get a model that references the cached system prompt.
+        
+        Args:
+            model_name (str): Gemini model name
+            system_prompt (str): System instruction
+            wait (bool): Create or renew a due entry in this call; False does
+                         it on a background thread (for event loops)
+        
+        Returns:
+            The model to call, or None to send the prompt with a plain model
+        """
+        key = prompt_name(model_name, system_prompt)
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._entries.get(model_name)
+            if entry is None or entry.key != key:
+                # New model or prompt: an old entry expires upstream on its own
+                entry = self._entries[model_name] = _Entry(key)
+            
+            prompt = entry.prompt
+            due = (now >= entry.retry_at) if prompt is None else (now >= entry.renew_at)
+            if not due or entry.busy:
+                if prompt is None:
+                    self.misses += 1
+                    return None
+                self.hits += 1
+                return prompt.model
+            entry.busy = True
+        
+        if wait:
+            prompt = self._refresh(entry, model_name, system_prompt, now)
+        else:
+            threading.Thread(target=self._refresh,
+                             args=(entry, model_name, system_prompt, now),
+                             daemon=True).start()
+        
+        with self._lock:
+            if prompt is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return prompt.model
+    
+    def _refresh(self, entry: _Entry, model_name: str, system_prompt: str,
+                 now: float) -> Optional[CachedPrompt]:
+        """Create or renew an entry upstream, returning it or None on failure."""
+        prompt = entry.prompt
+        renewing = prompt is not None
+        try:
+            if renewing:
+                prompt.renew(self.ttl)
+            else:
+                prompt = self.create(model_name, system_prompt, self.ttl)
+        except Exception as e:
+            print(f"⚠️  Couldn't cache the system prompt for {model_name}, "
+                  f"sending it with each request: {str(e)}")
+            with self._lock:
+                entry.busy = False
+                entry.prompt = None
+                entry.retry_at = now + self.ttl
+                self.failures += 1
+            return None
+        
+        with self._lock:
+            entry.busy = False
+            entry.prompt = prompt
+            entry.renew_at = now + self.ttl / 2
+            if renewing:
+                self.renewals += 1
+            else:
+                self.creations += 1
+        return prompt
+    
+    def invalidate(self, model_name: str):
+        """Forget a model's entry (e.g. deleted upstream), recreating it on the next request."""
+        with self._lock:
+            entry = self._entries.get(model_name)
+            if entry is not None:
+                entry.prompt = None
+                entry.retry_at = 0.0
+    
+    def stats(self) -> dict:
+        """
+        Get prompt cache statistics for monitoring.
+        
+        Returns:
+            dict: Models with a cached prompt, hits, misses, creations, renewals and failures
+        """
+        with self._lock:
+            return {
+                'cached': sorted(name for name, entry in self._entries.items() if entry.prompt),
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'creations': self.creations,
+                'renewals': self.renewals,
+                'failures': self.failures
+            }
+
+
+def create_prompt_cache_from_env() -> Optional[PromptCache]:
+    """
+    Build the prompt cache configured by environment variables.
+    
+    PROMPT_CACHE turns context caching on (default: off) and
+    PROMPT_CACHE_TTL sets the upstream entry's lifetime in seconds.
+    
+    Returns:
+        Optional[PromptCache]: Configured cache, or None if disabled
+    """
+    if os.getenv('PROMPT_CACHE', 'false').lower() != 'true':
+        return None
+    return PromptCache(ttl=float(os.getenv('PROMPT_CACHE_TTL', 3600)))
@@ -0,0 +1,65 @@
+"""
+Rate Limiter Module
+Token bucket for keeping upstream calls within the Gemini quota
+"""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Token bucket rate limiter usable from threads and asyncio."""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Initialize the bucket, starting full.
+        
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum burst size; defaults to one second of tokens
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, burst: Optional[float] = None) -> 'TokenBucket':
+        """
+        Create a bucket from a per-minute quota.
+        
+        Args:
+            requests_per_minute (float): Allowed requests per minute
+            burst (float): Maximum burst size
+        
+        Returns:
+            TokenBucket: Bucket refilling at requests_per_minute / 60 per second
+        """
+        return cls(requests_per_minute / 60.0, burst)
+    
+    def _reserve(self) -> float:
+        """Take a token, returning how long to wait until it is really available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            # Tokens below zero are reservations, served in arrival order
+            return -self._tokens / self.rate
+    
+    def acquire(self):
+        """Block the calling thread until a token is available."""
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+    
+    async def acquire_async(self):
+        """Wait, without blocking the event loop, until a token is available."""
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
@@ -0,0 +1,243 @@
+"""
+Response Cache Module
+Bounded LRU/TTL caches for moderated AI responses, in memory or on disk
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def normalize_message(message: str) -> str:
+    """
+    Normalize a user message so near-identical prompts share a cache entry.
+    
+    Args:
+        message (str): User's input message
+    
+    Returns:
+        str: Case-folded message with whitespace collapsed
+    """
+    return ' '.join(message.casefold().split())
+
+
+def make_cache_key(model_name: str, system_prompt: str, message: str, scope: str = '') -> str:
+    """
+    Build the cache key for a prompt.
+    
+    Args:
+        model_name (str): Gemini model name
+        system_prompt (str): System prompt sent with the request
+        message (str): User's input message
+        scope (str): Optional extra part, such as the moderation policy version
+    
+    Returns:
+        str: Hex digest identifying the request
+    """
+    parts = (model_name, system_prompt, normalize_message(message))
+    if scope:
+        parts += (scope,)
+    return hashlib.sha256('\x00'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Base class for response caches, with hit/miss counters."""
+    
+    backend = 'none'
+    
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_entries (int): Maximum number of cached responses
+            ttl (float): Seconds a response stays valid
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+        
+        Args:
+            key (str): Cache key from make_cache_key
+        
+        Returns:
+            Optional[str]: Cached response or None on a miss
+        """
+        with self._lock:
+            value = self._get(key, time.time())
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+    
+    def set(self, key: str, value: str):
+        """
+        Store a response, evicting the least recently used if full.
+        
+        Args:
+            key (str): Cache key from make_cache_key
+            value (str): Moderated response text
+        """
+        with self._lock:
+            self._set(key, value, time.time())
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._size()
+    
+    def stats(self) -> dict:
+        """
+        Get cache statistics for monitoring.
+        
+        Returns:
+            dict: Backend name, entry count, hits, misses and hit ratio
+        """
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.backend,
+            'entries': len(self),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+    
+    def reopen(self):
+        """Reconnect to the backing store in a forked worker process (no-op in memory)."""
+    
+    def _get(self, key: str, now: float) -> Optional[str]:
+        raise NotImplementedError
+    
+    def _set(self, key: str, value: str, now: float):
+        raise NotImplementedError
+    
+    def _size(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryCache(ResponseCache):
+    """In-process LRU cache with per-entry expiry."""
+    
+    backend = 'memory'
+    
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0):
+        super().__init__(max_entries, ttl)
+        self._entries = OrderedDict()
+    
+    def _get(self, key: str, now: float) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    def _set(self, key: str, value: str, now: float):
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def _size(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache(ResponseCache):
+    """On-disk LRU cache that survives restarts."""
+    
+    backend = 'sqlite'
+    
+    def __init__(self, path: str, max_entries: int = 1000, ttl: float = 3600.0):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            path (str): SQLite database file
+            max_entries (int): Maximum number of cached responses
+            ttl (float): Seconds a response stays valid
+        """
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'expires_at REAL NOT NULL, last_used REAL NOT NULL)'
+        )
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)'
+        )
+        self._db.commit()
+    
+    def reopen(self):
+        """Open a connection of this process's own; SQLite connections must not cross fork()."""
+        with self._lock:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+    
+    def _get(self, key: str, now: float) -> Optional[str]:
+        row = self._db.execute(
+            'SELECT value, expires_at FROM responses WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= now:
+            self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+        else:
+            self._db.execute('UPDATE responses SET last_used = ? WHERE key = ?', (now, key))
+        self._db.commit()
+        return value if expires_at > now else None
+    
+    def _set(self, key: str, value: str, now: float):
+        self._db.execute(
+            'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)',
+            (key, value, now + self.ttl, now)
+        )
+        self._db.execute(
+            'DELETE FROM responses WHERE key IN ('
+            'SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+        self._db.commit()
+    
+    def _size(self) -> int:
+        return self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+
+def create_cache_from_env() -> Optional[ResponseCache]:
+    """
+    Build the response cache configured by environment variables.
+    
+    RESPONSE_CACHE selects the backend (off, memory or sqlite),
+    RESPONSE_CACHE_SIZE the entry limit, RESPONSE_CACHE_TTL the lifetime
+    in seconds and RESPONSE_CACHE_PATH the SQLite file.
+    
+    Returns:
+        Optional[ResponseCache]: Configured cache, or None if disabled
+    """
+    backend = os.getenv('RESPONSE_CACHE', 'off').lower()
+    max_entries = int(os.getenv('RESPONSE_CACHE_SIZE', 1000))
+    ttl = float(os.getenv('RESPONSE_CACHE_TTL', 3600))
+    
+    if backend == 'memory':
+        return MemoryCache(max_entries, ttl)
+    if backend == 'sqlite':
+        path = os.getenv('RESPONSE_CACHE_PATH', 'response_cache.sqlite3')
+        return SQLiteCache(path, max_entries, ttl)
+    if backend not in ('off', 'none', ''):
+        raise ValueError(f"Unknown RESPONSE_CACHE backend: {backend}")
+    return None
@@ -0,0 +1,129 @@
+"""
+Retry Module
+Retry policy with exponential backoff and jitter for transient upstream errors
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+# HTTP status codes worth retrying: timeouts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Check whether an upstream error is transient.
+    
+    Timeouts and connection errors are retryable, as are errors carrying a
+    retryable HTTP status in `code` (google.api_core exceptions do).
+    
+    Args:
+        error: Exception raised by the upstream call
+    
+    Returns:
+        bool: True if the call may succeed when retried
+    """
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, 'code', None)
+    return isinstance(code, int) and code in RETRYABLE_STATUS_CODES
+
+
+class RetryPolicy:
+    """Bounded retries with exponential backoff and full jitter."""
+    
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 retryable: Callable[[BaseException], bool] = is_retryable,
+                 rng: Optional[random.Random] = None):
+        """
+        Initialize the retry policy.
+        
+        Args:
+            max_attempts (int): Total attempts, including the first
+            base_delay (float): Backoff before the first retry, in seconds
+            max_delay (float): Upper bound for any single backoff
+            retryable: Decides which errors are retried
+            rng: Optional random source for the jitter
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+        self.rng = rng or random.Random()
+    
+    def delay(self, attempt: int) -> float:
+        """
+        Get the backoff before retrying after a failed attempt.
+        
+        Args:
+            attempt (int): Number of the attempt that failed (1-based)
+        
+        Returns:
+            float: Seconds to wait, drawn uniformly up to the exponential cap
+        """
+        cap = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return self.rng.uniform(0, cap)
+    
+    def _should_retry(self, error: BaseException, attempt: int, delay: float,
+                      deadline: Optional[float]) -> bool:
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return False
+        return attempt < self.max_attempts and self.retryable(error)
+    
+    def call(self, func: Callable[[], Any],
+             on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+             deadline: Optional[float] = None) -> Any:
+        """
+        Call func, retrying transient errors.
+        
+        Args:
+            func: Function making the upstream call
+            on_retry: Optional callback(attempt, error, delay) before each retry
+            deadline (float): Optional time.monotonic() value; no retry is
+                              started that would sleep past it
+        
+        Returns:
+            Any: Result of the first successful attempt; the last error is
+                 re-raised when attempts run out or the error isn't retryable
+        """
+        attempt = 1
+        while True:
+            try:
+                return func()
+            except Exception as e:
+                delay = self.delay(attempt)
+                if not self._should_retry(e, attempt, delay, deadline):
+                    raise
+                if on_retry is not None:
+                    on_retry(attempt, e, delay)
+                time.sleep(delay)
+                attempt += 1
+    
+    async def acall(self, func: Callable[[], Awaitable[Any]],
+                    on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+                    deadline: Optional[float] = None) -> Any:
+        """
+        Await func, retrying transient errors without blocking the event loop.
+        
+        Args:
+            func: Coroutine function making the upstream call
+            on_retry: Optional callback(attempt, error, delay) before each retry
+            deadline (float): Optional time.monotonic() value, as for call()
+        
+        Returns:
+            Any: Result of the first successful attempt, as for call()
+        """
+        attempt = 1
+        while True:
+            try:
+                return await func()
+            except Exception as e:
+                delay = self.delay(attempt)
+                if not self._should_retry(e, attempt, delay, deadline):
+                    raise
+                if on_retry is not None:
+                    on_retry(attempt, e, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
@@ -0,0 +1,134 @@
+"""
+Pre-Fork Server for AI Moderation App
+Builds the moderation state once, then forks worker processes that share it copy-on-write
+"""
+
+import argparse
+import os
+import signal
+import socket
+import sys
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from werkzeug.serving import make_server
+
+
+def _run_worker(web, sock: socket.socket, host: str, port: int, preload: bool):
+    """Serve requests on the shared socket in a forked worker; never returns."""
+    status = 0
+    try:
+        # The master's handlers were inherited: Ctrl+C and SIGTERM just stop this worker
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        if preload:
+            web.after_fork()
+        else:
+            import app as web
+        server = make_server(host, port, web.app, threaded=True, fd=sock.fileno())
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"❌ Worker {os.getpid()} failed: {str(e)}")
+        status = 1
+    finally:
+        sys.stdout.flush()
+        os._exit(status)
+
+
+def serve(host: str = '0.0.0.0', port: int = 5000, workers: Optional[int] = None,
+          preload: bool = True):
+    """
+    Serve the Flask app from pre-forked worker processes.
+    
+    The master binds the socket and, with preload, imports the app and
+    builds the compiled keyword matchers, tenant policies and Gemini SDK
+    once (app.before_fork) before forking. Workers share those pages
+    copy-on-write instead of each building and holding its own copy, and
+    the kernel spreads connections across them. A worker that dies is
+    replaced; SIGTERM or Ctrl+C stops them all.
+    
+    Args:
+        host (str): Interface to listen on
+        port (int): Port to listen on
+        workers (int): Worker processes; defaults to the CPU count
+        preload (bool): Build the app in the master; False makes every
+                        worker import and build it on its own
+    """
+    workers = workers or os.cpu_count() or 1
+    
+    web = None
+    if preload:
+        import app as web
+        web.before_fork()
+    
+    sock = socket.create_server((host, port), backlog=1024)
+    sock.set_inheritable(True)
+    children: Dict[int, int] = {}
+    stopping = False
+    
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(web, sock, host, port, preload)
+        children[pid] = slot
+    
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    for slot in range(workers):
+        spawn(slot)
+    print(f"✅ Serving on http://{host}:{port} with {workers} workers "
+          f"(master pid {os.getpid()}, {'preloaded' if preload else 'no preload'})")
+    sys.stdout.flush()
+    
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        slot = children.pop(pid, None)
+        if slot is not None and not stopping:
+            print(f"⚠️  Worker {pid} exited (status {status}), starting a new one")
+            spawn(slot)
+    
+    sock.close()
+    print("👋 Server stopped")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Parse the command line and run the server."""
+    load_dotenv()
+    
+    parser = argparse.ArgumentParser(description='Serve the AI Moderation App with pre-forked workers')
+    parser.add_argument('--host', default=os.getenv('SERVE_HOST', '0.0.0.0'), help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=int(os.getenv('FLASK_PORT', 5000)),
+                        help='Port to listen on (default: FLASK_PORT or 5000)')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('SERVE_WORKERS', 0)) or None,
+                        help='Worker processes (default: SERVE_WORKERS or the CPU count)')
+    parser.add_argument('--no-preload', dest='preload', action='store_false',
+                        help='Build the app in each worker instead of once in the master')
+    args = parser.parse_args(argv)
+    
+    if not hasattr(os, 'fork'):
+        print("⚠️  Pre-forking needs os.fork(); serving from a single process instead")
+        import app as web
+        web.app.run(host=args.host, port=args.port)
+        return 0
+    
+    serve(args.host, args.port, args.workers, args.preload)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Single-Flight Module
+Coalesces concurrent identical calls so they share one upstream request
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Call:
+    """A call in flight, shared by every caller with the same key."""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-safe call coalescing for the threaded (Flask/CLI) paths."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.coalesced = 0
+    
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        Run func, or wait for the identical call already running.
+        
+        Args:
+            key (str): Identifies identical calls
+            func: Function making the upstream call
+        
+        Returns:
+            Any: The shared result; a shared exception is re-raised
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+    
+    def stats(self) -> dict:
+        """Get the number of calls in flight and calls that were coalesced."""
+        return {'in_flight': len(self._calls), 'coalesced': self.coalesced}
+
+
+class AsyncSingleFlight:
+    """Call coalescing for the asyncio path."""
+    
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Future] = {}
+        self.coalesced = 0
+    
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await func, or the identical call already running.
+        
+        The shared call runs as its own task, so one caller being cancelled
+        doesn't cancel it for the others.
+        
+        Args:
+            key (str): Identifies identical calls
+            func: Coroutine function making the upstream call
+        
+        Returns:
+            Any: The shared result; a shared exception is re-raised
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+    
+    def _forget(self, key: str, task: asyncio.Future):
+        """Drop a finished call so the next one goes upstream again."""
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+    
+    def stats(self) -> dict:
+        """Get the number of calls in flight and calls that were coalesced."""
+        return {'in_flight': len(self._tasks), 'coalesced': self.coalesced}
@@ -0,0 +1,189 @@
+"""
+Speculative Dispatch Module
+Starts the Gemini request while the input is still being moderated, discarding it if rejected
+"""
+
+import asyncio
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterator, Optional, Tuple, TypeVar
+
+from metrics import SPECULATIVE
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class SpeculativeDispatcher:
+    """
+    Overlaps input moderation with the upstream call.
+    
+    The call starts first (on a worker thread, or as a task on the event
+    loop) and the check runs meanwhile. If the check rejects the input, the
+    call is cancelled when it hasn't started yet and its result discarded
+    otherwise, so rejected input never gets model output back; the price is
+    upstream quota spent on input that turns out to be blocked.
+    
+    Outcomes are counted in gemini_speculative_total: used, cancelled
+    (rejected before the call started) and discarded (rejected after).
+    """
+    
+    def __init__(self, max_workers: int = 32):
+        """
+        Initialize the dispatcher.
+        
+        Args:
+            max_workers (int): Threads running speculative calls; beyond that
+                               calls queue and start once a thread frees up
+        """
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='speculative')
+    
+    def run(self, check: Callable[[], T], call: Callable[[Callable[[], bool]], R],
+            is_approved: Callable[[T], bool] = bool) -> Tuple[T, Optional[R]]:
+        """
+        Run a call while checking its input.
+        
+        The call gets an `admitted` function that blocks until the check is
+        done and returns its result, so it can hold back side effects (such
+        as caching the response or extending a chat session) until then.
+        
+        Args:
+            check: Input check, run on the calling thread
+            call: Upstream call, given the admitted function
+            is_approved: Decides from the check's result whether to use the call
+        
+        Returns:
+            Tuple[T, Optional[R]]: (verdict, result); the result is None when
+                                   the input was rejected
+        """
+        verdict_ready: Future = Future()
+        future = self.executor.submit(call, verdict_ready.result)
+        
+        try:
+            verdict = check()
+            approved = bool(is_approved(verdict))
+        except BaseException:
+            verdict_ready.set_result(False)
+            future.cancel()
+            raise
+        
+        verdict_ready.set_result(approved)
+        if not approved:
+            SPECULATIVE.inc('cancelled' if future.cancel() else 'discarded')
+            return verdict, None
+        
+        SPECULATIVE.inc('used')
+        return verdict, future.result()
+    
+    async def arun(self, check: Callable[[], T],
+                   call: Callable[[Callable[[], Awaitable[bool]]], Awaitable[R]],
+                   is_approved: Callable[[T], bool] = bool) -> Tuple[T, Optional[R]]:
+        """
+        Async version of run().
+        
+        The call is started as a task and the check runs on a worker thread,
+        so the event loop keeps sending the request meanwhile; a rejected
+        call's task is cancelled. As with run(), the call gets an `admitted`
+        coroutine function returning the check's result, to await before
+        side effects: a call that finished before the check did must not
+        have stored anything.
+        
+        Args:
+            check: Input check, run on a worker thread
+            call: Coroutine function making the upstream call, given admitted
+            is_approved: Decides from the check's result whether to use the call
+        
+        Returns:
+            Tuple[T, Optional[R]]: (verdict, result), as for run()
+        """
+        verdict_ready = asyncio.get_running_loop().create_future()
+        
+        async def admitted() -> bool:
+            return await asyncio.shield(verdict_ready)
+        
+        task = asyncio.ensure_future(call(admitted))
+        
+        try:
+            verdict = await asyncio.get_running_loop().run_in_executor(self.executor, check)
+            approved = bool(is_approved(verdict))
+        except BaseException:
+            verdict_ready.set_result(False)
+            task.cancel()
+            raise
+        
+        verdict_ready.set_result(approved)
+        if not approved:
+            task.cancel()
+            SPECULATIVE.inc('discarded')
+            return verdict, None
+        
+        SPECULATIVE.inc('used')
+        return verdict, await task
+    
+    def stream(self, check: Callable[[], T], chunks: Iterator[str],
+               is_approved: Callable[[T], bool] = bool) -> Tuple[T, Optional[Iterator[str]]]:
+        """
+        Start a streamed response while checking its input.
+        
+        The first chunk is fetched on a worker thread, which sends the
+        request; the rest stream on the caller's thread once approved. A
+        rejected stream is closed without being read further, so nothing
+        it would have stored (cache, session) is stored.
+        
+        Args:
+            check: Input check, run on the calling thread
+            chunks: Not yet started stream, e.g. from AIClient.chat_stream()
+            is_approved: Decides from the check's result whether to use the stream
+        
+        Returns:
+            Tuple[T, Optional[Iterator[str]]]: (verdict, chunks); chunks is
+                                               None when the input was rejected
+        """
+        first = self.executor.submit(next, chunks, None)
+        
+        def close(_: Any = None):
+            chunks.close()
+        
+        try:
+            verdict = check()
+            approved = bool(is_approved(verdict))
+        except BaseException:
+            if not first.cancel():
+                first.add_done_callback(close)
+            raise
+        
+        if not approved:
+            if first.cancel():
+                SPECULATIVE.inc('cancelled')
+            else:
+                SPECULATIVE.inc('discarded')
+                first.add_done_callback(close)
+            return verdict, None
+        
+        SPECULATIVE.inc('used')
+        
+        def approved_chunks() -> Iterator[str]:
+            head = first.result()
+            if head is None:
+                return
+            yield head
+            yield from chunks
+        
+        return verdict, approved_chunks()
+
+
+def create_speculator_from_env() -> Optional[SpeculativeDispatcher]:
+    """
+    Build the speculative dispatcher configured by environment variables.
+    
+    SPECULATIVE_DISPATCH turns it on (default: off) and SPECULATIVE_WORKERS
+    sets the threads available for speculative calls.
+    
+    Returns:
+        Optional[SpeculativeDispatcher]: Configured dispatcher, or None if disabled
+    """
+    if os.getenv('SPECULATIVE_DISPATCH', 'false').lower() != 'true':
+        return None
+    return SpeculativeDispatcher(int(os.getenv('SPECULATIVE_WORKERS', 32)))
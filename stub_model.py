@@ -0,0 +1,224 @@
+"""
+Stub Model Module
+Offline stand-in for a Gemini model, used by tests and benchmarks
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Callable, Iterator, List, Optional, Union
+
+from prompt_cache import CachedPrompt
+
+
+class StubResponse:
+    """Minimal stand-in for a Gemini response or streamed chunk."""
+    
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubError(Exception):
+    """Transient upstream error raised by the stub model."""
+    
+    def __init__(self, message: str = "503 Service Unavailable", code: int = 503):
+        super().__init__(message)
+        self.code = code
+
+
+class StubModel:
+    """Mimics genai.GenerativeModel with scripted replies and artificial latency."""
+    
+    def __init__(self,
+                 reply: Union[str, Callable[[str], str], None] = None,
+                 chunks: Optional[List[str]] = None,
+                 latency: float = 0.0,
+                 error_rate: float = 0.0,
+                 seed: Optional[int] = None,
+                 system_instruction: str = '',
+                 capacity: Optional[int] = None):
+        """
+        Initialize the stub model.
+        
+        Args:
+            reply: Fixed reply text, or a function building it from the prompt;
+                   defaults to echoing the prompt
+            chunks: Optional scripted chunks returned when streaming
+            latency (float): Seconds to wait before answering
+            error_rate (float): Fraction of calls failing with StubError
+            seed (int): Optional seed for reproducible error injection
+            system_instruction (str): System prompt counted in each request's
+                                      size unless it was cached with cache_prompt()
+            capacity (int): Concurrent calls answered within `latency`; beyond
+                            it latency grows with the load, like an overloaded
+                            upstream (default: unlimited)
+        """
+        self.reply = reply
+        self.chunks = chunks
+        self.latency = latency
+        self.error_rate = error_rate
+        self.system_instruction = system_instruction
+        self.capacity = capacity
+        self.calls = 0
+        self.in_flight = 0
+        self.prompt_uploads = 0
+        # What the latest request would have sent, to check payload size
+        self.last_history: Optional[List[dict]] = None
+        self.last_request_bytes = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+    
+    def _reply_for(self, contents) -> str:
+        """Build the reply text for a prompt."""
+        if self.chunks is not None:
+            return ''.join(self.chunks)
+        if callable(self.reply):
+            return self.reply(contents)
+        if self.reply is not None:
+            return self.reply
+        return f"Echo: {contents}"
+    
+    def _stream(self, text: str) -> Iterator[StubResponse]:
+        """Split a reply into streamed chunks."""
+        chunks = self.chunks if self.chunks is not None else text.split(' ')
+        for index, chunk in enumerate(chunks):
+            if self.chunks is None and index < len(chunks) - 1:
+                chunk += ' '
+            yield StubResponse(chunk)
+    
+    def _maybe_fail(self):
+        """Raise a StubError for the configured fraction of calls."""
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise StubError()
+    
+    def _begin(self) -> float:
+        """Count a call in flight and get its latency under the current load."""
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            if self.capacity is None:
+                return self.latency
+            return self.latency * -(-self.in_flight // self.capacity)
+    
+    def _end(self):
+        with self._lock:
+            self.in_flight -= 1
+    
+    def _timeout(self, request_options: Optional[dict], latency: float) -> Optional[float]:
+        """Get the timeout the call would hit, if latency exceeds it."""
+        timeout = (request_options or {}).get('timeout')
+        if timeout is not None and latency > timeout:
+            return timeout
+        return None
+    
+    def _record(self, contents, history: Optional[List[dict]] = None,
+                prompt_cached: bool = False):
+        """Record the size of the request the real SDK would send."""
+        self.last_history = list(history) if history is not None else None
+        payload = {'contents': (history or []) + [{'role': 'user', 'parts': [contents]}]}
+        if not prompt_cached:
+            payload['system_instruction'] = self.system_instruction
+        self.last_request_bytes = len(json.dumps(payload, default=str).encode('utf-8'))
+    
+    def generate_content(self, contents, stream: bool = False,
+                         request_options: Optional[dict] = None, **kwargs):
+        """Blocking generate call, like GenerativeModel.generate_content."""
+        self._record(contents)
+        return self._respond(contents, stream, request_options)
+    
+    async def generate_content_async(self, contents, stream: bool = False,
+                                     request_options: Optional[dict] = None, **kwargs):
+        """Async generate call, like GenerativeModel.generate_content_async."""
+        self._record(contents)
+        return await self._arespond(contents, stream, request_options)
+    
+    def _respond(self, contents, stream: bool, request_options: Optional[dict]):
+        """Answer a blocking call, with the configured latency and errors."""
+        latency = self._begin()
+        try:
+            timeout = self._timeout(request_options, latency)
+            if timeout is not None:
+                time.sleep(timeout)
+                raise TimeoutError("504 Deadline Exceeded")
+            if latency:
+                time.sleep(latency)
+        finally:
+            self._end()
+        self._maybe_fail()
+        text = self._reply_for(contents)
+        if stream:
+            return list(self._stream(text))
+        return StubResponse(text)
+    
+    async def _arespond(self, contents, stream: bool, request_options: Optional[dict]):
+        """Answer an async call, with the configured latency and errors."""
+        latency = self._begin()
+        try:
+            timeout = self._timeout(request_options, latency)
+            if timeout is not None:
+                await asyncio.sleep(timeout)
+                raise TimeoutError("504 Deadline Exceeded")
+            if latency:
+                await asyncio.sleep(latency)
+        finally:
+            self._end()
+        self._maybe_fail()
+        text = self._reply_for(contents)
+        if stream:
+            return list(self._stream(text))
+        return StubResponse(text)
+    
+    def start_chat(self, history: Optional[List[dict]] = None) -> 'StubChat':
+        """Start a chat with earlier turns, like GenerativeModel.start_chat."""
+        return StubChat(self, history or [])
+    
+    def cache_prompt(self, model_name: str, system_prompt: str, ttl: float) -> CachedPrompt:
+        """Pretend to cache the system prompt upstream, like prompt_cache.create_gemini_prompt."""
+        self.prompt_uploads += 1
+        return CachedPrompt(StubCachedModel(self), lambda seconds: None)
+
+
+class StubCachedModel:
+    """Mimics a model built from cached content: the system prompt is referenced, not sent."""
+    
+    def __init__(self, model: StubModel):
+        self.model = model
+    
+    def generate_content(self, contents, stream: bool = False,
+                         request_options: Optional[dict] = None, **kwargs):
+        """Blocking generate call referencing the cached prompt."""
+        self.model._record(contents, prompt_cached=True)
+        return self.model._respond(contents, stream, request_options)
+    
+    async def generate_content_async(self, contents, stream: bool = False,
+                                     request_options: Optional[dict] = None, **kwargs):
+        """Async generate call referencing the cached prompt."""
+        self.model._record(contents, prompt_cached=True)
+        return await self.model._arespond(contents, stream, request_options)
+    
+    def start_chat(self, history: Optional[List[dict]] = None) -> 'StubChat':
+        """Start a chat referencing the cached prompt."""
+        return StubChat(self.model, history or [], prompt_cached=True)
+
+
+class StubChat:
+    """Mimics genai.ChatSession, sending messages through the stub model."""
+    
+    def __init__(self, model: StubModel, history: List[dict], prompt_cached: bool = False):
+        self.model = model
+        self.history = history
+        self.prompt_cached = prompt_cached
+    
+    def send_message(self, content, stream: bool = False,
+                     request_options: Optional[dict] = None, **kwargs):
+        """Blocking send, like ChatSession.send_message."""
+        self.model._record(content, self.history, self.prompt_cached)
+        return self.model._respond(content, stream, request_options)
+    
+    async def send_message_async(self, content, stream: bool = False,
+                                 request_options: Optional[dict] = None, **kwargs):
+        """Async send, like ChatSession.send_message_async."""
+        self.model._record(content, self.history, self.prompt_cached)
+        return await self.model._arespond(content, stream, request_options)
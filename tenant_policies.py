@@ -0,0 +1,213 @@
+"""
+Tenant Policies Module
+Per-tenant keyword policies, sharing compiled moderators between identical lists
+"""
+
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from keyword_store import KeywordSet, LayeredKeywordSet, keyword_version
+from moderation import ContentModerator
+from single_flight import SingleFlight
+from text_normalizer import normalize_text
+
+
+class TenantPolicies:
+    """
+    Registry of tenant keyword policies on top of a shared base moderator.
+    
+    A tenant's policy is the base keywords plus its own terms. Only the
+    terms are compiled; the base set's matcher is shared by every policy.
+    Policies are cached by content (base version + normalized terms), so
+    tenants with the same terms share one moderator, and the least recently
+    used policies are evicted beyond `max_policies` to bound memory.
+    """
+    
+    def __init__(self, base: ContentModerator, tenants: Optional[Dict[str, List[str]]] = None,
+                 api_keys: Optional[Dict[str, str]] = None, max_policies: int = 128):
+        """
+        Initialize the registry.
+        
+        Args:
+            base (ContentModerator): Moderator with the shared keywords
+            tenants: Optional mapping of tenant id to its extra keywords
+            api_keys: Optional mapping of API key to tenant id
+            max_policies (int): Compiled policies kept in memory
+        """
+        self.base = base
+        self.max_policies = max_policies
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._tenants: Dict[str, Tuple[str, List[str]]] = {}
+        self._api_keys = dict(api_keys or {})
+        self._policies: 'OrderedDict[str, ContentModerator]' = OrderedDict()
+        # Compiled tenant terms by version, kept while a cached policy uses them,
+        # so a base keyword reload doesn't recompile them
+        self._extra_sets: 'weakref.WeakValueDictionary[str, KeywordSet]' = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._builds = SingleFlight()
+        
+        for tenant_id, keywords in (tenants or {}).items():
+            self.set_tenant(tenant_id, keywords)
+    
+    def set_tenant(self, tenant_id: str, keywords: List[str]):
+        """
+        Add or replace a tenant's extra keywords.
+        
+        Args:
+            tenant_id (str): Tenant identifier
+            keywords (List[str]): Keywords blocked for this tenant on top of the base
+        """
+        terms = sorted({normalize_text(keyword.strip()) for keyword in keywords if keyword.strip()})
+        self._tenants[tenant_id] = (keyword_version(terms), terms)
+    
+    def add_api_key(self, api_key: str, tenant_id: str):
+        """Map an API key to a tenant."""
+        self._api_keys[api_key] = tenant_id
+    
+    def resolve(self, tenant_id: Optional[str] = None,
+                api_key: Optional[str] = None) -> Optional[str]:
+        """
+        Find the tenant for a request.
+        
+        Args:
+            tenant_id (str): Tenant named in the request, if any
+            api_key (str): API key sent with the request, if any; takes
+                           precedence over tenant_id
+        
+        Returns:
+            Optional[str]: Known tenant id, or None
+        """
+        if api_key:
+            return self._api_keys.get(api_key)
+        if tenant_id in self._tenants:
+            return tenant_id
+        return None
+    
+    def moderator_for(self, tenant_id: str) -> ContentModerator:
+        """
+        Get the moderator enforcing a tenant's policy.
+        
+        Args:
+            tenant_id (str): Known tenant id
+        
+        Returns:
+            ContentModerator: Shared moderator for the tenant's keyword list
+        """
+        terms_version, terms = self._tenants[tenant_id]
+        if not terms:
+            return self.base
+        
+        base_set = self.base.keyword_set
+        key = f"{base_set.version}:{terms_version}"
+        
+        with self._lock:
+            moderator = self._policies.get(key)
+            if moderator is not None:
+                self._policies.move_to_end(key)
+                self.hits += 1
+                return moderator
+            self.misses += 1
+        
+        # Tenants asking for the same uncached policy wait for one build
+        moderator = self._builds.do(key, lambda: self._build(base_set, terms))
+        
+        with self._lock:
+            self._policies[key] = moderator
+            self._policies.move_to_end(key)
+            while len(self._policies) > self.max_policies:
+                self._policies.popitem(last=False)
+                self.evictions += 1
+        return moderator
+    
+    def warm(self):
+        """Compile the tenants' policies now (up to max_policies), e.g. before forking workers."""
+        for tenant_id in list(self._tenants)[:self.max_policies]:
+            self.moderator_for(tenant_id)
+    
+    def _build(self, base_set: KeywordSet, terms: List[str]) -> ContentModerator:
+        """Build a moderator for the base keywords plus a tenant's terms, compiling only the terms."""
+        present = set(base_set.keywords)
+        extra = [term for term in terms if term not in present]
+        extra_version = keyword_version(extra)
+        with self._lock:
+            extra_set = self._extra_sets.get(extra_version)
+            if extra_set is None:
+                extra_set = self._extra_sets[extra_version] = KeywordSet(extra, source='tenant')
+        
+        moderator = ContentModerator(match_mode=self.base.match_mode)
+        moderator.use_keyword_set(LayeredKeywordSet(
+            base_set, extra_set, source=f"{base_set.source} + {len(extra)} tenant keywords"))
+        # Share the base verdict cache once built, so the swap above doesn't
+        # invalidate the built-in list's verdicts; keys carry the version
+        moderator.verdict_cache = self.base.verdict_cache
+        return moderator
+    
+    def stats(self) -> dict:
+        """
+        Get registry statistics for monitoring.
+        
+        Returns:
+            dict: Tenant and cached policy counts, hits, misses and evictions
+        """
+        with self._lock:
+            policies = len(self._policies)
+        return {
+            'tenants': len(self._tenants),
+            'policies': policies,
+            'max_policies': self.max_policies,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+def load_tenants(path: str, base: ContentModerator, max_policies: int = 128) -> TenantPolicies:
+    """
+    Build tenant policies from a JSON file.
+    
+    The file maps tenant ids to their settings:
+    {"acme": {"keywords": ["term", ...], "api_keys": ["key", ...]}, ...}
+    
+    Args:
+        path (str): JSON tenants file
+        base (ContentModerator): Moderator with the shared keywords
+        max_policies (int): Compiled policies kept in memory
+    
+    Returns:
+        TenantPolicies: Registry with every tenant from the file
+    """
+    with open(path, 'r', encoding='utf-8') as handle:
+        config = json.load(handle)
+    
+    policies = TenantPolicies(base, max_policies=max_policies)
+    for tenant_id, settings in config.items():
+        policies.set_tenant(tenant_id, settings.get('keywords', []))
+        for api_key in settings.get('api_keys', []):
+            policies.add_api_key(api_key, tenant_id)
+    return policies
+
+
+def create_policies_from_env(base: ContentModerator) -> Optional[TenantPolicies]:
+    """
+    Build the tenant policies configured by environment variables.
+    
+    TENANTS_PATH names the JSON tenants file and TENANT_POLICY_CACHE_SIZE
+    the number of compiled policies kept in memory.
+    
+    Args:
+        base (ContentModerator): Moderator with the shared keywords
+    
+    Returns:
+        Optional[TenantPolicies]: Configured registry, or None if not configured
+    """
+    path = os.getenv('TENANTS_PATH')
+    if not path:
+        return None
+    max_policies = int(os.getenv('TENANT_POLICY_CACHE_SIZE', 128))
+    return load_tenants(path, base, max_policies)
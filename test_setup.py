@@ -46,7 +46,8 @@ def test_dependencies():
     packages = {
         'google.generativeai': 'google-generativeai',
         'flask': 'flask',
-        'dotenv': 'python-dotenv'
+        'dotenv': 'python-dotenv',
+        'asgiref': 'asgiref'
     }
     
     all_installed = True
@@ -111,6 +112,874 @@ def test_moderator():
         return False
 
 
+def test_unicode_keywords():
+    """Test that custom keywords are folded like the text they are matched against."""
+    print("\n🧪 Testing Unicode Keywords")
+    print("=" * 60)
+    
+    from moderation import ContentModerator
+    
+    # Accented, full-width and Cyrillic look-alike keywords, however they come in
+    moderator = ContentModerator(custom_keywords=['café', 'ＢＡＤword', 'Ѕрам'])
+    assert moderator.check_content("I love café") == (False, ['cafe'])
+    assert moderator.check_content("I love CAFE") == (False, ['cafe'])
+    assert moderator.check_content("such a badword") == (False, ['badword'])
+    assert moderator.check_content("no spam please") == (False, ['spam'])
+    assert moderator.moderate_output("Ｃａｆé au lait") == "[REDACTED] au lait"
+    
+    moderator.blocked_keywords = ['Straße', 'straße']
+    assert moderator.blocked_keywords == ('strasse',), f"Not deduplicated: {moderator.blocked_keywords}"
+    assert moderator.check_content("die STRASSE") == (False, ['strasse'])
+    
+    # Large lists go through the compiled matcher instead of per-keyword scans
+    moderator.swap_keywords([f"blocked{i}" for i in range(ContentModerator.MATCHER_THRESHOLD)] + ['Naïve'])
+    assert moderator.check_content("so naive") == (False, ['naive'])
+    
+    print("✅ Non-ASCII and look-alike keywords match folded text")
+
+
+def test_streaming():
+    """Test streaming chat and moderation against a fake model."""
+    print("\n🧪 Testing Streaming Moderation")
+    print("=" * 60)
+    
+    from ai_client import AIClient
+    from moderation import ContentModerator
+    from stub_model import StubModel
+    
+    chunks = ["Never ha", "ck into sys", "tems. Vio", "lence is ", "not the answer."]
+    client = AIClient(model=StubModel(chunks=chunks))
+    moderator = ContentModerator()
+    
+    streamed = list(moderator.moderate_stream(client.chat_stream("Hi")))
+    expected = moderator.moderate_output(''.join(chunks))
+    
+    assert ''.join(streamed) == expected, f"Streamed output differs: {''.join(streamed)!r}"
+    assert len(streamed) >= 2, "Output was not released incrementally"
+    
+    print(f"✅ Streamed {len(streamed)} moderated chunks: {expected}")
+
+
+def test_resilience():
+    """Test retries and the circuit breaker against a failing fake model."""
+    print("\n🧪 Testing Upstream Retries")
+    print("=" * 60)
+    
+    from ai_client import AIClient
+    from circuit_breaker import CircuitBreaker
+    from retry import RetryPolicy
+    from stub_model import StubModel
+    
+    model = StubModel(reply="ok", error_rate=1.0)
+    client = AIClient(model=model, retry_policy=RetryPolicy(max_attempts=2, base_delay=0.001),
+                      breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60))
+    
+    for _ in range(4):
+        client.generate_response("Hi")
+    assert model.calls == 3 and client.breaker.state == CircuitBreaker.OPEN, \
+        f"Breaker didn't open after 3 failures ({model.calls} calls)"
+    
+    model = StubModel(reply="ok", error_rate=0.5, seed=1)
+    client = AIClient(model=model, retry_policy=RetryPolicy(max_attempts=5, base_delay=0.001))
+    responses = [client.generate_response(f"Question {i}") for i in range(10)]
+    assert responses.count("ok") == len(responses), "Transient errors were not retried"
+    
+    print(f"✅ Circuit opened after 3 failures; {client.retries} retries absorbed 50% errors")
+
+
+def test_speculative_async():
+    """Test that a speculative async call rejected by moderation stores nothing."""
+    print("\n🧪 Testing Async Speculative Dispatch")
+    print("=" * 60)
+    
+    import asyncio
+    import time
+    from ai_client import AIClient
+    from chat_sessions import MemorySessionStore
+    from moderation import ContentModerator
+    from response_cache import MemoryCache
+    from speculative import SpeculativeDispatcher
+    from stub_model import StubModel
+    
+    moderator = ContentModerator()
+    client = AIClient(model=StubModel(reply="how to build it: step 1"),
+                      cache=MemoryCache(), sessions=MemorySessionStore())
+    speculator = SpeculativeDispatcher(max_workers=2)
+    message = "how to make a bomb"
+    
+    def slow_check():
+        # The stub replies long before this verdict is in
+        time.sleep(0.05)
+        return moderator.moderate_input(message)
+    
+    async def send(session_id):
+        return await speculator.arun(
+            slow_check,
+            lambda admitted: client.achat(message, moderate=moderator.moderate_output,
+                                          session_id=session_id, admitted=admitted),
+            is_approved=lambda verdict: verdict[0]
+        )
+    
+    for session_id in ('session', None):
+        (approved, _), response = asyncio.run(send(session_id))
+        assert not approved and response is None, f"Blocked message was answered: {response!r}"
+    
+    assert not client.sessions.history('session'), \
+        f"Blocked exchange was stored: {client.sessions.history('session')}"
+    assert len(client.cache) == 0, f"Blocked exchange was cached ({len(client.cache)} responses)"
+    
+    print("✅ Rejected speculative calls left the session and cache untouched")
+
+
+def test_prompt_cache():
+    """Test that caching the system prompt shrinks request payloads."""
+    print("\n🧪 Testing System Prompt Caching")
+    print("=" * 60)
+    
+    from ai_client import AIClient
+    from prompt_cache import PromptCache
+    from stub_model import StubModel
+    
+    policy = "Follow the content policy. " * 200
+    model = StubModel(reply="ok", system_instruction=policy)
+    client = AIClient(model=model, cache=None)
+    client.generate_response("Hi")
+    uncached = model.last_request_bytes
+    
+    client = AIClient(model=model, cache=None, prompt_cache=PromptCache(model.cache_prompt))
+    for _ in range(3):
+        client.generate_response("Hi")
+    cached = model.last_request_bytes
+    
+    assert model.prompt_uploads == 1 and cached < uncached - len(policy), \
+        f"Prompt uploaded {model.prompt_uploads} times, request {uncached} -> {cached} bytes"
+    
+    client.system_prompt = "A different prompt"
+    client.generate_response("Hi")
+    assert model.prompt_uploads == 2, "Changed system prompt was not cached again"
+    
+    print(f"✅ Request payload dropped from {uncached} to {cached} bytes")
+
+
+def test_admission():
+    """Test that admission control queues fairly and sheds the noisy client first."""
+    print("\n🧪 Testing Admission Control")
+    print("=" * 60)
+    
+    import threading
+    import time
+    from admission import AdmissionController, AdmissionRejected
+    
+    controller = AdmissionController(max_concurrent=1, max_queue=2, queue_timeout=2)
+    held = controller.acquire('noisy')
+    served = []
+    shed = []
+    
+    def request(client):
+        try:
+            with controller.acquire(client):
+                served.append(client)
+        except AdmissionRejected as e:
+            shed.append((client, e.status, e.retry_after))
+    
+    threads = [threading.Thread(target=request, args=(client,))
+               for client in ('noisy', 'noisy', 'quiet')]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    held.release()
+    for thread in threads:
+        thread.join()
+    
+    # The full backlog gave the quiet client the noisy client's newest spot
+    rejections = [(client, status) for client, status, _ in shed]
+    assert served == ['noisy', 'quiet'] and rejections == [('noisy', 503)] and shed[0][2] >= 1, \
+        f"Served {served}, shed {shed}"
+    
+    print(f"✅ Served {served}, shed the noisy client's extra request with Retry-After")
+
+
+def test_keyword_index():
+    """Test that a moderator loaded from an index file finds what a compiled one does."""
+    print("\n🧪 Testing Keyword Index")
+    print("=" * 60)
+    
+    import os
+    import tempfile
+    from keyword_index import write_index
+    from moderation import ContentModerator
+    
+    keywords = [f"blocked{i}" for i in range(ContentModerator.MATCHER_THRESHOLD)] + ['bomb', 'bom']
+    compiled = ContentModerator()
+    compiled.swap_keywords(keywords)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'keywords.kwidx')
+        write_index(keywords, path)
+        mapped = ContentModerator.from_index(path)
+        
+        text = "A BOMB and blocked12 here, blocked255 there"
+        for moderator in (compiled, mapped):
+            print(f"   {moderator.check_content(text)} {moderator.moderate_output(text)!r}")
+        assert mapped.check_content(text) == compiled.check_content(text)
+        assert mapped.moderate_output(text) == compiled.moderate_output(text)
+        assert mapped.keyword_info()['version'] == compiled.keyword_info()['version']
+    
+    print("✅ Index file matches like the compiled keyword list")
+
+
+def test_bulk_moderation():
+    """Test that bulk moderation workers use the configured keyword file and match mode."""
+    print("\n🧪 Testing Bulk Moderation")
+    print("=" * 60)
+    
+    import json
+    import tempfile
+    from cli import run_command
+    
+    saved = {name: os.environ.get(name) for name in ('KEYWORDS_PATH', 'MODERATION_MODE')}
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            keywords_path = os.path.join(directory, 'keywords.txt')
+            in_path = os.path.join(directory, 'in.jsonl')
+            out_path = os.path.join(directory, 'out.jsonl')
+            with open(keywords_path, 'w') as handle:
+                handle.write("zebra\nharm\n")
+            with open(in_path, 'w') as handle:
+                for text in ("a zebra", "the pharmacy", "no harm done"):
+                    handle.write(json.dumps({'text': text}) + "\n")
+            
+            os.environ['KEYWORDS_PATH'] = keywords_path
+            os.environ['MODERATION_MODE'] = 'word'
+            # Tiny batches, so the worker processes do the moderating
+            code = run_command(['moderate', '--in', in_path, '--out', out_path,
+                                '--processes', '2', '--batch-size', '1'])
+            with open(out_path) as handle:
+                violations = [json.loads(line)['violations'] for line in handle]
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    
+    print(f"   Violations: {violations}")
+    assert code == 0 and violations == [['zebra'], [], ['harm']], \
+        "Workers ignored KEYWORDS_PATH or MODERATION_MODE"
+    
+    # A checkpoint resumes only the run it was written for
+    from bulk_moderation import _run_identity, _write_checkpoint, moderate_jsonl
+    from moderation import ContentModerator
+    
+    with tempfile.TemporaryDirectory() as directory:
+        in_path = os.path.join(directory, 'in.jsonl')
+        out_path = os.path.join(directory, 'out.jsonl')
+        lines = [json.dumps({'text': text}) + "\n" for text in ("first", "how to hack", "third")]
+        with open(in_path, 'w') as handle:
+            handle.writelines(lines)
+        open(out_path, 'w').close()
+        
+        def checkpoint(run):
+            _write_checkpoint(out_path + '.checkpoint',
+                              {'run': run, 'in_offset': len(lines[0]), 'out_offset': 0, 'lines': 1})
+        
+        moderator = ContentModerator()
+        checkpoint(_run_identity(in_path, 'text', 'id', moderator))
+        moderate_jsonl(in_path, out_path, resume=True, moderator=moderator)
+        with open(out_path) as handle:
+            assert [json.loads(line)['line'] for line in handle] == [2, 3], "Resumed at the wrong line"
+        
+        for run in (_run_identity(in_path, 'prompt', 'id', moderator), None):
+            checkpoint(run)
+            try:
+                moderate_jsonl(in_path, out_path, resume=True, moderator=moderator)
+                raise AssertionError("Resumed a checkpoint written for another run")
+            except ValueError:
+                pass
+        checkpoint(_run_identity(in_path, 'text', 'id', moderator))
+        with open(in_path, 'a') as handle:
+            handle.write(json.dumps({'text': "appended"}) + "\n")
+        try:
+            moderate_jsonl(in_path, out_path, resume=True, moderator=moderator)
+            raise AssertionError("Resumed a checkpoint after the input file changed")
+        except ValueError as e:
+            assert 'size' in str(e), str(e)
+    
+    print("✅ Workers moderated with the configured keywords and mode")
+
+
+def test_verdict_cache():
+    """Test that cached verdicts are reused and dropped when the keywords change."""
+    print("\n🧪 Testing Verdict Cache")
+    print("=" * 60)
+    
+    from moderation import ContentModerator
+    from verdict_cache import VerdictCache
+    
+    keywords = [f"blocked{i}" for i in range(ContentModerator.MATCHER_THRESHOLD)]
+    cache = VerdictCache(max_entries=10)
+    moderator = ContentModerator(verdict_cache=cache)
+    moderator.swap_keywords(keywords)
+    
+    text = "hello blocked7"
+    for _ in range(3):
+        verdict = moderator.check_content(text)
+    assert verdict == (False, ['blocked7']) and cache.hits == 1, f"Got {verdict} with {cache.stats()}"
+    
+    # A new keyword list must not be answered from the old list's verdicts
+    moderator.swap_keywords(keywords[8:])
+    verdict = moderator.check_content(text)
+    assert verdict == (True, []) and len(cache) == 0, f"Got {verdict} after the swap with {cache.stats()}"
+    
+    # The list can't be edited behind the cache's back; assigning a new one invalidates
+    moderator.check_content("a secret")
+    moderator.check_content("a secret")
+    try:
+        moderator.blocked_keywords.append("secret")
+        raise AssertionError("The active keyword list could be edited in place")
+    except AttributeError:
+        pass
+    moderator.blocked_keywords = list(moderator.blocked_keywords) + ["secret"]
+    verdict = moderator.check_content("a secret")
+    assert verdict == (False, ['secret']), f"Got {verdict} after adding a keyword"
+    
+    # Texts whose hashes collide still get their own verdicts
+    class Colliding(str):
+        def __hash__(self):
+            return 1
+    
+    moderator = ContentModerator(keywords, verdict_cache=VerdictCache(max_entries=10))
+    for text in ("hello blocked7", "hello there!!") * 2:
+        verdict = moderator.check_content(Colliding(text))
+    assert verdict == (True, []) and moderator.check_content(Colliding("hello blocked7"))[1] == ['blocked7']
+    assert moderator.verdict_cache.hits == 1 and len(moderator.verdict_cache) == 2
+    
+    # Keys seen once count towards the memory estimate, and the small built-in list skips the cache
+    cache = VerdictCache(max_entries=10)
+    key = cache.key('substring:check', 'v1', "once")
+    cache.set(key, ((),))
+    assert cache.stats()['bytes'] > 0 and len(cache) == 0
+    cache.set(key, ((),))
+    assert len(cache) == 1 and cache.invalidate('v1') == 1 and cache.stats()['bytes'] == 0
+    assert ContentModerator(verdict_cache=cache).verdict_cache_stats()['active'] is False
+    assert moderator.verdict_cache_stats()['active'] is True
+    
+    print(f"✅ Verdicts cached and invalidated ({cache.stats()['hit_ratio']:.0%} hits)")
+
+
+def test_response_cache():
+    """Test the response cache's LRU eviction and expiry, and that chat() is served from it."""
+    print("\n🧪 Testing Response Cache")
+    print("=" * 60)
+    
+    import time
+    from ai_client import AIClient
+    from moderation import ContentModerator
+    from response_cache import MemoryCache, SQLiteCache
+    from stub_model import StubModel
+    
+    for cache in (MemoryCache(max_entries=2), SQLiteCache(':memory:', max_entries=2)):
+        for key in ('a', 'b', 'a', 'c'):
+            # Reading 'a' again makes 'b' the least recently used entry
+            if cache.get(key) is None:
+                cache.set(key, key.upper())
+            time.sleep(0.001)
+        assert cache.get('b') is None and cache.get('a') == 'A' and cache.get('c') == 'C', \
+            f"{cache.backend} cache evicted the wrong entry"
+        
+        cache.ttl = 0.05
+        cache.set('d', 'D')
+        time.sleep(0.1)
+        assert cache.get('d') is None, f"{cache.backend} cache served an expired entry"
+    
+    model = StubModel(reply="Sure, here is a joke")
+    client = AIClient(model=model, cache=MemoryCache())
+    moderate = ContentModerator().moderate_output
+    first = client.chat("Tell me a joke", moderate=moderate)
+    second = client.chat("  tell ME a   joke ", moderate=moderate)
+    assert first == second and model.calls == 1, f"Normalized repeat made {model.calls} calls"
+    client.chat("Tell me a joke", moderate=moderate, cache_scope='other-keywords')
+    assert model.calls == 2, "A different cache scope was served the cached response"
+    
+    print(f"✅ LRU and TTL eviction work; repeats served from cache ({client.cache.stats()['hits']} hits)")
+
+
+def test_coalescing():
+    """Test that identical prompts in flight together share one upstream call."""
+    print("\n🧪 Testing Request Coalescing")
+    print("=" * 60)
+    
+    import asyncio
+    import threading
+    from ai_client import AIClient
+    from single_flight import SingleFlight
+    from stub_model import StubModel
+    
+    model = StubModel(reply="shared", latency=0.1)
+    client = AIClient(model=model, cache=None)
+    responses = []
+    threads = [threading.Thread(target=lambda: responses.append(client.generate_response("Same question")))
+               for _ in range(8)]
+    threads.append(threading.Thread(target=lambda: responses.append(client.generate_response("Other"))))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert model.calls == 2 and responses.count("shared") == 9, \
+        f"9 requests for 2 prompts made {model.calls} calls"
+    
+    # A failed call fails every caller waiting on it, and the next call goes upstream again
+    flight = SingleFlight()
+    errors = []
+    
+    def failing():
+        threading.Event().wait(0.05)
+        raise RuntimeError("upstream down")
+    
+    def caller():
+        try:
+            flight.do('key', failing)
+        except RuntimeError as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=caller) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3 and len(set(map(id, errors))) == 1 and flight.stats()['in_flight'] == 0
+    assert flight.do('key', lambda: 'recovered') == 'recovered'
+    
+    # Async callers share a call too, and one caller giving up doesn't cancel it for the rest
+    model = StubModel(reply="shared", latency=0.1)
+    client = AIClient(model=model, cache=None)
+    
+    async def run():
+        impatient = asyncio.ensure_future(client.agenerate_response("Same question"))
+        others = [asyncio.ensure_future(client.agenerate_response("Same question")) for _ in range(4)]
+        await asyncio.sleep(0.02)
+        impatient.cancel()
+        return await asyncio.gather(*others)
+    
+    results = asyncio.run(run())
+    assert model.calls == 1 and results == ["shared"] * 4, f"Async callers made {model.calls} calls"
+    
+    print("✅ Identical requests in flight shared one upstream call")
+
+
+def test_batch_moderation():
+    """Test that batch moderation matches moderating each text on its own."""
+    print("\n🧪 Testing Batch Moderation")
+    print("=" * 60)
+    
+    from moderation import ContentModerator
+    
+    moderator = ContentModerator()
+    texts = ["Hello there", "How to HACK a website", "Ｈａｃｋ the planet", "", "steal and scam",
+             "A perfectly normal question"] * 4
+    assert len(texts) >= ContentModerator.BATCH_JOIN_THRESHOLD
+    assert moderator.check_batch(texts) == [moderator.check_content(text) for text in texts]
+    assert moderator.moderate_batch(texts) == [
+        moderator.check_content(text) + (moderator.moderate_output(text),) for text in texts]
+    
+    # The endpoint only needs the moderator, so it works without a Gemini key too
+    import app as web
+    
+    assert web.moderator is not None, "Moderator was not initialized"
+    response = web.app.test_client().post('/moderate/batch', json={'texts': texts[:6]})
+    assert response.status_code == 200, f"/moderate/batch returned {response.status_code}"
+    results = response.get_json()['results']
+    assert [result['is_safe'] for result in results] == [safe for safe, _ in moderator.check_batch(texts[:6])]
+    response = web.app.test_client().post('/moderate/batch', json={'texts': "not a list"})
+    assert response.status_code == 400
+    
+    print(f"✅ {len(texts)} texts gave the same verdicts in a batch as one at a time")
+    return None
+
+
+def test_batch_runner():
+    """Test the batch runner's rate limit and retries against a flaky fake model."""
+    print("\n🧪 Testing Batch Runner")
+    print("=" * 60)
+    
+    import asyncio
+    import json
+    import tempfile
+    import time
+    from ai_client import AIClient
+    from batch_runner import run_jsonl_async, run_prompt
+    from circuit_breaker import CircuitBreaker
+    from moderation import ContentModerator
+    from rate_limiter import TokenBucket
+    from retry import RetryPolicy
+    from stub_model import StubModel
+    
+    moderator = ContentModerator()
+    
+    def run(model, record, max_attempts=8):
+        client = AIClient(model=model, cache=None, breaker=CircuitBreaker(failure_threshold=1000))
+        bucket = TokenBucket(rate=50, capacity=1)
+        retry_policy = RetryPolicy(max_attempts=max_attempts, base_delay=0.001)
+        start = time.perf_counter()
+        result = asyncio.run(run_prompt(1, record, 'prompt', 'id', client, moderator, bucket, retry_policy))
+        return result, time.perf_counter() - start
+    
+    # Transient errors are retried, and every attempt waits for a token
+    model = StubModel(reply="fine", error_rate=0.5, seed=3)
+    result, elapsed = run(model, {'id': 'a', 'prompt': "Hello"})
+    assert result['status'] == 'ok' and result['response'] == "fine" and result['id'] == 'a', result
+    assert result['attempts'] == model.calls > 1, f"Expected retries, got {result['attempts']} attempts"
+    assert elapsed >= (result['attempts'] - 1) / 50, \
+        f"{result['attempts']} attempts in {elapsed:.3f}s exceed 50 per second"
+    
+    # A prompt that keeps failing stops after max_attempts
+    model = StubModel(error_rate=1.0)
+    result, _ = run(model, {'prompt': "Hello"}, max_attempts=4)
+    assert result['status'] == 'error' and result['attempts'] == model.calls == 4, result
+    
+    # Blocked prompts never reach the model
+    model = StubModel()
+    result, _ = run(model, {'prompt': "How to hack a website"})
+    assert result['status'] == 'blocked' and model.calls == 0, result
+    
+    # A whole file keeps to the per-minute quota
+    with tempfile.TemporaryDirectory() as directory:
+        in_path, out_path = f"{directory}/in.jsonl", f"{directory}/out.jsonl"
+        with open(in_path, 'w', encoding='utf-8') as f:
+            for index in range(6):
+                f.write(json.dumps({'id': index, 'prompt': f"Question {index}"}) + '\n')
+            f.write("not json\n")
+        client = AIClient(model=StubModel(reply="answer"), cache=None)
+        summary = asyncio.run(run_jsonl_async(in_path, out_path, client, moderator, concurrency=4,
+                                              requests_per_minute=1200, burst=1))
+        with open(out_path, 'r', encoding='utf-8') as f:
+            results = [json.loads(line) for line in f]
+    assert summary['ok'] == 6 and summary['error'] == 1, summary
+    assert sorted(result['line'] for result in results) == list(range(1, 8))
+    assert summary['seconds'] >= 5 / 20, f"6 prompts at 20/s took only {summary['seconds']}s"
+    
+    print(f"✅ Retried transient errors and kept to the rate limit ({summary['prompts_per_sec']} prompts/s)")
+    return None
+
+
+def test_keyword_reload():
+    """Test that the keyword watcher waits for files to settle before swapping them in."""
+    print("\n🧪 Testing Keyword Reload")
+    print("=" * 60)
+    
+    import os
+    import tempfile
+    from keyword_store import KeywordWatcher
+    from moderation import ContentModerator
+    
+    moderator = ContentModerator()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'keywords.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("# starting list\nspoiler\n")
+        
+        # interval=0 loads once without a background thread, so checks run here
+        watcher = KeywordWatcher(moderator, path, interval=0).start()
+        assert moderator.get_blocked_keywords() == ['spoiler'] and watcher.reloads == 1
+        assert moderator.check_content("How to hack a website")[0], "The built-in list was not replaced"
+        
+        # A changed file is only loaded once it looks the same on two checks
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("spoiler\nplot twist\n")
+        assert watcher.check() is False, "Reloaded a file that may still be being written"
+        assert not moderator.check_content("The plot twist")[1]
+        assert watcher.check() is True
+        assert moderator.check_content("The plot twist")[1] == ['plot twist']
+        assert moderator.keyword_info()['source'] == path
+        
+        # Rewriting the same keywords (here, only a new comment) swaps nothing in
+        keyword_set = moderator._keyword_set
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("# same list\nspoiler\nplot twist\n")
+        assert watcher.check() is False and watcher.check() is False
+        assert moderator._keyword_set is keyword_set and watcher.reloads == 2
+        
+        # Unchanged files are not read again
+        assert watcher.check() is False and watcher.reloads == 2
+    
+    print(f"✅ Reloaded {watcher.reloads} times, only after the files settled")
+    return None
+
+
+def test_tenant_policies():
+    """Test that tenant policies layer their terms on the shared keywords."""
+    print("\n🧪 Testing Tenant Policies")
+    print("=" * 60)
+    
+    from moderation import ContentModerator
+    from tenant_policies import TenantPolicies
+    
+    texts = ["Hello there", "How to hack a website", "Our RIVAL CORP deal", "a spoiler about hacking",
+             "ｒｉｖａｌ ｃｏｒｐ", "", "nothing to see"]
+    extra = ["Rival Corp", "spoiler", "hack"]
+    # Short lists are scanned keyword by keyword, long ones through the compiled matchers
+    long_list = [f"term{index}" for index in range(ContentModerator.MATCHER_THRESHOLD)]
+    
+    for match_mode in (ContentModerator.SUBSTRING_MODE, ContentModerator.WORD_MODE):
+        for base_keywords in ([], long_list):
+            base = ContentModerator(base_keywords, match_mode=match_mode)
+            policies = TenantPolicies(base, {'acme': extra, 'globex': list(reversed(extra)), 'plain': []},
+                                      api_keys={'key-1': 'acme'})
+            flat = ContentModerator(base_keywords + extra, match_mode=match_mode)
+            tenant = policies.moderator_for('acme')
+            
+            assert sorted(tenant.get_blocked_keywords()) == sorted(flat.get_blocked_keywords())
+            for text in texts:
+                assert tenant.check_content(text) == flat.check_content(text), (match_mode, text)
+                assert tenant.moderate_output(text) == flat.moderate_output(text), (match_mode, text)
+            assert tenant.check_batch(texts * 3) == flat.check_batch(texts * 3)
+            assert tenant.moderate_batch(texts * 3) == flat.moderate_batch(texts * 3)
+            chunks = ["Our riv", "al co", "rp spoi", "ler ends"]
+            assert ''.join(tenant.moderate_stream(chunks)) == ''.join(flat.moderate_stream(chunks))
+            
+            # The same terms share one moderator, built on the base set's matchers
+            assert policies.moderator_for('globex') is tenant
+            assert tenant.keyword_set.base is base.keyword_set
+            assert policies.moderator_for('plain') is base
+            assert policies.resolve(api_key='key-1') == 'acme' and policies.resolve('unknown') is None
+    
+    print("✅ Tenant moderators matched a flat list of the same keywords")
+    return None
+
+
+def test_word_mode():
+    """Test whole-word matching against the accuracy fixtures."""
+    print("\n🧪 Testing Word Matching")
+    print("=" * 60)
+    
+    from moderation import MATCHING_FIXTURES, ContentModerator
+    
+    moderator = ContentModerator(match_mode=ContentModerator.WORD_MODE)
+    for text, expected in MATCHING_FIXTURES:
+        assert moderator.check_content(text)[1] == expected, \
+            f"{text!r}: expected {expected}, got {moderator.check_content(text)[1]}"
+    
+    # Substring mode flags keywords inside harmless words; word mode doesn't
+    substring = ContentModerator()
+    assert substring.check_content("Pick up the prescription at the pharmacy")[1] == ['harm']
+    
+    # Whole inflected or obfuscated words are redacted, including across stream chunks
+    assert moderator.moderate_output("My account was hacked yesterday") == "My account was [REDACTED] yesterday"
+    assert moderator.moderate_output("k i l l them all") == "[REDACTED] them all"
+    assert moderator.moderate_output("the pharmacy") == "the pharmacy"
+    chunks = ["My acc", "ount was hac", "ked yest", "erday at the pharm", "acy"]
+    assert ''.join(moderator.moderate_stream(chunks)) == "My account was [REDACTED] yesterday at the pharmacy"
+    
+    texts = [text for text, _ in MATCHING_FIXTURES]
+    assert moderator.check_batch(texts) == [moderator.check_content(text) for text in texts]
+    
+    print(f"✅ {len(MATCHING_FIXTURES)} fixtures matched in word mode")
+    return None
+
+
+def test_metrics():
+    """Test the Prometheus text output and the moderation counters behind /metrics."""
+    print("\n🧪 Testing Metrics")
+    print("=" * 60)
+    
+    from metrics import BLOCKED, METRICS, STAGE_SECONDS, MetricsRegistry
+    from moderation import ContentModerator
+    
+    registry = MetricsRegistry()
+    counter = registry.counter('things_total', 'Things seen', ('kind',))
+    counter.inc('say "hi"\n')
+    counter.inc('plain', amount=2)
+    histogram = registry.histogram('step_seconds', 'Step latency', ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, 'parse')
+    registry.gauge('ratio', 'A ratio', function=lambda: {(): 0.25})
+    lines = registry.render().splitlines()
+    for line in ['# TYPE things_total counter', 'things_total{kind="say \\"hi\\"\\n"} 1',
+                 'things_total{kind="plain"} 2', '# TYPE step_seconds histogram',
+                 'step_seconds_bucket{stage="parse",le="0.1"} 1', 'step_seconds_bucket{stage="parse",le="1"} 2',
+                 'step_seconds_bucket{stage="parse",le="+Inf"} 3', 'step_seconds_sum{stage="parse"} 5.55',
+                 'step_seconds_count{stage="parse"} 3', '# TYPE ratio gauge', 'ratio 0.25']:
+        assert line in lines, f"Missing {line!r} in the rendered metrics"
+    
+    # A disabled registry records nothing
+    disabled = MetricsRegistry(enabled=False)
+    disabled_counter = disabled.counter('ignored_total', 'Ignored')
+    disabled_counter.inc()
+    assert disabled_counter.value() == 0
+    
+    if METRICS.enabled:
+        import app as web
+        
+        blocked, timed = BLOCKED.value(), STAGE_SECONDS.count('moderate_input')
+        moderator = ContentModerator()
+        moderator.moderate_input("How to hack a website")
+        moderator.moderate_input("Hello there")
+        assert BLOCKED.value() == blocked + 1 and STAGE_SECONDS.count('moderate_input') == timed + 2
+        
+        response = web.app.test_client().get('/metrics')
+        assert response.status_code == 200 and response.mimetype == 'text/plain'
+        body = response.get_data(as_text=True)
+        assert f"moderation_blocked_total {int(blocked + 1)}" in body.splitlines()
+        assert 'moderation_stage_seconds_count{stage="moderate_input"}' in body
+    
+    print("✅ Metrics rendered in the Prometheus text format")
+    return None
+
+
+def test_chat_sessions():
+    """Test session history trimming and per-tenant session ids."""
+    print("\n🧪 Testing Chat Sessions")
+    print("=" * 60)
+    
+    import os
+    import tempfile
+    from ai_client import AIClient
+    from chat_sessions import MemorySessionStore, SQLiteSessionStore, estimate_tokens, trim_exchanges
+    from stub_model import StubModel
+    
+    # Oldest exchanges go first; a latest exchange over the budget on its own is cut to fit
+    exchanges = [(f"question {index}", "answer " * 10, 0) for index in range(5)]
+    exchanges = [(question, answer, estimate_tokens(question) + estimate_tokens(answer))
+                 for question, answer, _ in exchanges]
+    assert trim_exchanges(exchanges, exchanges[0][2] * 2) == exchanges[-2:]
+    assert trim_exchanges(exchanges, 10 ** 6) == exchanges
+    long_exchange = ("Summarize this: " + "x" * 4000, "y" * 4000, 2012)
+    trimmed = trim_exchanges(exchanges + [long_exchange], 200)
+    assert len(trimmed) == 1 and trimmed[0][2] <= 200, f"Kept {trimmed[0][2]} tokens for a 200 budget"
+    assert trimmed[0][0].startswith("Summarize this:") and trimmed[0][1].startswith("y")
+    assert trim_exchanges([long_exchange], 4) == []
+    
+    with tempfile.TemporaryDirectory() as directory:
+        for store in (MemorySessionStore(max_tokens=200),
+                      SQLiteSessionStore(os.path.join(directory, 'sessions.db'), max_tokens=200)):
+            model = StubModel(reply="word " * 20)
+            client = AIClient(model=model, cache=None, sessions=store)
+            for index in range(6):
+                client.chat(f"Message {index}", session_id='tab-1')
+            history = store.history('tab-1')
+            assert 0 < len(history) < 6 and sum(tokens for _, _, tokens in history) <= 200
+            assert history[-1][0] == "Message 5"
+            client.chat("Follow-up", session_id='tab-1')
+            assert [part['parts'][0] for part in model.last_history][-2] == "Message 5"
+    
+    # The same session id from different tenants or API keys is a different conversation
+    import app as web
+    
+    data = {'session_id': 'tab-1'}
+    keys = {web.session_id_for(data), web.session_id_for(data, web.session_owner(tenant_id='acme')),
+            web.session_id_for(data, web.session_owner(tenant_id='globex')),
+            web.session_id_for(data, web.session_owner(api_key='secret'))}
+    assert len(keys) == 4 and not any('secret' in key for key in keys)
+    assert web.session_owner(api_key='secret', tenant_id='acme') == web.session_owner(api_key='secret')
+    assert web.session_id_for({'session_id': 'x' * (web.MAX_SESSION_ID_LENGTH + 1)}, 'tenant:acme') is None
+    
+    print("✅ Session history stayed within its budget and per tenant")
+    return None
+
+
+def test_model_routing():
+    """Test routing by prompt size, failover between models and falling back without a catalog."""
+    print("\n🧪 Testing Model Routing")
+    print("=" * 60)
+    
+    import os
+    import tempfile
+    import model_router
+    from ai_client import AIClient
+    from circuit_breaker import CircuitBreaker
+    from model_router import ModelRoute, ModelRouter, create_router_from_env
+    from response_cache import MemoryCache, make_cache_key
+    from retry import RetryPolicy
+    from stub_model import StubModel
+    
+    small, large = StubModel(reply="small"), StubModel(reply="large")
+    router = ModelRouter([ModelRoute('small', 200, small), ModelRoute('large', 100000, large)], cooldown=60)
+    client = AIClient(model=StubModel(reply="default"), cache=MemoryCache(), router=router,
+                      retry_policy=RetryPolicy(max_attempts=1), breaker=CircuitBreaker(failure_threshold=1000))
+    
+    # Short prompts go to the cheap model, long ones to the model whose window fits them
+    long_prompt = "Summarize: " + "text " * 400
+    assert client.generate_response("Hi") == "small" and client.generate_response(long_prompt) == "large"
+    
+    # Cache keys name the routed model, not GEMINI_MODEL
+    assert client.cache_key("Hi") == make_cache_key('small', client.system_prompt, "Hi", '')
+    assert client.cache_key(long_prompt) == make_cache_key('large', client.system_prompt, long_prompt, '')
+    
+    # A failing model fails over to the next one within the same attempt, then cools down
+    small.error_rate = 1.0
+    assert client.generate_response("Hello again") == "large"
+    stats = router.stats()['small']
+    assert stats['errors'] == 1 and stats['cooling_down'], stats
+    calls = small.calls
+    assert client.generate_response("And again") == "large" and small.calls == calls, \
+        "A cooling model was tried first"
+    
+    # Without a usable catalog the client keeps the default model and writes no catalog file
+    saved = model_router._catalog, os.environ.get('GEMINI_MODELS'), os.environ.get('MODEL_CATALOG_PATH')
+    
+    def offline():
+        raise ConnectionError("network unreachable")
+    
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            catalog_path = os.path.join(directory, 'models.json')
+            os.environ['GEMINI_MODELS'] = 'gemini-1.5-flash-8b,gemini-1.5-flash'
+            os.environ['MODEL_CATALOG_PATH'] = catalog_path
+            model_router._catalog = None
+            assert create_router_from_env(lambda name: StubModel(), offline) is None
+            assert not os.path.exists(catalog_path), "Wrote a catalog after listing failed"
+            assert model_router._catalog is None, "Cached a failed listing"
+    finally:
+        model_router._catalog = saved[0]
+        for name, value in zip(('GEMINI_MODELS', 'MODEL_CATALOG_PATH'), saved[1:]):
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    
+    print("✅ Routed by prompt size, failed over to the next model and fell back without a catalog")
+    return None
+
+
+def test_async_moderation():
+    """Test that slow moderation runs off the event loop on the async path."""
+    print("\n🧪 Testing Async Moderation")
+    print("=" * 60)
+    
+    import asyncio
+    import threading
+    from ai_client import AIClient
+    from asgi import moderates_in_thread
+    from moderation import ContentModerator
+    from response_cache import MemoryCache
+    from stub_model import StubModel
+    
+    assert not moderates_in_thread(ContentModerator())
+    assert moderates_in_thread(ContentModerator(match_mode=ContentModerator.WORD_MODE))
+    assert moderates_in_thread(ContentModerator([f"term{i}" for i in range(ContentModerator.MATCHER_THRESHOLD)]))
+    
+    moderator = ContentModerator(match_mode=ContentModerator.WORD_MODE)
+    threads = []
+    
+    def moderate(text):
+        threads.append(threading.get_ident())
+        return moderator.moderate_output(text)
+    
+    client = AIClient(model=StubModel(reply="They hacked it"), cache=MemoryCache())
+    
+    async def run(in_thread):
+        loop_thread = threading.get_ident()
+        response = await client.achat(f"Question {in_thread}", moderate=moderate, moderate_in_thread=in_thread)
+        return response, threads[-1] != loop_thread
+    
+    assert asyncio.run(run(True)) == ("They [REDACTED] it", True)
+    assert asyncio.run(run(False)) == ("They [REDACTED] it", False)
+    assert client.cache.stats()['entries'] == 2, "Moderated responses were not cached"
+    
+    print("✅ Word-mode moderation ran on a worker thread")
+    return None
+
+
 def test_api_connection():
     """Test if we can connect to Gemini API."""
     print("\n🧪 Testing API Connection")
@@ -130,7 +999,7 @@ def test_api_connection():
         else:
             print("❌ API returned empty response")
             return False
-            
+    
     except Exception as e:
         print(f"❌ API connection failed: {str(e)}")
         print("   This might be due to:")
@@ -151,6 +1020,26 @@ def main():
         ("Dependencies", test_dependencies),
         ("AI Client", test_ai_client),
         ("Content Moderator", test_moderator),
+        ("Unicode Keywords", test_unicode_keywords),
+        ("Streaming Moderation", test_streaming),
+        ("Upstream Retries", test_resilience),
+        ("Async Speculative Dispatch", test_speculative_async),
+        ("System Prompt Caching", test_prompt_cache),
+        ("Admission Control", test_admission),
+        ("Keyword Index", test_keyword_index),
+        ("Bulk Moderation", test_bulk_moderation),
+        ("Verdict Cache", test_verdict_cache),
+        ("Response Cache", test_response_cache),
+        ("Request Coalescing", test_coalescing),
+        ("Batch Moderation", test_batch_moderation),
+        ("Batch Runner", test_batch_runner),
+        ("Keyword Reload", test_keyword_reload),
+        ("Tenant Policies", test_tenant_policies),
+        ("Word Matching", test_word_mode),
+        ("Metrics", test_metrics),
+        ("Chat Sessions", test_chat_sessions),
+        ("Model Routing", test_model_routing),
+        ("Async Moderation", test_async_moderation),
         ("API Connection", test_api_connection)
     ]
     
@@ -159,7 +1048,11 @@ def main():
     for test_name, test_func in tests:
         try:
             result = test_func()
-            results.append((test_name, result))
+            # Checks written as assertions return None when they pass
+            results.append((test_name, result is None or result))
+        except AssertionError as e:
+            print(f"❌ {str(e) or 'Check failed'}")
+            results.append((test_name, False))
         except Exception as e:
             print(f"\n❌ {test_name} test crashed: {str(e)}")
             results.append((test_name, False))
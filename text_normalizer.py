@@ -0,0 +1,151 @@
+"""
+Text Normalizer Module
+Unicode folding (casefold, NFKC, accents, confusables) with offsets back to the original text
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# Letters from other scripts that look like Latin ones, after casefolding
+CONFUSABLES = str.maketrans({
+    # Cyrillic
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'і': 'i', 'ї': 'i', 'ј': 'j',
+    'к': 'k', 'м': 'm', 'н': 'h', 'о': 'o', 'р': 'p', 'с': 'c', 'т': 't',
+    'у': 'y', 'х': 'x', 'ѕ': 's', 'ԁ': 'd', 'һ': 'h', 'ӏ': 'l', 'ԛ': 'q',
+    'ԝ': 'w',
+    # Greek
+    'α': 'a', 'β': 'b', 'ε': 'e', 'η': 'n', 'ι': 'i', 'κ': 'k', 'ν': 'v',
+    'ο': 'o', 'ρ': 'p', 'τ': 't', 'υ': 'u', 'χ': 'x', 'ω': 'w',
+})
+
+# Runs of characters outside ASCII, folded one character at a time
+NON_ASCII_PATTERN = re.compile(r'[^\x00-\x7f]+')
+
+
+@lru_cache(maxsize=65536)
+def _fold_char(char: str) -> str:
+    """
+    Fold one character for matching.
+    
+    NFKC turns full-width and other compatibility forms into plain ones,
+    casefold handles case beyond str.lower() (ß -> ss), accents are
+    dropped, look-alike letters from other scripts are mapped to Latin and
+    invisible format characters (zero-width spaces, soft hyphens) vanish.
+    """
+    if unicodedata.category(char) == 'Cf':
+        return ''
+    folded = unicodedata.normalize('NFKD', unicodedata.normalize('NFKC', char).casefold())
+    folded = ''.join(part for part in folded if not unicodedata.combining(part))
+    return folded.translate(CONFUSABLES)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Fold text for keyword matching.
+    
+    Pure-ASCII text, most of the traffic, is only lowercased; otherwise the
+    ASCII runs are lowercased and the other characters folded one by one.
+    
+    Args:
+        text (str): Original text
+    
+    Returns:
+        str: Folded text
+    """
+    if text.isascii():
+        return text.lower()
+    
+    parts = []
+    position = 0
+    for match in NON_ASCII_PATTERN.finditer(text):
+        parts.append(text[position:match.start()].lower())
+        parts.extend(map(_fold_char, match.group()))
+        position = match.end()
+    parts.append(text[position:].lower())
+    return ''.join(parts)
+
+
+class NormalizedText:
+    """Folded text that remembers where each of its characters came from."""
+    
+    __slots__ = ('original', 'folded', '_starts', '_ends')
+    
+    def __init__(self, text: str):
+        """
+        Fold the text, keeping an offset map unless it is pure ASCII.
+        
+        Args:
+            text (str): Original text
+        """
+        self.original = text
+        self._starts: Optional[List[int]] = None
+        self._ends: Optional[List[int]] = None
+        
+        if text.isascii():
+            # Lowercasing ASCII keeps every offset
+            self.folded = text.lower()
+            return
+        
+        parts = []
+        starts = []
+        ends = []
+        position = 0
+        for match in NON_ASCII_PATTERN.finditer(text):
+            start = match.start()
+            parts.append(text[position:start].lower())
+            starts.extend(range(position, start))
+            ends.extend(range(position + 1, start + 1))
+            
+            for index in range(start, match.end()):
+                folded = _fold_char(text[index])
+                if folded:
+                    parts.append(folded)
+                    starts.extend([index] * len(folded))
+                    ends.extend([index + 1] * len(folded))
+                elif ends:
+                    # Dropped characters (accents, zero-width) go with the one before
+                    ends[-1] = index + 1
+            position = match.end()
+        
+        parts.append(text[position:].lower())
+        starts.extend(range(position, len(text)))
+        ends.extend(range(position + 1, len(text) + 1))
+        
+        self.folded = ''.join(parts)
+        self._starts = starts
+        self._ends = ends
+    
+    def offset(self, position: int) -> int:
+        """
+        Map an offset in the folded text to the original text.
+        
+        Args:
+            position (int): Offset in the folded text
+        
+        Returns:
+            int: Offset in the original text
+        """
+        if self._starts is None:
+            return position
+        if position >= len(self._starts):
+            return len(self.original)
+        return self._starts[position]
+    
+    def spans(self, spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        Map (start, end) spans in the folded text to the original text.
+        
+        Args:
+            spans (List[Tuple[int, int]]): Spans in the folded text
+        
+        Returns:
+            List[Tuple[int, int]]: Spans covering the original characters
+        """
+        if self._starts is None:
+            return spans
+        return [
+            (self._starts[start], self._ends[end - 1])
+            for start, end in spans if end > start
+        ]
@@ -0,0 +1,214 @@
+"""
+Verdict Cache Module
+Bounded LRU cache of moderation verdicts for texts that repeat, such as greetings and template replies
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional, Set, Tuple
+
+# Rough bytes an entry costs beyond its key and value (the ordered dict's slot and links)
+ENTRY_OVERHEAD = 100
+
+# Rough bytes a once-seen key costs beyond the key itself (its set slot)
+SEEN_OVERHEAD = 30
+
+
+def _key_size(key: tuple) -> int:
+    """Approximate bytes held by a key: the tuple and the text it keeps alive."""
+    return sys.getsizeof(key) + sys.getsizeof(key[2])
+
+
+class VerdictCache:
+    """
+    Remembers what moderation found in recently seen texts.
+    
+    Keys combine the kind of check, the keyword set's version and the
+    text itself. Python caches a string's hash on the string, so a lookup
+    costs next to nothing, and a hash match is confirmed by comparing the
+    text, so two texts never share a verdict. Since the version is part of
+    the key, a new keyword list never sees verdicts made with the old one;
+    those are dropped with invalidate() or age out.
+    
+    Only texts that repeat are worth an entry, so a verdict is stored the
+    second time its key is seen; one-off texts never push popular ones
+    out. Texts longer than `max_text_length` are not cached at all: they
+    rarely repeat, and this bounds what each key keeps in memory. `bytes`
+    counts the cached verdicts and the keys seen once.
+    """
+    
+    def __init__(self, max_entries: int = 10000, max_text_length: int = 1024):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_entries (int): Maximum number of cached verdicts
+            max_text_length (int): Longest text (in characters) worth caching
+        """
+        self.max_entries = max_entries
+        self.max_text_length = max_text_length
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries: 'OrderedDict[tuple, Tuple[tuple, int]]' = OrderedDict()
+        # Keys seen once since the last reset: a text is cached on its second sighting
+        self._seen: Set[tuple] = set()
+        self._seen_bytes = 0
+        self._lock = threading.Lock()
+    
+    def key(self, kind: str, version: str, text: str) -> Optional[tuple]:
+        """
+        Build the cache key for a text, or None if it is too long to cache.
+        
+        Args:
+            kind (str): What the verdict is for, such as 'substring:check'
+            version (str): Version of the keyword set checked against
+            text (str): Text being moderated
+        
+        Returns:
+            Optional[tuple]: Cache key, or None to skip the cache
+        """
+        if len(text) > self.max_text_length:
+            with self._lock:
+                self.skipped += 1
+            return None
+        return (kind, version, text)
+    
+    def get(self, key: tuple) -> Optional[tuple]:
+        """
+        Look up a verdict, marking it recently used.
+        
+        Args:
+            key (tuple): Key from key()
+        
+        Returns:
+            Optional[tuple]: Cached verdict, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def set(self, key: tuple, verdict: tuple):
+        """
+        Store a verdict if its key was seen before, evicting the least recently used if full.
+        
+        Args:
+            key (tuple): Key from key()
+            verdict (tuple): Verdict to return for the key
+        """
+        key_size = _key_size(key)
+        # Keywords in the verdict belong to the keyword list; only a redacted text is its own
+        size = ENTRY_OVERHEAD + key_size + sys.getsizeof(verdict)
+        if isinstance(verdict[-1], str):
+            size += sys.getsizeof(verdict[-1])
+        with self._lock:
+            if key not in self._seen:
+                if len(self._seen) >= self.max_entries:
+                    self._clear_seen()
+                self._seen.add(key)
+                self._seen_bytes += SEEN_OVERHEAD + key_size
+                self.bytes += SEEN_OVERHEAD + key_size
+                return
+            self._seen.discard(key)
+            self._seen_bytes -= SEEN_OVERHEAD + key_size
+            self.bytes -= SEEN_OVERHEAD + key_size
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (verdict, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+    
+    def _clear_seen(self):
+        """Forget the keys seen once (with the lock held)."""
+        self._seen.clear()
+        self.bytes -= self._seen_bytes
+        self._seen_bytes = 0
+    
+    def invalidate(self, version: str) -> int:
+        """
+        Drop the verdicts made with a keyword set version.
+        
+        Args:
+            version (str): Version of the replaced keyword set
+        
+        Returns:
+            int: Number of verdicts dropped
+        """
+        with self._lock:
+            stale = [key for key in self._entries if key[1] == version]
+            for key in stale:
+                _, size = self._entries.pop(key)
+                self.bytes -= size
+            for key in [key for key in self._seen if key[1] == version]:
+                self._seen.discard(key)
+                self._seen_bytes -= SEEN_OVERHEAD + _key_size(key)
+                self.bytes -= SEEN_OVERHEAD + _key_size(key)
+            return len(stale)
+    
+    def clear(self):
+        """Drop every cached verdict."""
+        with self._lock:
+            self._entries.clear()
+            self._seen.clear()
+            self._seen_bytes = 0
+            self.bytes = 0
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+    
+    def stats(self) -> dict:
+        """
+        Get cache statistics for monitoring.
+        
+        Returns:
+            dict: Entry count and limits, hits, misses, skipped texts,
+                  evictions, hit ratio and approximate memory in bytes
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'max_text_length': self.max_text_length,
+                'hits': self.hits,
+                'misses': self.misses,
+                'skipped': self.skipped,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'bytes': self.bytes
+            }
+
+
+def create_verdict_cache_from_env() -> Optional[VerdictCache]:
+    """
+    Build the verdict cache configured by environment variables.
+    
+    VERDICT_CACHE_SIZE sets the number of verdicts kept (0 turns the cache
+    off) and VERDICT_CACHE_MAX_LENGTH the longest text cached, in characters.
+    
+    The moderator only consults the cache where it pays off: in substring
+    mode, lists under ContentModerator.MATCHER_THRESHOLD keywords (such as
+    the built-in list) are scanned directly, so the cache stays empty;
+    /health reports this as `active: false`.
+    
+    Returns:
+        Optional[VerdictCache]: Configured cache, or None if disabled
+    """
+    max_entries = int(os.getenv('VERDICT_CACHE_SIZE', 10000))
+    if max_entries <= 0:
+        return None
+    return VerdictCache(max_entries, int(os.getenv('VERDICT_CACHE_MAX_LENGTH', 1024)))
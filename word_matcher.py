@@ -0,0 +1,263 @@
+"""
+Word Matcher Module
+Word-boundary keyword matching that sees through leetspeak, spacing and inflections
+"""
+
+import re
+from bisect import bisect_right
+from typing import Dict, List, Sequence, Set, Tuple
+
+from keyword_matcher import KeywordMatcher
+from text_normalizer import normalize_text
+
+# A word: letters and digits, plus look-alike symbols used in place of
+# letters ('@ttack', '$teal', 'k!ll'); '!', '|', '+' and invisible
+# characters (zero-width spaces, soft hyphens) only inside a word, and
+# combining accents after a letter
+WORD_PATTERN = re.compile(
+    r"(?:[^\W_]|[@$](?=[^\W_@$!|+])|(?<=[^\W_])[\u0300-\u036f]+"
+    r"|(?<=[^\W_])[!|+\u00ad\u200b-\u200d\u2060\ufeff](?=[^\W_]))+"
+)
+
+# Digits and symbols folded to the letters they stand in for
+LEET_TABLE = str.maketrans({
+    '0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b',
+    '@': 'a', '$': 's', '!': 'i', '|': 'l', '+': 't'
+})
+
+# Endings accepted after a keyword's last word
+SUFFIXES = ('s', 'es', 'ed', 'd', 'ing', 'er', 'ers')
+
+VOWELS = 'aeiou'
+
+
+def inflections(word: str) -> Set[str]:
+    """
+    Get the simple inflected forms of a word.
+    
+    Covers plain suffixes (hack -> hacks, hacked, hacking, hacker), a dropped
+    final e (hate -> hating), a doubled final consonant (stab -> stabbing)
+    and y -> ies/ied (bully -> bullies).
+    
+    Args:
+        word (str): Normalized word
+    
+    Returns:
+        Set[str]: The word and its inflected forms
+    """
+    forms = {word}
+    forms.update(word + suffix for suffix in SUFFIXES)
+    if len(word) < 3:
+        return forms
+    
+    if word.endswith('e'):
+        forms.update(word[:-1] + suffix for suffix in ('ing', 'ed', 'er', 'ers'))
+    if word[-1] not in VOWELS + 'wxy' and word[-2] in VOWELS and word[-3] not in VOWELS:
+        forms.update(word + word[-1] + suffix for suffix in ('ing', 'ed', 'er', 'ers'))
+    if word.endswith('y') and word[-2] not in VOWELS:
+        forms.update((word[:-1] + 'ies', word[:-1] + 'ied'))
+    return forms
+
+
+def normalize_words(text: str) -> Tuple[str, List[int], List[Tuple[int, int]]]:
+    """
+    Normalize text into space-separated words for matching.
+    
+    Words are folded as in text_normalizer (case, full-width forms, accents,
+    look-alike letters from other scripts), and look-alike digits and
+    symbols are folded in words with letters (h4ck -> hack) and in single
+    characters, which may be a keyword spelled out (b.o.m.b -> ' b o m b ').
+    The result is padded with spaces so every word is delimited on both
+    sides.
+    
+    Args:
+        text (str): Original text
+    
+    Returns:
+        Tuple[str, List[int], List[Tuple[int, int]]]: (normalized, starts, ranges)
+            - normalized: ' word word ... '
+            - starts: Offset of each word in normalized
+            - ranges: (start, end) of each word in the original text
+    """
+    words = []
+    starts = []
+    ranges = []
+    position = 1
+    
+    for match in WORD_PATTERN.finditer(text):
+        word = normalize_text(match.group())
+        if not word.isalpha() and (len(word) == 1 or any(char.isalpha() for char in word)):
+            word = word.translate(LEET_TABLE)
+        words.append(word)
+        starts.append(position)
+        ranges.append(match.span())
+        position += len(word) + 1
+    
+    return ' ' + ' '.join(words) + ' ', starts, ranges
+
+
+class WordMatcher:
+    """Finds whole-word keyword matches, with their inflections, in one pass."""
+    
+    def __init__(self, keywords: Sequence[str]):
+        """
+        Compile the keywords and their inflected forms.
+        
+        Args:
+            keywords: Keywords to match, in the order violations are reported
+        """
+        self.keywords = tuple(keywords)
+        self.max_words = 1
+        self.max_spelled = 0
+        
+        # ' pattern ' -> positions of the keywords it stands for
+        self._owners: Dict[str, List[int]] = {}
+        for position, keyword in enumerate(self.keywords):
+            words = normalize_words(keyword)[0].split()
+            if not words:
+                continue
+            self.max_words = max(self.max_words, len(words))
+            patterns = {' ' + ' '.join(words[:-1] + [form]) + ' ' for form in inflections(words[-1])}
+            if len(words) == 1 and len(words[0]) > 1:
+                # The keyword spelled out letter by letter
+                patterns.add(' ' + ' '.join(words[0]) + ' ')
+                self.max_spelled = max(self.max_spelled, len(words[0]))
+            for pattern in patterns:
+                self._owners.setdefault(pattern, []).append(position)
+        
+        self._matcher = KeywordMatcher(list(self._owners))
+    
+    def __len__(self) -> int:
+        return len(self.keywords)
+    
+    def _violations(self, pattern_ids: Set[int]) -> List[str]:
+        """Convert matched pattern ids to keywords, in keyword-list order."""
+        positions = {
+            position
+            for pattern in self._matcher.keywords_for(pattern_ids)
+            for position in self._owners[pattern]
+        }
+        return [self.keywords[position] for position in sorted(positions)]
+    
+    def find_all(self, text: str) -> List[str]:
+        """
+        Find which keywords occur in the text as whole words.
+        
+        Args:
+            text (str): Original text
+        
+        Returns:
+            List[str]: Keywords found, in keyword-list order
+        """
+        if not text:
+            return []
+        return self._violations(self._matcher.find_ids(normalize_words(text)[0]))
+    
+    def find_spans(self, text: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+        """
+        Find the keywords in the text and where they occur in it.
+        
+        Args:
+            text (str): Original text
+        
+        Returns:
+            Tuple[List[str], List[Tuple[int, int]]]: (violations, spans)
+                - violations: Keywords found, in keyword-list order
+                - spans: (start, end) offsets in the original text, covering
+                         the whole matched words including any separators
+        """
+        if not text:
+            return [], []
+        normalized, starts, ranges = normalize_words(text)
+        pattern_ids, matches = self._matcher.find_spans(normalized)
+        
+        # A match always covers whole words, so map it back word by word
+        spans = []
+        for start, end in matches:
+            first = bisect_right(starts, start + 1) - 1
+            last = bisect_right(starts, end - 2) - 1
+            spans.append((ranges[first][0], ranges[last][1]))
+        return self._violations(pattern_ids), spans
+    
+    def pending_length(self, text: str) -> int:
+        """
+        Length of the tail of the text that more text could still change.
+        
+        The last words (as many as the longest keyword has) may still grow
+        or get an inflection, and trailing single characters may be the
+        start of a spelled-out keyword, so they are held back along with
+        anything after them.
+        
+        Args:
+            text (str): Original text
+        
+        Returns:
+            int: Number of trailing characters to hold back
+        """
+        ranges = normalize_words(text)[2]
+        held = self.max_words
+        while held < min(len(ranges), self.max_spelled):
+            start, end = ranges[-held - 1]
+            if end - start != 1:
+                break
+            held += 1
+        if len(ranges) < held:
+            return len(text)
+        return len(text) - ranges[-held][0]
+
+
+class LayeredWordMatcher:
+    """Matches a compiled base word matcher's keywords plus a small extra matcher's."""
+    
+    def __init__(self, base: WordMatcher, extra: WordMatcher):
+        """
+        Initialize the layered matcher.
+        
+        Args:
+            base (WordMatcher): Matcher for the shared keywords, not copied
+            extra (WordMatcher): Matcher for the keywords added on top
+        """
+        self.base = base
+        self.extra = extra
+        self.keywords = base.keywords + extra.keywords
+    
+    def __len__(self) -> int:
+        return len(self.keywords)
+    
+    def find_all(self, text: str) -> List[str]:
+        """
+        Find which keywords occur in the text as whole words.
+        
+        Args:
+            text (str): Original text
+        
+        Returns:
+            List[str]: Keywords found, base keywords first
+        """
+        return self.base.find_all(text) + self.extra.find_all(text)
+    
+    def find_spans(self, text: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+        """
+        Find the keywords in the text and where they occur in it.
+        
+        Args:
+            text (str): Original text
+        
+        Returns:
+            Tuple[List[str], List[Tuple[int, int]]]: (violations, spans)
+        """
+        violations, spans = self.base.find_spans(text)
+        extra_violations, extra_spans = self.extra.find_spans(text)
+        return violations + extra_violations, spans + extra_spans
+    
+    def pending_length(self, text: str) -> int:
+        """
+        Length of the tail of the text that more text could still change.
+        
+        Args:
+            text (str): Original text
+        
+        Returns:
+            int: Number of trailing characters to hold back
+        """
+        return max(self.base.pending_length(text), self.extra.pending_length(text))